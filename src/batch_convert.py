@@ -0,0 +1,298 @@
+# Conversión por lotes (sin interfaz gráfica)
+# Modo de funcionamiento:
+# 1. python batch_convert.py plano.pdf -o plano_mm.pdf
+# 2. Se localizan las cotas: en planos vectoriales por su geometría (flechas y
+#    líneas de extensión, ver vector_labels.py); en escaneos, renderizando la
+#    página y pasando el detector de texto. Todas las cotas se reconocen por
+#    lotes en una sola llamada al motor OCR.
+# 3. Las cotas en pulgadas se sustituyen por su valor en milímetros.
+# Con --stream las páginas se convierten y se escriben de una en una, con la
+# memoria acotada aunque el PDF tenga miles de páginas.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import argparse
+import os
+import shutil
+import time
+
+from conversion import convert_inches_to_mm, insert_converted_texts, is_dimension_text, canvas_to_pdf_rect
+from ocr_backends import BACKENDS, OCRRegion, create_backend
+from preprocessing import DEFAULT_PREPROCESS, as_rgb
+from profiling import profiler, span
+from rendering import COLOR_MODES, page_colorspace, render_page_array
+from session import Session
+from stamps import StampCache
+from startup import lazy_import
+from vector_labels import VectorLabelDetector
+
+np = lazy_import("numpy")
+fitz = lazy_import("fitz")  # PyMuPDF
+
+# Zoom de renderizado para la detección y margen (en píxeles) añadido a cada caja
+DEFAULT_ZOOM = 2.0
+DEFAULT_PADDING = 10
+DETECTORS = ("auto", "vector", "paddle")
+STREAM_FLUSH_PAGES = 8  # páginas entre escrituras incrementales del PDF de salida en modo streaming
+
+
+# ========================================================
+# ======================Detección=========================
+# ========================================================
+def paddle_text_detector(model_name="PP-OCRv5_mobile_det"):
+    """Crea una función `detect(imagen) -> [(x0, y0, x1, y1)]` con el detector de PaddleOCR."""
+    from paddleocr import TextDetection
+
+    model = TextDetection(model_name=model_name)
+
+    def detect(image):
+        boxes = []
+        for res in model.predict(image):
+            for poly in res["dt_polys"]:
+                poly = np.asarray(poly)
+                x0, y0 = poly.min(axis=0)
+                x1, y1 = poly.max(axis=0)
+                boxes.append((int(x0), int(y0), int(x1), int(y1)))
+        return boxes
+
+    return detect
+
+
+def create_detector(kind="auto"):
+    """Detector de cotas: "vector" (geometría), "paddle" (imagen) o "auto" (geometría y, si no hay, imagen)."""
+    if kind == "paddle":
+        return paddle_text_detector()
+    if kind == "vector":
+        return VectorLabelDetector()
+    if kind == "auto":
+        return VectorLabelDetector(fallback_factory=paddle_text_detector)
+    raise ValueError(f"Detector desconocido: '{kind}' (use {', '.join(DETECTORS)})")
+
+
+# ========================================================
+# =======================Conversión=======================
+# ========================================================
+def convert_page(page, backend, detector, zoom=DEFAULT_ZOOM, padding=DEFAULT_PADDING, color_mode="auto",
+                 session=None, stamps=None):
+    """Detecta, reconoce por lotes y convierte todas las cotas de una página.
+
+    `detector` es una función `detector(imagen) -> [cajas en píxeles]` o un
+    detector vectorial (`needs_image = False`) que recibe la página y devuelve
+    rectángulos PDF; si este no encuentra cotas se usa su `fallback` de
+    imagen. La página solo se renderiza si el detector o el motor OCR lo
+    necesitan. Con `color_mode` "auto" las páginas monocromas se renderizan y
+    recortan en gris (un solo canal). Con una `session` (ver session.py) se saltan las
+    regiones ya convertidas, se reutiliza el OCR guardado y las conversiones
+    nuevas se anotan en el diario. Con `stamps` (ver stamps.py) las cotas se
+    escriben como sellos reutilizables. Devuelve el número de cotas convertidas.
+    """
+    detected = None
+    if not getattr(detector, "needs_image", True):
+        with span("detect", page=page.number, source="vector"):
+            rects = detector(page)
+        if rects is not None:
+            detected = [tuple(int(round(v * zoom)) for v in rect) for rect in rects]
+        else:
+            detector = detector.fallback  # página sin geometría de cotas (escaneo)
+
+    image = None
+    if backend.needs_image or (detected is None and detector is not None):
+        with span("render", page=page.number, zoom=zoom) as attrs:
+            colorspace = page_colorspace(page, color_mode)
+            image = render_page_array(page, zoom, colorspace)
+            if attrs is not None:
+                attrs["gray"] = image.ndim == 2
+        img_h, img_w = image.shape[:2]
+    else:
+        img_w, img_h = int(page.rect.width * zoom), int(page.rect.height * zoom)
+
+    if detected is None:
+        with span("detect", page=page.number):
+            detected = detector(as_rgb(image)) if detector is not None else []
+
+    boxes, regions, cached = [], [], []
+    with span("crop", boxes=len(detected)):
+        for box in detected:
+            x0, y0, x1, y1 = box
+            rect = canvas_to_pdf_rect(box, zoom)
+            if session is not None and session.is_converted(page.number, rect):
+                continue
+            crop_coords = (max(0, x0 - padding), max(0, y0 - padding),
+                           min(img_w, x1 + padding), min(img_h, y1 + padding))
+            cx0, cy0, cx1, cy1 = crop_coords
+            if cx1 <= cx0 or cy1 <= cy0:
+                continue
+            result = session.cached_ocr(page.number, rect, backend.name) if session is not None else None
+            if result is not None:
+                cached.append(((box, crop_coords), result))
+                continue
+            boxes.append((box, crop_coords))
+            crop = image[cy0:cy1, cx0:cx1] if image is not None else None
+            regions.append(OCRRegion(image=crop, page=page, clip=rect))
+
+    results = []
+    if regions:
+        start = time.time()
+        with span("ocr", backend=backend.name, regions=len(regions)):
+            results = backend.recognize_batch(regions)
+        elapsed = time.time() - start
+        print(f"Tiempo de OCR: {elapsed:.2f} segundos ({len(results) / max(elapsed, 1e-6):.1f} recortes/s)")
+    if cached:
+        print(f"{len(cached)} regiones leídas de la sesión (sin OCR)")
+
+    items, sources = [], []
+    for (box, crop_coords), result in cached + list(zip(boxes, results)):
+        rect = canvas_to_pdf_rect(box, zoom)
+        if session is not None:
+            session.record_ocr(page.number, rect, result)
+        text = result.text
+        if not is_dimension_text(text):
+            continue
+        rect2 = canvas_to_pdf_rect(crop_coords, zoom)
+        with span("parse"):
+            converted_text = convert_inches_to_mm(text)
+        items.append((rect, rect2, converted_text, 90 if rect2.height > rect2.width else 0))
+        sources.append((text, result))
+
+    # Todas las cotas de la página en una sola escritura
+    if not items:
+        return 0
+    font_sizes = stamps.place(page, items) if stamps is not None else insert_converted_texts(page, items)
+    converted = 0
+    for (rect, rect2, converted_text, rotation), (text, result), font_size in zip(items, sources, font_sizes):
+        if font_size is not None:
+            converted += 1
+            if session is not None:
+                session.record_edit(page.number, rect, rect2, text, converted_text, font_size, rotation, result)
+    return converted
+
+
+def convert_document(input_path, output_path, backend, detector, zoom=DEFAULT_ZOOM, color_mode="auto",
+                     use_session=True, progress=None, use_stamps=False):
+    """Convierte todas las páginas de un PDF y guarda el resultado.
+
+    Con `use_session` se reaplican primero las conversiones de la sesión del
+    PDF (hechas a mano o en otra ejecución) y solo se procesa lo que falta.
+    Con `use_stamps` las cotas repetidas se escriben una vez como Form XObject
+    (ver stamps.py). `progress(página, total_páginas, cotas)` se llama al
+    terminar cada página.
+    """
+    session = Session.open(input_path) if use_session else None
+    doc = fitz.open(input_path)
+    stamps = StampCache(doc) if use_stamps else None
+    total = 0
+    for page in doc:
+        reapplied = session.apply_edits(page, stamps) if session is not None else 0
+        n = convert_page(page, backend, detector, zoom=zoom, color_mode=color_mode, session=session,
+                         stamps=stamps)
+        print(f"Página {page.number + 1}/{len(doc)}: {n} cotas convertidas"
+              + (f" ({reapplied} reaplicadas de la sesión)" if reapplied else ""))
+        total += n + reapplied
+        if progress is not None:
+            progress(page.number + 1, len(doc), n + reapplied)
+        if session is not None:
+            session.save()  # progreso guardado página a página: se puede interrumpir y reanudar
+    with span("save"):
+        doc.save(output_path, garbage=4, deflate=True, clean=True)
+    doc.close()
+    if stamps is not None:
+        stamps.close()
+    return total
+
+
+def convert_document_streaming(input_path, output_path, backend, detector, zoom=DEFAULT_ZOOM, color_mode="auto",
+                               use_session=True, progress=None, flush_pages=STREAM_FLUSH_PAGES, use_stamps=False,
+                               session_path=None):
+    """Como convert_document, pero página a página y con la memoria acotada.
+
+    Se trabaja sobre una copia del PDF en disco que se va actualizando con
+    guardados incrementales cada `flush_pages` páginas: solo se escriben los
+    objetos modificados (contenido de las páginas y fuentes), nunca se copian
+    las imágenes de los escaneos. Tras cada guardado el documento se cierra,
+    se vacía la caché de recursos de MuPDF y se reabre (solo se carga la
+    tabla de objetos). Así el pico de memoria no depende del número de páginas.
+    `session_path` guarda la sesión fuera de la carpeta del PDF.
+    """
+    session = Session.open(input_path, session_path) if use_session else None
+    part_path = output_path + ".part"
+    shutil.copyfile(input_path, part_path)
+    doc = fitz.open(part_path)
+    stamps = StampCache(doc) if use_stamps else None  # los sellos sobreviven a los guardados incrementales
+    n_pages = len(doc)
+    pending = 0  # páginas modificadas sin guardar
+    total = 0
+    for page_no in range(n_pages):
+        page = doc[page_no]
+        reapplied = session.apply_edits(page, stamps) if session is not None else 0
+        n = convert_page(page, backend, detector, zoom=zoom, color_mode=color_mode, session=session,
+                         stamps=stamps)
+        print(f"Página {page_no + 1}/{n_pages}: {n} cotas convertidas"
+              + (f" ({reapplied} reaplicadas de la sesión)" if reapplied else ""))
+        total += n + reapplied
+        page = None
+        pending += 1
+        if progress is not None:
+            progress(page_no + 1, n_pages, n + reapplied)
+
+        if pending >= flush_pages or page_no == n_pages - 1:
+            with span("save", pages=pending):
+                if doc.is_dirty:
+                    doc.saveIncr()
+            pending = 0
+            if session is not None:
+                session.save()
+            # Soltar lo que PyMuPDF tiene en memoria del documento y vaciar su caché
+            # de recursos (imágenes decodificadas), que sobrevive al cierre
+            doc.close()
+            fitz.TOOLS.store_shrink(100)
+            if page_no < n_pages - 1:
+                doc = fitz.open(part_path)
+                if stamps is not None:
+                    stamps.bind(doc)
+    if not doc.is_closed:
+        doc.close()
+    if stamps is not None:
+        stamps.close()
+    os.replace(part_path, output_path)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte a milímetros todas las cotas en pulgadas de un PDF.")
+    parser.add_argument("input", help="PDF de entrada")
+    parser.add_argument("-o", "--output", help="PDF de salida (por defecto <entrada>_mm.pdf)")
+    parser.add_argument("--zoom", type=float, default=DEFAULT_ZOOM, help="Zoom de renderizado para el OCR")
+    parser.add_argument("--color", choices=COLOR_MODES, default="auto",
+                        help="Renderizado en gris, en color o según la página (auto)")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="paddleocr", help="Motor OCR")
+    parser.add_argument("--detector", choices=DETECTORS, default="auto",
+                        help="Localización de las cotas: geometría vectorial, detector de texto sobre la "
+                             "imagen o geometría con el detector de respaldo (auto)")
+    parser.add_argument("--batch-size", type=int, default=16, help="Recortes por llamada al motor OCR (PaddleOCR)")
+    parser.add_argument("--no-preprocess", action="store_true", help="Desactiva el preprocesado de los recortes")
+    parser.add_argument("--no-session", action="store_true",
+                        help="No usar ni actualizar la sesión guardada junto al PDF")
+    parser.add_argument("--stamps", action="store_true",
+                        help="Reutiliza un sello (Form XObject) para las cotas repetidas (juegos muy repetitivos)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Convierte y escribe página a página con memoria acotada (PDFs muy grandes)")
+    parser.add_argument("--profile", metavar="DIR", nargs="?", const=".",
+                        help="Mide los tiempos por etapa y los exporta (JSON lines y Chrome trace) en DIR")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.output_dir = args.profile
+        profiler.set_enabled(True)
+
+    output = args.output or os.path.splitext(args.input)[0] + "_mm.pdf"
+    options = {"preprocess": None if args.no_preprocess else dict(DEFAULT_PREPROCESS)}
+    if args.backend == "paddleocr":
+        options["batch_size"] = args.batch_size
+    backend = create_backend(args.backend, **options)
+    convert = convert_document_streaming if args.stream else convert_document
+    total = convert(args.input, output, backend, create_detector(args.detector), zoom=args.zoom,
+                    color_mode=args.color, use_session=not args.no_session, use_stamps=args.stamps)
+    print(f"{total} cotas convertidas. Guardado en: {output}")
@@ -0,0 +1,437 @@
+# Benchmark reproducible del pipeline de conversión
+# Genera planos sintéticos (synthetic_drawings.py) y mide cada etapa:
+# apertura, render a varios zooms, OCR por recorte, convert_inches_to_mm,
+# inserción del texto convertido y guardado. Los resultados se escriben en JSON
+# para comparar ejecuciones. Funciona sin red y solo con CPU; los motores OCR no
+# instalados se omiten (textlayer siempre está disponible).
+#
+# Modo --accuracy: precisión frente a latencia. Cada configuración de motor
+# (motor y opciones, DPI, preprocesado sí/no) lee todas las cotas de los planos
+# por el mismo camino que process_selection (selection.read_selection +
+# convert_inches_to_mm) y se compara con la verdad de campo. Cada configuración
+# se ejecuta en su propio proceso para medir su pico de memoria (RSS).
+#
+# Uso:
+#     python benchmark.py -o resultados.json --sizes A4,A1 --densities 20,200 --modes vector,raster
+#     python benchmark.py --compare base.json resultados.json
+#     python benchmark.py --accuracy --configs textlayer tesseract:psm=7 tesseract:psm=8 \
+#         paddleocr:ocr_version=PP-OCRv4 paddleocr:ocr_version=PP-OCRv5 --dpis 144,288
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import argparse
+import ast
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+import fitz  # PyMuPDF
+
+from conversion import convert_inches_to_mm, insert_converted_text
+from ocr_backends import BACKENDS, OCRRegion, create_backend
+from preprocessing import DEFAULT_PREPROCESS
+from profiling import percentile
+from rendering import render_page_array
+from selection import read_selection
+from synthetic_drawings import PAGE_SIZES, generate_drawing
+
+DEFAULT_ZOOMS = (1.0, 2.0, 4.0)
+OCR_ZOOM = 2.0  # zoom al que se recortan las cotas para el OCR
+SELECTION_PADDING = 10  # margen de la selección, como en process_selection
+SELECTION_MARGIN = 2.0  # holgura (puntos PDF) del rectángulo que dibujaría el usuario
+DEFAULT_CONFIGS = ("textlayer", "tesseract:psm=7", "tesseract:psm=8",
+                   "paddleocr:ocr_version=PP-OCRv4", "paddleocr:ocr_version=PP-OCRv5")
+
+
+# ========================================================
+# ====================Medición de tiempos=================
+# ========================================================
+def summarize(durations_ms):
+    """Estadísticas (ms) de una lista de duraciones."""
+    values = sorted(durations_ms)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values),
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "min_ms": values[0],
+        "max_ms": values[-1],
+    }
+
+
+def timed(func, *args, **kwargs):
+    """Ejecuta func y devuelve (resultado, ms)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def crop_region(page_array, rect, zoom, padding):
+    """Recorta del render de la página el rectángulo PDF `rect` con `padding` píxeles de margen."""
+    h, w = page_array.shape[:2]
+    x0 = max(0, int(rect.x0 * zoom) - padding)
+    y0 = max(0, int(rect.y0 * zoom) - padding)
+    x1 = min(w, int(rect.x1 * zoom) + padding)
+    y1 = min(h, int(rect.y1 * zoom) + padding)
+    return page_array[y0:y1, x0:x1]
+
+
+def load_backends(names):
+    """Crea los motores pedidos; los que no se pueden cargar se omiten con un aviso."""
+    backends = {}
+    for name in names:
+        try:
+            backends[name] = create_backend(name)
+        except Exception as e:
+            print(f"Motor '{name}' no disponible, se omite ({e})")
+    return backends
+
+
+# ========================================================
+# ========================Etapas==========================
+# ========================================================
+def bench_case(path, truth, zooms, backends, repeat, workdir):
+    """Mide todas las etapas sobre un plano generado. Devuelve [(etapa, extra, [ms])]."""
+    rows = []
+
+    rows.append(("open", {}, [timed(lambda: fitz.open(path).close())[1] for _ in range(repeat)]))
+
+    doc = fitz.open(path)
+    for zoom in zooms:
+        durations = []
+        for _ in range(repeat):
+            for page in doc:
+                durations.append(timed(page.get_pixmap, matrix=fitz.Matrix(zoom, zoom), alpha=False)[1])
+        rows.append(("render", {"zoom": zoom}, durations))
+
+    # OCR por recorte, sobre el render al zoom de trabajo
+    page_arrays = [render_page_array(page, OCR_ZOOM) for page in doc]
+    for name, backend in backends.items():
+        durations = []
+        for item in truth:
+            page = doc[item["page"]]
+            rect = fitz.Rect(item["rect"])
+            crop = crop_region(page_arrays[item["page"]], rect, OCR_ZOOM, backend.crop_padding)
+            region = OCRRegion(image=crop, page=page, clip=rect)
+            durations.append(timed(backend.recognize, region)[1])
+        rows.append(("ocr", {"backend": name}, durations))
+    doc.close()
+
+    # convert_inches_to_mm imprime trazas; se silencian para no medir la consola
+    with contextlib.redirect_stdout(io.StringIO()):
+        durations = [timed(convert_inches_to_mm, item["text"])[1]
+                     for _ in range(repeat) for item in truth]
+    rows.append(("convert", {}, durations))
+
+    # Inserción y guardado sobre un documento nuevo en cada repetición
+    insert_durations, save_durations = [], []
+    for i in range(repeat):
+        doc = fitz.open(path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for item in truth:
+                rect = fitz.Rect(item["rect"])
+                rect2 = fitz.Rect(rect.x0 - SELECTION_PADDING / OCR_ZOOM, rect.y0 - SELECTION_PADDING / OCR_ZOOM,
+                                  rect.x1 + SELECTION_PADDING / OCR_ZOOM, rect.y1 + SELECTION_PADDING / OCR_ZOOM)
+                converted = convert_inches_to_mm(item["text"])
+                insert_durations.append(timed(insert_converted_text, doc[item["page"]], rect, rect2,
+                                              converted, item["rotation"])[1])
+        out_path = os.path.join(workdir, f"save_{i}.pdf")
+        save_durations.append(timed(doc.save, out_path, garbage=4, deflate=True, clean=True)[1])
+        doc.close()
+    rows.append(("insert", {}, insert_durations))
+    rows.append(("save", {}, save_durations))
+    return rows
+
+
+# ========================================================
+# =====================Metadatos==========================
+# ========================================================
+def environment_info():
+    """Datos de la máquina y versiones para poder comparar ejecuciones."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmark(sizes, densities, modes, rotations, zooms, backend_names, repeat, seed, n_pages=1):
+    """Ejecuta la matriz de casos y devuelve el informe completo (dict serializable)."""
+    backends = load_backends(backend_names)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="inches_to_mm_bench_") as workdir:
+        for size, density, mode in itertools.product(sizes, densities, modes):
+            case = {"size": size, "dimensions": density, "mode": mode, "rotations": list(rotations),
+                    "pages": n_pages, "seed": seed}
+            path = os.path.join(workdir, f"{size}_{density}_{mode}.pdf")
+            truth = generate_drawing(path, size, density, rotations, mode, n_pages, seed=seed)
+            case["placed"] = len(truth)  # en páginas pequeñas pueden caber menos cotas de las pedidas
+            print(f"Caso {size} / {density} cotas / {mode}...")
+            for stage, extra, durations in bench_case(path, truth, zooms, backends, repeat, workdir):
+                results.append({"case": case, "stage": stage, **extra, **summarize(durations)})
+    for backend in backends.values():
+        backend.close()
+    return {"meta": {**environment_info(), "repeat": repeat}, "results": results}
+
+
+# ========================================================
+# ==================Precisión y latencia==================
+# ========================================================
+def parse_config(spec):
+    """'tesseract:psm=8,whitelist=0123456789.' -> ('tesseract', {'psm': 8, 'whitelist': '0123456789.'}).
+
+    Los valores se interpretan como literales de Python si es posible y no pueden contener comas.
+    """
+    name, _, options_text = spec.partition(":")
+    options = {}
+    for item in filter(None, options_text.split(",")):
+        key, _, value = item.partition("=")
+        try:
+            options[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            options[key] = value
+    return name, options
+
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso actual en MB (None si no se puede medir)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2**20
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024  # macOS en bytes, Linux en KB
+
+
+def numeric_values(text):
+    """Valores numéricos de una lectura; None si no es una cota."""
+    try:
+        return [float(v) for v in text.replace('"', " ").split()]
+    except ValueError:
+        return None
+
+
+def render_page_image(page, zoom):
+    """Render de la página como imagen PIL, igual que render_page en la aplicación."""
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+
+def accuracy_run(spec, dpi, preprocess, drawings):
+    """Lee todas las cotas de `drawings` [(ruta, verdad)] con una configuración.
+
+    Se ejecuta en un proceso propio; devuelve un dict serializable.
+    """
+    name, options = parse_config(spec)
+    zoom = dpi / 72
+    result = {"config": spec, "backend": name, "dpi": dpi, "preprocess": preprocess}
+    try:
+        start = time.perf_counter()
+        backend = create_backend(name, **options)
+        result["load_ms"] = (time.perf_counter() - start) * 1000
+    except Exception as e:
+        return {**result, "error": str(e)}
+    backend.preprocess = dict(DEFAULT_PREPROCESS) if preprocess else None
+
+    latencies, exact, numeric_errors, empty, total = [], 0, 0, 0, 0
+    warmed_up = False
+    for path, truth in drawings:
+        doc = fitz.open(path)
+        images = {}
+        for item in truth:
+            page = doc[item["page"]]
+            if item["page"] not in images:
+                images[item["page"]] = render_page_image(page, zoom)
+            image = images[item["page"]]
+            x0, y0, x1, y1 = item["rect"]
+            selection = (max(0, int((x0 - SELECTION_MARGIN) * zoom)), max(0, int((y0 - SELECTION_MARGIN) * zoom)),
+                         min(image.width, int((x1 + SELECTION_MARGIN) * zoom)),
+                         min(image.height, int((y1 + SELECTION_MARGIN) * zoom)))
+            if not warmed_up:
+                # La primera llamada carga modelos: no cuenta para la latencia
+                read_selection(backend, image, page, selection, zoom)
+                warmed_up = True
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                ocr_result = read_selection(backend, image, page, selection, zoom)
+                if ocr_result.text.strip():
+                    convert_inches_to_mm(ocr_result.text)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            text = ocr_result.text.strip()
+            total += 1
+            if not text:
+                empty += 1
+            if text == item["text"]:
+                exact += 1
+            values = numeric_values(text)
+            if values is None or len(values) != 1 or abs(values[0] - float(item["text"])) > 1e-9:
+                numeric_errors += 1
+        doc.close()
+    backend.close()
+
+    stats = summarize(latencies)
+    return {**result, "count": total, "exact_rate": exact / total if total else 0.0,
+            "numeric_error_rate": numeric_errors / total if total else 0.0,
+            "empty_rate": empty / total if total else 0.0,
+            "p50_ms": stats.get("p50_ms", 0.0), "p95_ms": stats.get("p95_ms", 0.0),
+            "peak_rss_mb": peak_rss_mb()}
+
+
+def run_accuracy(configs, dpis, preprocess_modes, sizes, densities, modes, rotations, seed, n_pages=1):
+    """Ejecuta cada configuración en un proceso nuevo sobre los mismos planos."""
+    results = []
+    with tempfile.TemporaryDirectory(prefix="inches_to_mm_acc_") as workdir:
+        drawings = []
+        for size, density, mode in itertools.product(sizes, densities, modes):
+            path = os.path.join(workdir, f"{size}_{density}_{mode}.pdf")
+            drawings.append((path, generate_drawing(path, size, density, rotations, mode, n_pages, seed=seed)))
+
+        runs = []
+        for spec in configs:
+            backend_cls = BACKENDS.get(parse_config(spec)[0])
+            if backend_cls is not None and not backend_cls.needs_image:
+                # Sin imagen, DPI y preprocesado no cambian nada: una sola ejecución
+                runs.append((spec, dpis[0], False))
+                continue
+            runs.extend((spec, dpi, pre) for dpi in dpis for pre in preprocess_modes)
+
+        context = multiprocessing.get_context("spawn")
+        for spec, dpi, pre in runs:
+            print(f"Configuración {spec} / {dpi} dpi / preprocesado {'sí' if pre else 'no'}...")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                row = pool.submit(accuracy_run, spec, dpi, pre, drawings).result()
+            if "error" in row:
+                print(f"  no disponible, se omite ({row['error']})")
+            results.append(row)
+    return {"meta": {**environment_info(), "sizes": sizes, "densities": densities, "modes": modes,
+                     "rotations": list(rotations), "seed": seed}, "accuracy": results}
+
+
+def format_accuracy_table(report):
+    """Tabla comparativa de precisión, latencia y memoria."""
+    lines = [f"{'Configuración':<34}{'DPI':>5}{'Pre':>5}{'Exacta %':>10}{'Err. num %':>12}"
+             f"{'p50 ms':>9}{'p95 ms':>9}{'RSS MB':>9}"]
+    for row in report["accuracy"]:
+        if "error" in row:
+            continue
+        rss = f"{row['peak_rss_mb']:>9.0f}" if row["peak_rss_mb"] is not None else f"{'-':>9}"
+        lines.append(f"{row['config']:<34}{row['dpi']:>5}{'sí' if row['preprocess'] else 'no':>5}"
+                     f"{row['exact_rate'] * 100:>10.1f}{row['numeric_error_rate'] * 100:>12.1f}"
+                     f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{rss}")
+    return "\n".join(lines)
+
+
+# ========================================================
+# =====================Informes===========================
+# ========================================================
+def result_key(row):
+    case = row["case"]
+    return (case["size"], case["dimensions"], case["mode"], row["stage"],
+            row.get("zoom", ""), row.get("backend", ""))
+
+
+def format_table(report):
+    """Tabla legible de un informe."""
+    lines = [f"{'Caso':<22}{'Etapa':<22}{'N':>6}{'p50 ms':>10}{'p95 ms':>10}{'Media ms':>10}"]
+    for row in report["results"]:
+        size, dims, mode, stage, zoom, backend = result_key(row)
+        detail = stage + (f" x{zoom:g}" if zoom != "" else "") + (f" [{backend}]" if backend else "")
+        prefix = f"{f'{size}/{dims}/{mode}':<22}{detail:<22}{row['count']:>6}"
+        if not row["count"]:
+            lines.append(prefix)
+            continue
+        lines.append(prefix + f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['mean_ms']:>10.2f}")
+    return "\n".join(lines)
+
+
+def compare(base, new):
+    """Compara dos informes por caso y etapa (p50); ratio > 1 significa más lento."""
+    base_rows = {result_key(r): r for r in base["results"] if r["count"]}
+    lines = [f"{'Caso':<22}{'Etapa':<22}{'Base p50':>10}{'Nuevo p50':>11}{'Ratio':>8}"]
+    for row in new["results"]:
+        key = result_key(row)
+        if key not in base_rows or not row["count"]:
+            continue
+        size, dims, mode, stage, zoom, backend = key
+        detail = stage + (f" x{zoom:g}" if zoom != "" else "") + (f" [{backend}]" if backend else "")
+        old = base_rows[key]["p50_ms"]
+        ratio = row["p50_ms"] / old if old else float("inf")
+        lines.append(f"{f'{size}/{dims}/{mode}':<22}{detail:<22}{old:>10.2f}{row['p50_ms']:>11.2f}{ratio:>8.2f}")
+    return "\n".join(lines)
+
+
+def _csv(value, cast=str):
+    return [cast(v) for v in value.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline sobre planos sintéticos.")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="Fichero JSON de resultados")
+    parser.add_argument("--sizes", default="A4,A3,A1", help=f"Tamaños de página ({','.join(PAGE_SIZES)})")
+    parser.add_argument("--densities", default="20,100", help="Cotas por página")
+    parser.add_argument("--modes", default="vector,raster", help="vector y/o raster (escaneo simulado)")
+    parser.add_argument("--rotations", default="0,90", help="Rotaciones de las etiquetas")
+    parser.add_argument("--zooms", default=",".join(f"{z:g}" for z in DEFAULT_ZOOMS))
+    parser.add_argument("--backends", default="textlayer", help="Motores OCR a medir (p. ej. textlayer,tesseract)")
+    parser.add_argument("--pages", type=int, default=1, help="Páginas por plano")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones de cada medida")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--accuracy", action="store_true", help="Mide precisión frente a latencia por configuración")
+    parser.add_argument("--configs", nargs="+", default=list(DEFAULT_CONFIGS),
+                        help="Configuraciones 'motor[:opción=valor,...]' para --accuracy")
+    parser.add_argument("--dpis", default="144,216,288", help="Resoluciones de render para --accuracy")
+    parser.add_argument("--preprocess", default="off,on", help="Preprocesado para --accuracy (off y/o on)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NUEVO"),
+                        help="Compara dos ficheros de resultados en lugar de ejecutar")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f_base, open(args.compare[1], encoding="utf-8") as f_new:
+            print(compare(json.load(f_base), json.load(f_new)))
+    elif args.accuracy:
+        report = run_accuracy(args.configs, _csv(args.dpis, int), [p == "on" for p in _csv(args.preprocess)],
+                              _csv(args.sizes), _csv(args.densities, int), _csv(args.modes),
+                              tuple(_csv(args.rotations, int)), args.seed, args.pages)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(format_accuracy_table(report))
+        print(f"Resultados guardados en {args.output}")
+    else:
+        report = run_benchmark(_csv(args.sizes), _csv(args.densities, int), _csv(args.modes),
+                               tuple(_csv(args.rotations, int)), _csv(args.zooms, float),
+                               _csv(args.backends), args.repeat, args.seed, args.pages)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(format_table(report))
+        print(f"Resultados guardados en {args.output}")
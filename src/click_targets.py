@@ -0,0 +1,98 @@
+# Clic para convertir
+# Dibujar un rectángulo ajustado alrededor de cada cota es lo más lento del
+# trabajo del operador, y los rectángulos descuidados hacen fallar el OCR.
+# En este modo un clic se resuelve a la caja de etiqueta candidata más cercana,
+# que pasa directamente a process_selection. Las cajas de una página salen:
+# 1. de la capa de texto (líneas que son cotas), sin renderizar nada;
+# 2. si no hay, del detector de cotas (geometría vectorial y, en escaneos,
+#    el detector de texto sobre la página renderizada).
+# Se calculan la primera vez que se hace clic en la página y se guardan.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+from conversion import canvas_to_pdf_rect, is_dimension_text
+from preprocessing import as_rgb
+from profiling import span
+from rendering import page_colorspace, render_page_array
+from startup import lazy_import
+
+fitz = lazy_import("fitz")  # PyMuPDF
+
+DETECT_ZOOM = 2.0       # zoom del render para el detector de imagen (como batch_convert.DEFAULT_ZOOM)
+SNAP_DISTANCE = 40      # distancia máxima (píxeles en pantalla) entre el clic y la caja elegida
+
+
+# ========================================================
+# =====================Candidatas=========================
+# ========================================================
+def text_layer_boxes(page):
+    """Cajas (Rect PDF) de las líneas de la capa de texto que son cotas."""
+    lines = {}
+    for w in page.get_text("words"):
+        key = (w[5], w[6])
+        rect, words = lines.get(key, (None, []))
+        lines[key] = (fitz.Rect(w[:4]) if rect is None else rect | fitz.Rect(w[:4]), words + [w[4]])
+    return [rect for rect, words in lines.values() if is_dimension_text(" ".join(words))]
+
+
+def detected_boxes(page, detector, zoom=DETECT_ZOOM, color_mode="auto"):
+    """Cajas (Rect PDF) del detector de cotas (ver batch_convert.create_detector)."""
+    if not getattr(detector, "needs_image", True):
+        with span("detect", page=page.number, source="vector"):
+            rects = detector(page)
+        if rects is not None:
+            return rects
+        detector = detector.fallback  # página sin geometría de cotas (escaneo)
+    if detector is None:
+        return []
+    with span("render", page=page.number, zoom=zoom):
+        image = render_page_array(page, zoom, page_colorspace(page, color_mode))
+    with span("detect", page=page.number):
+        return [canvas_to_pdf_rect(box, zoom) for box in detector(as_rgb(image))]
+
+
+def rect_distance(rect, point):
+    """Distancia de un punto a un rectángulo (0 si está dentro)."""
+    dx = max(rect.x0 - point.x, 0, point.x - rect.x1)
+    dy = max(rect.y0 - point.y, 0, point.y - rect.y1)
+    return (dx * dx + dy * dy) ** 0.5
+
+
+# ========================================================
+# ====================Clase principal=====================
+# ========================================================
+class ClickTargets:
+    """Cajas candidatas por página, calculadas al primer clic en cada una."""
+
+    def __init__(self, detector_factory):
+        self.detector_factory = detector_factory  # el detector solo se crea si la capa de texto no basta
+        self.boxes = {}  # página -> [Rect PDF]
+
+    def clear(self):
+        self.boxes = {}
+
+    def page_boxes(self, page, color_mode="auto"):
+        if page.number not in self.boxes:
+            boxes = text_layer_boxes(page)
+            if not boxes:
+                boxes = detected_boxes(page, self.detector_factory(), color_mode=color_mode)
+            self.boxes[page.number] = boxes
+            print(f"Página {page.number + 1}: {len(boxes)} cotas candidatas para clic")
+        return self.boxes[page.number]
+
+    def nearest(self, page, point, max_distance, skip=None, color_mode="auto"):
+        """Caja más cercana al punto (PDF) a menos de `max_distance`, o None.
+
+        `skip(rect)` descarta cajas (p. ej. las ya convertidas en la sesión).
+        """
+        best, best_distance = None, max_distance
+        for rect in self.page_boxes(page, color_mode):
+            if skip is not None and skip(rect):
+                continue
+            distance = rect_distance(rect, point)
+            if distance <= best_distance:
+                best, best_distance = rect, distance
+        return best
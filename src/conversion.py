@@ -0,0 +1,149 @@
+# Funciones de conversión de pulgadas a milímetros y de escritura en el PDF
+# compartidas por la aplicación gráfica y el modo por lotes.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import re
+
+from profiling import span
+from startup import lazy_import
+
+fitz = lazy_import("fitz")  # PyMuPDF
+
+# Tamaños de fuente probados al insertar el texto convertido (18, 15, 12, 9, 6)
+FONT_SIZES = range(18, 5, -3)
+
+# Texto que consiste únicamente en una o varias cotas numéricas (p. ej. '1.25', '.5"', '2 3.5')
+_DIMENSION_RE = re.compile(r'^\s*(?:\d*\.?\d+\s*"?\s*)+$')
+
+
+# ========================================================
+# =======================Conversión=======================
+# ========================================================
+def convert_inches_to_mm(text):
+    """Convierte medidas en pulgadas a milímetros."""
+    # Limpiar el texto eliminando caracteres no deseados excepto números, puntos y espacios
+    cleaned_text = re.sub(r'[^\d\.\s]', '', text.strip())
+    print(f"Texto original: '{text}'")
+    print(f"Texto limpio antes de correcciones: '{cleaned_text}'")
+    # Corregir números que empiezan por punto añadiendo un 0 antes del punto
+    cleaned_text = re.sub(r'(^|\s)\.(\d+)', r'\g<1>0.\2', cleaned_text)
+    print(f"Texto limpio: '{cleaned_text}'")
+    # Extraer números del texto
+    numbers = re.findall(r'\d+\.?\d*', cleaned_text)
+
+    if not numbers:
+        # Si no se encuentra ningún número, devolver el texto original
+        print(f"No se encontraron números en: '{text}' -> devolviendo texto original")
+        return text
+
+    converted_numbers = []
+    for num_str in numbers:
+        try:
+            # Convertir a float
+            inches = float(num_str)
+            # Convertir pulgadas a milímetros (1 pulgada = 25.4 mm)
+            mm = inches * 25.4
+            # Mantener 4 decimales
+            mm_formatted = f"{mm:.4f}"
+            converted_numbers.append(mm_formatted)
+            print(f"Conversión: {inches}\" = {mm_formatted} mm")
+        except ValueError:
+            # Si no se puede convertir, mantener el valor original
+            print(f"Error al convertir '{num_str}' -> manteniendo valor original")
+            converted_numbers.append(num_str)
+
+    # Si solo hay un número, devolver solo ese número convertido
+    if len(converted_numbers) == 1:
+        return converted_numbers[0]
+    else:
+        # Si hay múltiples números, devolverlos separados por espacios
+        return ' '.join(converted_numbers)
+
+
+def is_dimension_text(text):
+    """Indica si el texto es solo una cota numérica (candidata a convertir)."""
+    return bool(text) and _DIMENSION_RE.match(text) is not None
+
+
+# ========================================================
+# ===================Escritura en el PDF==================
+# ========================================================
+def insert_converted_text(page, rect, rect2, converted_text, rotate_angle=None):
+    """Cubre `rect` en blanco y escribe el texto convertido dentro de `rect2`.
+
+    Devuelve el tamaño de fuente usado o None si el texto no cabe ni con el mínimo.
+    """
+    if rotate_angle is None:
+        # Determinar orientación basada en aspecto
+        rotate_angle = 90 if rect2.height > rect2.width else 0
+
+    with span("page_write"):
+        page.draw_rect(rect, color=(1, 1, 1), fill=(1, 1, 1), overlay=True)
+
+    with span("textbox_fit", text=converted_text) as attrs:
+        for font_size in FONT_SIZES:
+            rc = page.insert_textbox(
+                rect2, converted_text,
+                fontsize=font_size,
+                fontname="helv",
+                color=(0, 0, 0),
+                align=fitz.TEXT_ALIGN_CENTER,
+                rotate=rotate_angle,
+                overlay=True
+            )
+            if rc >= 0:
+                if attrs is not None:
+                    attrs["fontsize"] = font_size
+                return font_size
+    return None
+
+
+def fit_textbox(shape, rect2, converted_text, rotate_angle):
+    """Escribe el texto en el Shape con el mayor de FONT_SIZES que quepa en `rect2`.
+
+    Devuelve el tamaño de fuente o None si no cabe ni con el mínimo.
+    """
+    for font_size in FONT_SIZES:
+        # Si el texto no cabe, el Shape no escribe nada y devuelve un valor negativo
+        rc = shape.insert_textbox(rect2, converted_text, fontsize=font_size, fontname="helv",
+                                  color=(0, 0, 0), align=fitz.TEXT_ALIGN_CENTER, rotate=rotate_angle)
+        if rc >= 0:
+            return font_size
+    return None
+
+
+def insert_converted_texts(page, items, white_out=True):
+    """Como insert_converted_text para varias regiones, en una sola escritura de la página.
+
+    `items` es [(rect, rect2, texto convertido, rotación o None)]. Primero se
+    cubren todas las regiones en blanco (salvo con `white_out=False`) y después
+    se escriben los textos, todo en un único Shape. Devuelve el tamaño de
+    fuente de cada región (None si no cupo).
+    """
+    shape = page.new_shape()
+    if white_out and items:
+        with span("page_write", regions=len(items)):
+            for rect, _rect2, _text, _rotate in items:
+                shape.draw_rect(rect)
+            shape.finish(color=(1, 1, 1), fill=(1, 1, 1))
+
+    font_sizes = []
+    with span("textbox_fit", regions=len(items)):
+        for _rect, rect2, converted_text, rotate_angle in items:
+            if rotate_angle is None:
+                rotate_angle = 90 if rect2.height > rect2.width else 0
+            font_sizes.append(fit_textbox(shape, rect2, converted_text, rotate_angle))
+    with span("page_write", commit=True):
+        shape.commit(overlay=True)
+    return font_sizes
+
+
+def canvas_to_pdf_rect(coords, zoom_factor):
+    """Convierte coordenadas de la imagen renderizada (con zoom) a un fitz.Rect del PDF."""
+    zoom_inv = 1.0 / zoom_factor
+    x0, y0, x1, y1 = coords
+    return fitz.Rect(x0 * zoom_inv, y0 * zoom_inv, x1 * zoom_inv, y1 * zoom_inv)
@@ -0,0 +1,459 @@
+# Servidor local de conversión
+# Otras herramientas pueden enviar PDFs a convertir sin pagar en cada
+# ejecución la carga de los modelos de PaddleOCR: el servidor mantiene un
+# conjunto de procesos con el motor OCR y el detector ya cargados y ejecuta en
+# ellos el mismo proceso que batch_convert.py.
+#
+# Uso:
+#   python conversion_server.py --workers 2 --port 8765
+#
+# Peticiones (solo desde 127.0.0.1):
+#   POST /convert  con un PDF en el cuerpo (Content-Type: application/pdf)
+#                  o un JSON {"path": "plano.pdf", "output": "plano_mm.pdf"}
+#                  (Content-Type: application/json; `output` en la carpeta
+#                  del PDF y sin sobrescribir ficheros que no haya creado el servidor)
+#                  La respuesta es un flujo de líneas JSON con el progreso:
+#                  {"event": "queued"}, {"event": "page", "page": 3, "pages": 10, ...},
+#                  {"event": "done", ...} o {"event": "error", ...}
+#   GET  /jobs/<id>/result  PDF convertido de un trabajo enviado como fichero
+#   GET  /status            trabajos en cola, en curso y motores del conjunto
+#
+# Solo clientes locales que no sean un navegador: se rechazan las conexiones
+# de otras direcciones, las peticiones con cabecera Origin (una página web
+# abierta en el navegador) y las que no van dirigidas a localhost en Host
+# (DNS rebinding).
+#
+# Concurrencia y contrapresión: como mucho --workers conversiones a la vez y
+# --max-pending trabajos admitidos; por encima se responde 503 con Retry-After.
+#
+# Limpieza: el PDF recibido se borra al terminar su conversión y el resultado
+# al descargarlo (se descarga una vez). Los trabajos terminados se olvidan, y
+# sus ficheros se borran, pasados --job-ttl segundos aunque nadie los pida.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_convert import DEFAULT_ZOOM, DETECTORS, convert_document, create_detector
+from ocr_backends import BACKENDS, create_backend
+from preprocessing import DEFAULT_PREPROCESS
+from rendering import COLOR_MODES
+
+HOST = "127.0.0.1"      # solo local: nunca se escucha en otras interfaces
+LOCAL_HOSTNAMES = ("127.0.0.1", "localhost", "::1")
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 8
+MAX_UPLOAD_MB = 512
+RETRY_AFTER_S = 5
+MAX_HEADER_LINES = 100
+JOB_TTL_S = 3600         # tiempo que se guarda un trabajo terminado (y su resultado) sin descargar
+SWEEP_S = 60             # cada cuánto se buscan trabajos caducados
+
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 415: "Unsupported Media Type", 503: "Service Unavailable"}
+
+
+# ========================================================
+# ===============Procesos con el motor cargado============
+# ========================================================
+_engine = None    # (motor OCR, detector) del proceso
+_events = None    # cola compartida con el servidor para el progreso
+
+
+def _init_worker(backend_name, options, detector_kind, events):
+    """Carga el motor OCR y el detector una sola vez por proceso.
+
+    Con "auto" el detector de imagen de PaddleOCR se carga con el primer
+    escaneo, nunca en PDFs vectoriales (ni hace falta tener paddleocr).
+    """
+    global _engine, _events
+    _events = events
+    _engine = (create_backend(backend_name, **options), create_detector(detector_kind))
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _run_job(job_id, input_path, output_path, zoom, color_mode, use_session):
+    """Convierte un PDF en el proceso y va publicando el progreso por páginas.
+
+    El final (o el error) se publica por la misma cola que el progreso para
+    que el cliente lo reciba siempre después de la última página.
+    """
+    backend, detector = _engine
+
+    def progress(page, pages, converted):
+        _events.put((job_id, {"event": "page", "page": page, "pages": pages, "converted": converted}))
+
+    _events.put((job_id, {"event": "started", "pid": os.getpid()}))
+    try:
+        converted = convert_document(input_path, output_path, backend, detector, zoom=zoom,
+                                     color_mode=color_mode, use_session=use_session, progress=progress)
+    except Exception as e:
+        traceback.print_exc()
+        _events.put((job_id, {"event": "error", "message": str(e)}))
+        return
+    _events.put((job_id, {"event": "done", "converted": converted}))
+
+
+# ========================================================
+# =====================Trabajos===========================
+# ========================================================
+class Job:
+    """Una conversión enviada al servidor."""
+
+    def __init__(self, job_id, input_path, output_path, upload):
+        self.id = job_id
+        self.input_path = input_path
+        self.output_path = output_path
+        self.upload = upload          # el PDF llegó en la petición (el resultado se descarga por /jobs)
+        self.status = "queued"
+        self.finished_at = None       # time.monotonic() del final (para la caducidad)
+        self.events = asyncio.Queue()
+
+    def publish(self, event):
+        event = dict(event, job=self.id)
+        if event["event"] == "done":
+            event["result"] = f"/jobs/{self.id}/result" if self.upload else self.output_path
+        if event["event"] in ("started", "done", "error"):
+            self.status = {"started": "running"}.get(event["event"], event["event"])
+        if event["event"] in ("done", "error"):
+            self.finished_at = time.monotonic()
+        self.events.put_nowait(event)
+
+    def remove_files(self, output=True):
+        """Borra el PDF recibido y, con `output`, el resultado (solo de los trabajos subidos por HTTP)."""
+        if not self.upload:
+            return
+        for path in (self.input_path, self.output_path) if output else (self.input_path,):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"No se pudo borrar {path}: {e}")
+
+
+class ConversionServer:
+    """Servidor HTTP mínimo (asyncio) delante de un conjunto de procesos de conversión."""
+
+    def __init__(self, backend_name="paddleocr", options=None, workers=DEFAULT_WORKERS,
+                 max_pending=DEFAULT_MAX_PENDING, work_dir=None, zoom=DEFAULT_ZOOM, color_mode="auto",
+                 detector="auto", job_ttl=JOB_TTL_S):
+        self.backend_name = backend_name
+        self.options = options or {}
+        self.detector = detector
+        self.workers = workers
+        self.max_pending = max_pending
+        self.work_dir = work_dir
+        self.zoom = zoom
+        self.color_mode = color_mode
+        self.job_ttl = job_ttl
+        self.jobs = {}
+        self.outputs = set()  # resultados escritos por el servidor (los únicos que se pueden sobrescribir)
+        self.pending = 0      # trabajos admitidos que aún no han terminado
+        self.pool = None
+        self.manager = None
+        self.loop = None
+
+    # -------------------- Arranque --------------------
+    async def start(self, port=DEFAULT_PORT):
+        self.loop = asyncio.get_running_loop()
+        context = multiprocessing.get_context("spawn")
+        self.manager = context.Manager()
+        events = self.manager.Queue()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                                        initargs=(self.backend_name, self.options, self.detector, events))
+        threading.Thread(target=self._forward_events, args=(events,), daemon=True, name="events").start()
+
+        print(f"Cargando {self.workers} motores '{self.backend_name}'...")
+        pids = await asyncio.gather(*(self.loop.run_in_executor(self.pool, _warm_up)
+                                      for _ in range(self.workers)))
+        print(f"Motores listos (procesos {', '.join(str(p) for p in sorted(set(pids)))})")
+
+        asyncio.ensure_future(self._expire_jobs())
+        server = await asyncio.start_server(self.handle, HOST, port)
+        print(f"Escuchando en http://{HOST}:{port}")
+        return server
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+        if self.manager is not None:
+            self.manager.shutdown()
+
+    def _forward_events(self, events):
+        """Pasa el progreso de los procesos a las colas de los trabajos (en el bucle de asyncio)."""
+        while True:
+            try:
+                job_id, event = events.get()
+            except (EOFError, OSError):
+                return  # gestor cerrado
+            job = self.jobs.get(job_id)
+            if job is not None:
+                self.loop.call_soon_threadsafe(job.publish, event)
+
+    def forget(self, job):
+        """Quita el trabajo de la tabla y borra sus ficheros."""
+        self.jobs.pop(job.id, None)
+        job.remove_files()
+
+    async def _expire_jobs(self):
+        """Olvida los trabajos terminados hace más de `job_ttl` segundos (el servidor no crece sin límite)."""
+        while True:
+            await asyncio.sleep(min(SWEEP_S, self.job_ttl))
+            now = time.monotonic()
+            for job in list(self.jobs.values()):
+                if job.finished_at is not None and now - job.finished_at > self.job_ttl:
+                    self.forget(job)
+
+    # -------------------- Conversión --------------------
+    async def run(self, job, use_session):
+        try:
+            await self.loop.run_in_executor(self.pool, _run_job, job.id, job.input_path, job.output_path,
+                                            self.zoom, self.color_mode, use_session)
+        except Exception as e:
+            # El proceso no llegó a informar (p. ej. se cayó): el error se publica desde aquí
+            traceback.print_exc()
+            job.publish({"event": "error", "message": str(e)})
+        finally:
+            self.pending -= 1
+            job.remove_files(output=False)  # el PDF recibido ya no hace falta
+
+    # -------------------- HTTP --------------------
+    async def handle(self, reader, writer):
+        try:
+            peer = writer.get_extra_info("peername")
+            if peer and peer[0] not in ("127.0.0.1", "::1"):
+                await self.respond(writer, 403, {"error": "solo se admiten conexiones locales"})
+                return
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, path, headers, body = request
+            if "origin" in headers or not is_local_host(headers.get("host", "")):
+                # Un navegador (página web o DNS rebinding): nunca se atiende
+                await self.respond(writer, 403, {"error": "solo se admiten clientes locales sin navegador"})
+                return
+            if path == "/status" and method == "GET":
+                await self.respond(writer, 200, self.status())
+            elif path == "/convert":
+                if method != "POST":
+                    await self.respond(writer, 405, {"error": "use POST"})
+                else:
+                    await self.convert(writer, headers, body)
+            elif path.startswith("/jobs/") and path.endswith("/result") and method == "GET":
+                await self.send_result(writer, path[len("/jobs/"):-len("/result")])
+            else:
+                await self.respond(writer, 404, {"error": f"ruta desconocida: {path}"})
+        except HTTPError as e:
+            await self.respond(writer, e.status, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # el cliente se ha ido; la conversión sigue
+        finally:
+            writer.close()
+
+    def status(self):
+        states = {}
+        for job in self.jobs.values():
+            states[job.status] = states.get(job.status, 0) + 1
+        return {"backend": self.backend_name, "workers": self.workers, "pending": self.pending,
+                "max_pending": self.max_pending, "jobs": states}
+
+    async def convert(self, writer, headers, body):
+        if self.pending >= self.max_pending:
+            await self.respond(writer, 503, {"error": "servidor ocupado, reintente más tarde"},
+                               extra_headers={"Retry-After": str(RETRY_AFTER_S)})
+            return
+
+        job_id = uuid.uuid4().hex[:12]
+        if headers.get("content-type", "").startswith("application/pdf"):
+            if not body.startswith(b"%PDF"):
+                raise HTTPError(400, "el cuerpo no es un PDF")
+            input_path = os.path.join(self.work_dir, f"{job_id}.pdf")
+            with open(input_path, "wb") as f:
+                f.write(body)
+            job = Job(job_id, input_path, os.path.join(self.work_dir, f"{job_id}_mm.pdf"), upload=True)
+            use_session = False  # la sesión iría a la carpeta temporal: no sirve de nada
+        elif headers.get("content-type", "").startswith("application/json"):
+            try:
+                params = json.loads(body or b"{}")
+                input_path = os.path.realpath(params["path"])
+            except (ValueError, KeyError, TypeError):
+                raise HTTPError(400, 'envíe un JSON {"path": ...}')
+            if not os.path.isfile(input_path):
+                raise HTTPError(400, f"no existe: {input_path}")
+            job = Job(job_id, input_path, self.output_path(input_path, params.get("output")), upload=False)
+            self.outputs.add(job.output_path)
+            use_session = params.get("session", True)
+        else:
+            raise HTTPError(415, "envíe un PDF (application/pdf) o un JSON (application/json)")
+
+        self.jobs[job_id] = job
+        self.pending += 1
+        job.publish({"event": "queued", "position": self.pending})
+        asyncio.ensure_future(self.run(job, use_session))
+
+        # Respuesta en trozos: una línea JSON por evento hasta el final del trabajo
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        while True:
+            event = await job.events.get()
+            line = json.dumps(event).encode() + b"\n"
+            writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+            await writer.drain()  # contrapresión: un cliente lento frena el envío, no la conversión
+            if event["event"] in ("done", "error"):
+                break
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def output_path(self, input_path, output=None):
+        """Ruta del resultado: en la carpeta del PDF, con extensión .pdf y sin pisar ficheros ajenos."""
+        folder = os.path.dirname(input_path)
+        if output is None:
+            output_path = os.path.splitext(input_path)[0] + "_mm.pdf"
+        elif not isinstance(output, str):
+            raise HTTPError(400, "`output` debe ser un nombre de fichero")
+        else:
+            output_path = os.path.realpath(os.path.join(folder, output))
+            if os.path.dirname(output_path) != folder:
+                raise HTTPError(400, "`output` debe estar en la carpeta del PDF de entrada")
+        if not output_path.lower().endswith(".pdf") or output_path == input_path:
+            raise HTTPError(400, "`output` debe ser otro fichero .pdf")
+        if any(job.output_path == output_path and job.status in ("queued", "running")
+               for job in self.jobs.values()):
+            raise HTTPError(409, f"ya hay una conversión en curso hacia {output_path}")
+        if os.path.lexists(output_path) and output_path not in self.outputs:
+            raise HTTPError(409, f"ya existe y no lo ha creado el servidor: {output_path}")
+        return output_path
+
+    async def send_result(self, writer, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or not job.upload:
+            raise HTTPError(404, f"trabajo desconocido: {job_id}")
+        if job.status != "done":
+            raise HTTPError(409, f"el trabajo está en estado '{job.status}'")
+        with open(job.output_path, "rb") as f:
+            data = f.read()
+        self.forget(job)  # descargado: el resultado ya no se guarda
+        await self.respond(writer, 200, data, content_type="application/pdf")
+
+    async def respond(self, writer, status, payload, content_type="application/json", extra_headers=None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        headers = {"Content-Type": content_type, "Content-Length": str(len(body)), "Connection": "close"}
+        headers.update(extra_headers or {})
+        head = f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+# ========================================================
+# ===================Lectura de peticiones================
+# ========================================================
+def is_local_host(host):
+    """True si la cabecera Host (con o sin puerto) nombra esta máquina."""
+    if host.startswith("["):
+        name = host[1:].partition("]")[0]  # [::1]:8765
+    else:
+        name = host.rpartition(":")[0] if host.count(":") == 1 else host
+    return name.lower() in LOCAL_HOSTNAMES
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def read_request(reader):
+    """Lee una petición HTTP/1.1: (método, ruta, cabeceras en minúsculas, cuerpo) o None si no hay nada."""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, path, _version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "línea de petición incorrecta")
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(400, "demasiadas cabeceras")
+
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise HTTPError(400, "Content-Length no es un número")
+    if length < 0:
+        raise HTTPError(400, "Content-Length negativo")
+    if length > MAX_UPLOAD_MB * 1024 * 1024:
+        raise HTTPError(413, f"el PDF supera {MAX_UPLOAD_MB} MB")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path.split("?", 1)[0], headers, body
+
+
+# ========================================================
+# ==========================Main==========================
+# ========================================================
+async def serve(args):
+    options = {"preprocess": None if args.no_preprocess else dict(DEFAULT_PREPROCESS)}
+    if args.backend == "paddleocr":
+        options["batch_size"] = args.batch_size
+    if args.work_dir:
+        os.makedirs(args.work_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="inches_to_mm_") as tmp_dir:
+        app = ConversionServer(args.backend, options, workers=args.workers, max_pending=args.max_pending,
+                               work_dir=args.work_dir or tmp_dir, zoom=args.zoom, color_mode=args.color,
+                               detector=args.detector, job_ttl=args.job_ttl)
+        try:
+            server = await app.start(args.port)
+            async with server:
+                await server.serve_forever()
+        finally:
+            app.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local de conversión de cotas con motores OCR precargados.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Puerto en 127.0.0.1")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Procesos con motor cargado (conversiones simultáneas)")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="Trabajos admitidos a la vez (en curso + en cola); por encima se responde 503")
+    parser.add_argument("--work-dir", help="Carpeta para los PDFs recibidos y sus resultados (por defecto temporal)")
+    parser.add_argument("--job-ttl", type=float, default=JOB_TTL_S,
+                        help="Segundos que se guarda un trabajo terminado sin descargar su resultado")
+    parser.add_argument("--zoom", type=float, default=DEFAULT_ZOOM, help="Zoom de renderizado para el OCR")
+    parser.add_argument("--color", choices=COLOR_MODES, default="auto",
+                        help="Renderizado en gris, en color o según la página (auto)")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="paddleocr", help="Motor OCR")
+    parser.add_argument("--detector", choices=DETECTORS, default="auto",
+                        help="Localización de las cotas: geometría vectorial, detector de texto sobre la "
+                             "imagen o geometría con el detector de respaldo (auto)")
+    parser.add_argument("--batch-size", type=int, default=16, help="Recortes por llamada al motor OCR (PaddleOCR)")
+    parser.add_argument("--no-preprocess", action="store_true", help="Desactiva el preprocesado de los recortes")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("Servidor detenido.")
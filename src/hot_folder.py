@@ -0,0 +1,302 @@
+# Carpeta vigilada (modo demonio)
+# El sistema de gestión documental deja los planos en una carpeta compartida;
+# este script la vigila y convierte cada PDF nuevo con el mismo proceso que
+# batch_convert.py, sin interfaz gráfica.
+#
+# Uso:
+#   python hot_folder.py entrada/ salida/ --cpu-budget 8
+#
+# - Un PDF se procesa cuando su tamaño y fecha dejan de cambiar entre dos
+#   sondeos (el fichero ya se ha terminado de copiar).
+# - En la salida se escriben <nombre>_mm.pdf y <nombre>_mm.report.json.
+# - El índice salida/.processed.json guarda el hash SHA-256 de cada fichero
+#   tratado: al reiniciar no se repite nada, y un mismo plano con otro nombre
+#   tampoco se vuelve a pasar por el OCR: se copian su PDF convertido y su
+#   informe con el nombre nuevo. Si un fichero se interrumpe a medias, su
+#   sesión (ver session.py) permite reanudarlo sin repetir el OCR hecho. Las
+#   sesiones se guardan en salida/.sessions, nunca en la carpeta vigilada.
+# - Un fichero que no se puede leer se da por fallido hasta que cambie.
+# - Se convierten varios ficheros a la vez, tantos como quepan en el
+#   presupuesto de CPU (--cpu-budget / --threads-per-job).
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from batch_convert import DEFAULT_ZOOM, convert_document_streaming, create_detector
+from ocr_backends import BACKENDS, create_backend
+from preprocessing import DEFAULT_PREPROCESS
+from rendering import COLOR_MODES
+from session import Session, file_hash
+
+INDEX_NAME = ".processed.json"
+SESSIONS_DIR = ".sessions"  # sesiones de los ficheros en curso, por hash, dentro de la salida
+POLL_S = 2.0              # intervalo entre sondeos de la carpeta de entrada
+DEFAULT_THREADS_PER_JOB = 2
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "OMP_THREAD_LIMIT")
+
+
+# ========================================================
+# ====================Índice de ficheros==================
+# ========================================================
+class ProcessedIndex:
+    """Ficheros ya tratados, por hash: {sha256: {"name", "output", "report", "status", ...}}."""
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, INDEX_NAME)
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Índice ilegible, se empieza uno nuevo ({e})")
+
+    def __contains__(self, doc_hash):
+        return doc_hash in self.entries
+
+    def record(self, doc_hash, entry):
+        self.entries[doc_hash] = entry
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+# ========================================================
+# ==================Procesos de conversión================
+# ========================================================
+_engine = None  # (motor OCR, detector) del proceso
+
+
+def _init_worker(backend_name, options, threads):
+    """Limita los hilos del proceso (antes de cargar los modelos) y carga el motor una sola vez."""
+    global _engine
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    _engine = (create_backend(backend_name, **options), create_detector("auto"))
+
+
+def _write_report(report_path, report):
+    tmp_path = report_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, report_path)
+
+
+def _convert_file(input_path, output_path, report_path, doc_hash, zoom, color_mode, session_path):
+    """Convierte un fichero y escribe su informe. Devuelve la entrada del índice."""
+    backend, detector = _engine
+    use_session = session_path is not None
+    pages = []
+    start = time.time()
+    # Página a página: varios archivos de cientos de páginas a la vez sin agotar la memoria
+    converted = convert_document_streaming(input_path, output_path, backend, detector, zoom=zoom,
+                                           color_mode=color_mode, use_session=use_session,
+                                           session_path=session_path,
+                                           progress=lambda page, total, n: pages.append({"page": page,
+                                                                                         "converted": n}))
+    report = {
+        "input": os.path.basename(input_path),
+        "output": os.path.basename(output_path),
+        "sha256": doc_hash,
+        "backend": backend.name,
+        "converted": converted,
+        "pages": pages,
+        "seconds": round(time.time() - start, 2),
+        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if use_session:
+        # Cotas en las que los motores no coincidieron: conviene revisarlas a mano
+        session = Session.open(input_path, session_path)
+        report["flagged"] = [{"page": e["page"] + 1, "source_text": e["source_text"],
+                              "converted_text": e["converted_text"], "rect": e["rect"]}
+                             for e in session.edits if e.get("flagged")]
+    _write_report(report_path, report)
+    return {"name": report["input"], "output": report["output"], "report": os.path.basename(report_path),
+            "status": "done", "converted": converted, "finished": report["finished"]}
+
+
+# ========================================================
+# ======================Vigilancia========================
+# ========================================================
+class HotFolder:
+    """Vigila `input_dir` y convierte los PDFs nuevos en `output_dir`."""
+
+    def __init__(self, input_dir, output_dir, backend_name="paddleocr", options=None, workers=1,
+                 threads_per_job=DEFAULT_THREADS_PER_JOB, zoom=DEFAULT_ZOOM, color_mode="auto", use_session=True):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.backend_name = backend_name
+        self.options = options or {}
+        self.workers = workers
+        self.threads_per_job = threads_per_job
+        self.zoom = zoom
+        self.color_mode = color_mode
+        self.use_session = use_session
+        os.makedirs(output_dir, exist_ok=True)
+        self.sessions_dir = os.path.join(output_dir, SESSIONS_DIR)
+        if use_session:
+            os.makedirs(self.sessions_dir, exist_ok=True)
+        self.index = ProcessedIndex(output_dir)
+        self.sizes = {}       # ruta -> (tamaño, mtime) del último sondeo
+        self.skipped = {}     # ruta -> (tamaño, mtime) de ficheros ya vistos en el índice
+        self.running = {}     # futuro -> (ruta, hash)
+
+    def scan(self):
+        """PDFs de la entrada que ya no cambian y aún no se han tratado ni están en curso."""
+        ready = []
+        busy = {path for path, _ in self.running.values()}
+        names = sorted(os.listdir(self.input_dir))
+        present = {os.path.join(self.input_dir, name) for name in names}
+        self.sizes = {path: sig for path, sig in self.sizes.items() if path in present}  # olvidar los borrados
+        for name in names:
+            path = os.path.join(self.input_dir, name)
+            if not name.lower().endswith(".pdf") or path in busy or not os.path.isfile(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # borrado entre listdir y stat
+            signature = (stat.st_size, stat.st_mtime)
+            if self.skipped.get(path) == signature:
+                continue
+            previous, self.sizes[path] = self.sizes.get(path), signature
+            if previous == signature:
+                ready.append(path)
+        return ready
+
+    def output_paths(self, path):
+        """(PDF convertido, informe) de un fichero de entrada."""
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return (os.path.join(self.output_dir, f"{stem}_mm.pdf"),
+                os.path.join(self.output_dir, f"{stem}_mm.report.json"))
+
+    def submit(self, pool, path):
+        try:
+            doc_hash = file_hash(path)
+        except OSError as e:
+            # Fallido hasta que el fichero cambie; si se quedara en `sizes`, --once no terminaría
+            print(f"No se pudo leer {path}: {e}")
+            self.skipped[path] = self.sizes.pop(path, None)
+            return
+        if any(doc_hash == running_hash for _, running_hash in self.running.values()):
+            return  # copia de un fichero que ya se está convirtiendo: se decide cuando termine
+        output_path, report_path = self.output_paths(path)
+        if doc_hash in self.index:
+            entry = self.index.entries[doc_hash]
+            name = os.path.basename(path)
+            if entry["status"] == "done" and not os.path.exists(output_path):
+                if self.copy_result(entry, name, output_path, report_path, doc_hash):
+                    self.skipped[path] = self.sizes.pop(path)
+                    return
+                # Sin el resultado original no hay nada que copiar: se convierte de nuevo
+            else:
+                print(f"Ya tratado ({entry['status']}): {name} -> {entry.get('output')}")
+                self.skipped[path] = self.sizes.pop(path)
+                return
+        session_path = os.path.join(self.sessions_dir, f"{doc_hash}.json") if self.use_session else None
+        future = pool.submit(_convert_file, path, output_path, report_path, doc_hash, self.zoom,
+                             self.color_mode, session_path)
+        self.running[future] = (path, doc_hash)
+        print(f"En cola: {os.path.basename(path)}")
+
+    def copy_result(self, entry, name, output_path, report_path, doc_hash):
+        """Mismo contenido con otro nombre: copia el PDF convertido y el informe. Devuelve si se ha podido."""
+        source_output = os.path.join(self.output_dir, entry["output"])
+        source_report = os.path.join(self.output_dir, entry["report"])
+        try:
+            with open(source_report, encoding="utf-8") as f:
+                report = json.load(f)
+            shutil.copyfile(source_output, output_path + ".tmp")
+            os.replace(output_path + ".tmp", output_path)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo reutilizar la conversión de {entry['name']}: {e}")
+            return False
+        report.update(input=name, output=os.path.basename(output_path), copy_of=entry["name"],
+                      finished=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        _write_report(report_path, report)
+        entry.setdefault("copies", []).append(name)
+        self.index.record(doc_hash, entry)
+        print(f"Copia de {entry['name']}: {name} -> {os.path.basename(output_path)}")
+        return True
+
+    def finish(self, future):
+        path, doc_hash = self.running.pop(future)
+        try:
+            entry = future.result()
+            print(f"Convertido: {entry['name']} ({entry['converted']} cotas) -> {entry['output']}")
+        except Exception as e:
+            # Se anota para no reintentarlo en bucle; si el fichero cambia, cambia su hash y se reintenta
+            traceback.print_exc()
+            entry = {"name": os.path.basename(path), "status": "error", "error": str(e),
+                     "finished": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        self.index.record(doc_hash, entry)
+        self.skipped[path] = self.sizes.pop(path, None)
+
+    def run(self, once=False):
+        """Bucle principal. Con `once` termina cuando no queda nada pendiente en la entrada."""
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(self.backend_name, self.options, self.threads_per_job)) as pool:
+            print(f"Vigilando {self.input_dir} ({self.workers} conversiones a la vez)")
+            while True:
+                for path in self.scan():
+                    if len(self.running) >= self.workers * 2:
+                        break  # cola corta: el resto se recoge en el siguiente sondeo
+                    self.submit(pool, path)
+                if self.running:
+                    done, _ = wait(list(self.running), timeout=POLL_S, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.finish(future)
+                elif once and not self.sizes:
+                    return
+                else:
+                    time.sleep(POLL_S)
+
+
+def workers_for_budget(cpu_budget, threads_per_job):
+    """Conversiones simultáneas que caben en el presupuesto de CPU (al menos una)."""
+    return max(1, cpu_budget // max(1, threads_per_job))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vigila una carpeta y convierte a milímetros los PDFs que llegan.")
+    parser.add_argument("input_dir", help="Carpeta de entrada")
+    parser.add_argument("output_dir", help="Carpeta de salida (PDFs convertidos, informes e índice)")
+    parser.add_argument("--cpu-budget", type=int, default=os.cpu_count() or 1,
+                        help="Núcleos que puede usar el demonio en total")
+    parser.add_argument("--threads-per-job", type=int, default=DEFAULT_THREADS_PER_JOB,
+                        help="Hilos de cálculo de cada conversión")
+    parser.add_argument("--once", action="store_true", help="Procesa lo que haya y termina")
+    parser.add_argument("--zoom", type=float, default=DEFAULT_ZOOM, help="Zoom de renderizado para el OCR")
+    parser.add_argument("--color", choices=COLOR_MODES, default="auto",
+                        help="Renderizado en gris, en color o según la página (auto)")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="paddleocr", help="Motor OCR")
+    parser.add_argument("--batch-size", type=int, default=16, help="Recortes por llamada al motor OCR (PaddleOCR)")
+    parser.add_argument("--no-preprocess", action="store_true", help="Desactiva el preprocesado de los recortes")
+    parser.add_argument("--no-session", action="store_true",
+                        help="No usar ni actualizar la sesión de cada PDF (en salida/.sessions, por hash)")
+    args = parser.parse_args()
+
+    options = {"preprocess": None if args.no_preprocess else dict(DEFAULT_PREPROCESS)}
+    if args.backend == "paddleocr":
+        options["batch_size"] = args.batch_size
+    folder = HotFolder(args.input_dir, args.output_dir, args.backend, options,
+                       workers=workers_for_budget(args.cpu_budget, args.threads_per_job),
+                       threads_per_job=args.threads_per_job, zoom=args.zoom, color_mode=args.color,
+                       use_session=not args.no_session)
+    try:
+        folder.run(once=args.once)
+    except KeyboardInterrupt:
+        print("Detenido. Los ficheros a medias se reanudan en el próximo arranque.")
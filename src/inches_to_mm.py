@@ -9,28 +9,51 @@
 # ========================================================
 # =======================Librerías========================
 # ========================================================
+import startup  # lo primero: mide las importaciones con --startup-profile
+
+if __name__ == "__main__":
+    startup.begin_startup_profile()
+
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
-import fitz  # PyMuPDF
 import os
 import time
-import numpy as np
-from paddleocr import PaddleOCR
+
+from conversion import canvas_to_pdf_rect, convert_inches_to_mm, insert_converted_text, insert_converted_texts
+from batch_convert import convert_page, create_detector
+from click_targets import SNAP_DISTANCE, ClickTargets
+from ocr_backends import BACKENDS, create_backend
+from preprocessing import DEFAULT_PREPROCESS
+from profiling import profiler, span
+from render_server import ENABLED as RENDER_SERVER_ENABLED, POLL_MS as RENDER_POLL_MS, RenderClient
+from rendering import COLOR_MODES, page_colorspace
+from selection import read_selection, selection_region, selection_rects
+from session import Session
+from speculative_ocr import SPECULATIVE_DELAY_MS, SpeculativeOCR
+from text_rewrite import rewrite_dimension_text
+from startup import lazy_import, report_when_interactive
+from thumbnails import ThumbnailSidebar
+from tiled_view import DEFAULT_PIXEL_BUDGET, ContinuousDocumentView, PageClipImage, TiledPageView, format_bytes
+
+fitz = lazy_import("fitz")  # PyMuPDF
+
+# Duración de un fotograma (ms): el panning aplica como mucho un desplazamiento por fotograma
+FRAME_MS = 16
+SHIFT_MASK = 0x0001  # bit de event.state con la tecla mayúsculas pulsada
 
 # ========================================================
 # ====================Clase principal=====================
 # ========================================================
 class InchesToMMConverter:
-    def __init__(self, root):
+    def __init__(self, root, ocr_backend='paddleocr', **backend_options):
         self.root = root
         self.root.title("Inches to MM Converter")
         self.root.geometry("1920x1080")
 
         self.pdf_document = None
+        self.session = None  # sesión guardada junto al PDF (ver session.py)
         self.current_page = 0
-        self.current_pil_image = None # Imagen renderizada
-        self.current_tk_image = None
+        self.current_pil_image = None # Imagen renderizada (o PageClipImage si la página va en teselas)
 
         # Coordenadas del rectángulo
         self.rect_start_x = None
@@ -39,6 +62,13 @@ class InchesToMMConverter:
         self.rect_end_y = None
         self.current_rect_id = None
 
+        # Cola de selecciones (mayúsculas + arrastrar): se convierten todas juntas con OCR por lotes
+        self.selection_queue = []  # [(página, fitz.Rect PDF de la selección)]
+
+        # OCR especulativo del rectángulo mientras se arrastra (ver speculative_ocr.py)
+        self.speculative_ocr = SpeculativeOCR()
+        self._speculative_after_id = None
+
         # Atributos del zoom
         self.min_area = 10 
         self.zoom_factor = 1.0
@@ -46,22 +76,53 @@ class InchesToMMConverter:
         self.min_zoom = 0.2
         self.max_zoom = 5.0
 
+        # Presupuesto de píxeles por raster: por encima, la página se pinta en teselas
+        self.pixel_budget = DEFAULT_PIXEL_BUDGET
+        self.oversize_strategy = "tiles"  # "tiles" o "cap" (limitar el zoom efectivo)
+
+        # Color de renderizado: "auto" usa un solo canal gris en las páginas monocromas
+        self.color_mode = tk.StringVar(value="auto")
+        self.page_colorspaces = {}  # página -> espacio de color detectado en modo "auto"
+
+        # Vista continua: todas las páginas en vertical, renderizando solo las visibles
+        self.continuous_view = tk.BooleanVar(value=False)
+
         # Atributos del panning
         self.pan_start_x = 0
         self.pan_start_y = 0
         self.inital_pan_scroll_xfrac = 0.0
         self.inital_pan_scroll_yfrac = 0.0
         self.is_panning = False
+        self._pan_pointer = None        # última posición del ratón aún no aplicada
+        self._pan_after_id = None       # desplazamiento programado para el próximo fotograma
+        self._visible_update_id = None  # actualización de teselas/páginas programada
 
         # Pila de deshacer
         self.undo_stack = []  # [(page_number, fitz.Rect, text, rotation)]
 
-        # PaddleOCR
-        self.ocr_engine = None
+        # Preprocesado de los recortes antes del OCR (ver preprocessing.DEFAULT_PREPROCESS)
+        self.preprocess_config = dict(DEFAULT_PREPROCESS)
+        self.preprocess_enabled = tk.BooleanVar(value=True)
+
+        # Motor OCR (ver ocr_backends.BACKENDS), seleccionable en tiempo de ejecución
         self.target_language = 'en'
         self.ocr_model_version = 'PP-OCRv5'
         self.text_recognition_ = 'PP-OCRv5_mobile_rec'
-        self.initialize_ocr()
+        self.ocr_batch_size = 16
+        self.backend_options = {ocr_backend: backend_options}  # opciones extra por motor
+        self.ocr_backend_name = tk.StringVar(value=ocr_backend)
+        self.ocr_backends = {}  # motores ya cargados, para no recargar modelos al cambiar
+        self.ocr_backend = None  # se carga al primer uso (ver get_ocr_backend) para abrir la ventana antes
+
+        # Detector de texto para "Convertir página" y el clic para convertir: se carga al primer uso
+        self.text_detector = None
+
+        # Clic para convertir: un clic se ajusta a la cota candidata más cercana (ver click_targets.py)
+        self.click_mode = tk.BooleanVar(value=False)
+        self.click_targets = ClickTargets(self.get_text_detector)
+
+        # Reescribir texto: las cotas que son texto del PDF se cambian en el propio contenido (ver text_rewrite.py)
+        self.rewrite_mode = tk.BooleanVar(value=False)
 
         # Frames
         controls_frame = tk.Frame(root)
@@ -80,15 +141,58 @@ class InchesToMMConverter:
         self.lbl_page = tk.Label(controls_frame, text="Página: -/-")
         self.lbl_page.pack(side=tk.LEFT, padx=5)
 
+        self.lbl_memory = tk.Label(controls_frame, text="Raster: -")
+        self.lbl_memory.pack(side=tk.LEFT, padx=5)
+
         self.btn_next = tk.Button(controls_frame, text="Página Siguiente", command=self.next_page, state = tk.DISABLED)
         self.btn_next.pack(side=tk.LEFT, padx=5)
 
         self.btn_save = tk.Button(controls_frame, text="Guardar PDF", command=self.save_pdf, state = tk.DISABLED)
         self.btn_save.pack(side=tk.LEFT, padx=5)
 
+        self.btn_convert_page = tk.Button(controls_frame, text="Convertir página", command=self.convert_all_on_page, state = tk.DISABLED)
+        self.btn_convert_page.pack(side=tk.LEFT, padx=5)
+
+        self.btn_convert_queue = tk.Button(controls_frame, text="Convertir selecciones (0)",
+                                           command=self.convert_selection_queue, state=tk.DISABLED)
+        self.btn_convert_queue.pack(side=tk.LEFT, padx=5)
+
+        self.chk_continuous = tk.Checkbutton(controls_frame, text="Vista continua", variable=self.continuous_view,
+                                             command=self.toggle_continuous_view)
+        self.chk_continuous.pack(side=tk.LEFT, padx=5)
+
+        self.chk_click = tk.Checkbutton(controls_frame, text="Clic para convertir", variable=self.click_mode)
+        self.chk_click.pack(side=tk.LEFT, padx=5)
+
+        self.chk_rewrite = tk.Checkbutton(controls_frame, text="Reescribir texto", variable=self.rewrite_mode)
+        self.chk_rewrite.pack(side=tk.LEFT, padx=5)
+
+        self.chk_preprocess = tk.Checkbutton(controls_frame, text="Preprocesado", variable=self.preprocess_enabled)
+        self.chk_preprocess.pack(side=tk.LEFT, padx=5)
+
+        tk.Label(controls_frame, text="Motor OCR:").pack(side=tk.LEFT, padx=(15, 0))
+        self.opt_backend = tk.OptionMenu(controls_frame, self.ocr_backend_name, *BACKENDS,
+                                         command=lambda _name: self.select_ocr_backend())
+        self.opt_backend.pack(side=tk.LEFT, padx=5)
+
+        tk.Label(controls_frame, text="Color:").pack(side=tk.LEFT, padx=(15, 0))
+        self.opt_color = tk.OptionMenu(controls_frame, self.color_mode, *COLOR_MODES,
+                                       command=lambda _mode: self.rerender_keeping_view())
+        self.opt_color.pack(side=tk.LEFT, padx=5)
+
+        # Proceso de render aparte (ver render_server.py): la interfaz no se bloquea en los renders
+        self.renderer = RenderClient() if RENDER_SERVER_ENABLED else None
+
         # Canvas para mostrar el PDF
+        # Barra lateral de miniaturas (clic para saltar a la página)
+        self.sidebar = ThumbnailSidebar(self.canvas_frame, on_select=self.go_to_page, renderer=self.renderer)
+        self.sidebar.pack(side=tk.LEFT, fill=tk.Y)
+
         self.canvas = tk.Canvas(self.canvas_frame, bg="lightgrey", cursor="arrow")
-        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.page_view = TiledPageView(self.canvas, self.pixel_budget, strategy=self.oversize_strategy,
+                                       renderer=self.renderer)
+        self.document_view = ContinuousDocumentView(self.canvas, self.pixel_budget, renderer=self.renderer)
         
         # Bindings para eventos del ratón
         self.canvas.bind("<ButtonPress-1>", self.on_mouse_down)
@@ -100,22 +204,69 @@ class InchesToMMConverter:
         self.canvas.bind("<ButtonRelease-3>", self.on_pan_release)
         
         self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Configure>", lambda event: self.schedule_visible_update())
 
         self.root.bind_all("<Control-z>", self.undo_last_action)
+        self.root.bind_all("<Escape>", lambda event: self.clear_selection_queue())
+        # Activar/desactivar la medición de tiempos por etapa (ver profiling.py)
+        self.root.bind_all("<F9>", self.toggle_profiling)
+        # Guardar la sesión (página y zoom) al cerrar la ventana
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        if self.renderer is not None:
+            self.root.after(RENDER_POLL_MS, self.poll_renderer)
 
 
     def initialize_ocr(self):
-        """Inicializa el motor OCR de PaddleOCR."""
-        if self.ocr_engine is None:
-            self.ocr_engine = PaddleOCR(
-                use_angle_cls=False,                             # Habilita la clasificación de ángulos
-                lang=self.target_language,
-                ocr_version = self.ocr_model_version,
-                text_recognition_model_name = self.text_recognition_
-            )
-        else:
-            self.ocr_engine.lang = self.target_language
-            self.ocr_engine.ocr_version = self.ocr_model_version
+        """Inicializa (o reutiliza) el motor OCR seleccionado."""
+        name = self.ocr_backend_name.get()
+        if name in self.ocr_backends:
+            self.ocr_backend = self.ocr_backends[name]
+            return
+
+        options = self.get_backend_options(name)
+        if name == 'cascade':
+            # La cascada reutiliza los motores ya cargados y crea el resto con las mismas opciones
+            options.setdefault('stage_options', {n: self.get_backend_options(n) for n in BACKENDS if n != 'cascade'})
+            options.setdefault('stage_backends', dict(self.ocr_backends))
+        try:
+            self.ocr_backend = create_backend(name, **options)
+        except Exception as e:
+            print(f"Error al inicializar el motor OCR '{name}': {e}")
+            messagebox.showerror("Error", f"No se pudo inicializar el motor OCR '{name}':\n{e}")
+            self.ocr_backend = None
+            return
+        self.ocr_backends[name] = self.ocr_backend
+
+    def select_ocr_backend(self):
+        """Cambio de motor en el menú: el nuevo se carga cuando haga falta."""
+        self.ocr_backend = self.ocr_backends.get(self.ocr_backend_name.get())
+
+    def get_backend_options(self, name):
+        """Opciones de creación de un motor OCR."""
+        options = dict(self.backend_options.get(name, {}))
+        if name == 'paddleocr':
+            options.setdefault('lang', self.target_language)
+            options.setdefault('ocr_version', self.ocr_model_version)
+            options.setdefault('text_recognition_model_name', self.text_recognition_)
+            options.setdefault('batch_size', self.ocr_batch_size)
+        return options
+
+    def get_text_detector(self):
+        """Detector de cotas (geometría vectorial; el modelo de detección de texto solo si hace falta)."""
+        if self.text_detector is None:
+            self.text_detector = create_detector("auto")
+        return self.text_detector
+
+    def get_ocr_backend(self, load=True):
+        """Devuelve el motor OCR activo con el preprocesado según la casilla.
+
+        La primera vez se carga el motor (con `load=False` solo se devuelve si ya está cargado).
+        """
+        if self.ocr_backend is None and load:
+            self.initialize_ocr()
+        if self.ocr_backend is not None:
+            self.ocr_backend.preprocess = self.preprocess_config if self.preprocess_enabled.get() else None
+        return self.ocr_backend
 
     def open_pdf(self):
         """Abre un archivo PDF y carga la primera página."""
@@ -126,13 +277,70 @@ class InchesToMMConverter:
         if not file_path:
             return
 
+        self.page_view.clear()
+        self.document_view.clear()
         self.pdf_document = fitz.open(file_path)
-        self.current_page = 0
-        self.zoom_factor = 1.0
+        if self.renderer is not None:
+            self.renderer.open(file_path)
+        self.page_colorspaces = {}
+        self.click_targets.clear()
+        self.undo_stack = []
+        self.clear_selection_queue()
+
+        # Recuperar la sesión anterior: posición y, si se quiere, las conversiones ya hechas
+        self.session = Session.open(file_path)
+        self.current_page = min(self.session.last_page, len(self.pdf_document) - 1)
+        self.zoom_factor = max(self.min_zoom, min(self.max_zoom, self.session.zoom))
+        if self.session.edits:
+            if messagebox.askyesno("Sesión anterior",
+                                   f"Este PDF tiene {len(self.session.edits)} conversiones de una sesión anterior.\n"
+                                   "¿Reaplicarlas? (No se vuelve a pasar el OCR.)"):
+                reapplied = sum(self.session.apply_edits(page) for page in self.pdf_document)
+                print(f"{reapplied} conversiones reaplicadas desde {self.session.path}")
+                for edit in self.session.edits:
+                    self.mark_page_edited(edit["page"])
+            else:
+                self.session.edits = []
+                self.session.save()
+
         self.canvas.xview_moveto(0)
         self.canvas.yview_moveto(0)
         self.render_page()
+        if self.continuous_view.get():
+            self.go_to_page(self.current_page)
         self.update_page_controls()
+        self.sidebar.load(file_path, self.pdf_document)
+
+    def save_session(self):
+        """Guarda en la sesión la página y el zoom actuales."""
+        if self.session is None:
+            return
+        self.session.last_page = self.current_page
+        self.session.zoom = self.zoom_factor
+        self.session.save()
+
+    def on_close(self):
+        """Guarda la sesión y cierra la aplicación."""
+        self.save_session()
+        if self.renderer is not None:
+            self.renderer.close()
+        self.root.destroy()
+
+    def mark_page_edited(self, page_no):
+        """La página ya no coincide con el PDF en disco: el proceso de render no puede pintarla."""
+        if self.renderer is not None:
+            self.renderer.mark_dirty(page_no)
+
+    def poll_renderer(self):
+        """Pinta los rasters que ha terminado el proceso de render."""
+        if self.renderer.poll() and self.pdf_document:
+            if self.continuous_view.get():
+                self.sync_current_page()
+            else:
+                self.current_pil_image = self.page_view.image
+            self.update_raster_status()
+            self.canvas.tag_raise("queued")
+        self.root.after(RENDER_POLL_MS, self.poll_renderer)
     
     def update_page_controls(self):
         """Actualiza los controles de navegación de páginas."""
@@ -141,52 +349,158 @@ class InchesToMMConverter:
             self.btn_prev.config(state=tk.NORMAL if self.current_page > 0 else tk.DISABLED)
             self.btn_next.config(state=tk.NORMAL if self.current_page < len(self.pdf_document) - 1 else tk.DISABLED)
             self.btn_save.config(state=tk.NORMAL)
+            self.btn_convert_page.config(state=tk.NORMAL)
+            self.sidebar.set_current(self.current_page)
         else:
             self.lbl_page.config(text="Página: -/-")
             self.btn_prev.config(state=tk.DISABLED)
             self.btn_next.config(state=tk.DISABLED)
             self.btn_save.config(state=tk.DISABLED)
+            self.btn_convert_page.config(state=tk.DISABLED)
 
     def render_page(self):
         if not self.pdf_document or not (0 <= self.current_page < len(self.pdf_document)):
             # Si no hay documento o la página es inválida, limpiar el canvas
+            self.page_view.clear()
+            self.document_view.clear()
             self.canvas.delete("all")
             self.current_pil_image = None
-            self.current_tk_image = None
 
             zoom_text = f"(Zoom: {self.zoom_factor:.0%})" if self.pdf_document else ""
             self.lbl_page.config(text=f"Página: -/- {zoom_text}")
+            self.update_raster_status()
             return
-        # Renderizar la página actual
-        page = self.pdf_document[self.current_page]
-        mat = fitz.Matrix(self.zoom_factor, self.zoom_factor)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-        self.current_pil_image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        self.current_tk_image = ImageTk.PhotoImage(self.current_pil_image)
+        self.page_view.clear()
+        self.document_view.clear()
         self.canvas.delete("all")
+        if self.continuous_view.get():
+            # Vista continua: marcadores para todas las páginas y raster solo para las visibles
+            with span("render", continuous=True, zoom=round(self.zoom_factor, 3)):
+                self.document_view.layout(self.pdf_document, self.zoom_factor)
+                self.canvas.config(scrollregion=(0, 0, self.document_view.width, self.document_view.height))
+                self.document_view.update_visible(self.get_page_colorspace)
+            self.sync_current_page()
+            self.update_raster_status()
+            self.draw_selection_queue()
+            return
+
+        # Renderizar la página actual (entera o en teselas según el presupuesto de píxeles)
+        with span("render", page=self.current_page, zoom=round(self.zoom_factor, 3)) as attrs:
+            page = self.pdf_document[self.current_page]
+            colorspace = self.get_page_colorspace(page)
+            self.zoom_factor = self.page_view.show(page, self.zoom_factor, colorspace)
+            self.current_pil_image = self.page_view.image
+            if attrs is not None:
+                attrs["tiled"] = self.page_view.tiled
+                attrs["gray"] = colorspace.n == 1
+        self.canvas.config(scrollregion=(0, 0, self.page_view.width, self.page_view.height))
+
+        self.lbl_page.config(text=f"Página: {self.current_page + 1}/{len(self.pdf_document)} (Zoom: {self.zoom_factor:.0%})")
+        self.update_raster_status()
+        self.draw_selection_queue()
+
+    def get_page_colorspace(self, page):
+        """Espacio de color de la página según el modo elegido (la detección automática se recuerda)."""
+        mode = self.color_mode.get()
+        if mode != "auto":
+            return page_colorspace(page, mode)
+        if page.number not in self.page_colorspaces:
+            self.page_colorspaces[page.number] = page_colorspace(page, "auto")
+        return self.page_colorspaces[page.number]
+
+    def rerender_keeping_view(self):
+        """Vuelve a renderizar la página actual sin mover la vista."""
+        view_state = (self.canvas.xview(), self.canvas.yview())
+        self.render_page()
+        self.canvas.xview_moveto(view_state[0][0])
+        self.canvas.yview_moveto(view_state[1][0])
+        self.update_visible_raster()
 
-        # Scroll Region
-        self.canvas.config(scrollregion=(0, 0, self.current_tk_image.width(), self.current_tk_image.height()))
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.current_tk_image)
+    def refresh_region(self, page, rect):
+        """Actualiza en pantalla solo la zona `rect` (PDF) de la página recién editada."""
+        if self.continuous_view.get():
+            view = self.document_view.views.get(page.number)
+        else:
+            view = self.page_view if page.number == self.current_page else None
+        if view is None:
+            return  # la página no se muestra: se renderizará al volver a ella
+        with span("rerender", partial=True) as attrs:
+            pixels = view.refresh(rect, page)
+            if attrs is not None:
+                attrs["pixels"] = pixels
+
+    def content_size(self):
+        """Tamaño (píxeles) de lo que se muestra en el canvas: la página o el documento entero."""
+        view = self.document_view if self.continuous_view.get() else self.page_view
+        return view.width, view.height
+
+    def update_visible_raster(self):
+        """Renderiza lo que ha entrado en la vista (teselas o páginas) y libera lo que ha salido."""
+        if self.continuous_view.get():
+            self.document_view.update_visible(self.get_page_colorspace)
+            self.sync_current_page()
+            self.update_raster_status()
+        elif self.page_view.update_visible():
+            self.update_raster_status()
+        self.canvas.tag_raise("queued")  # los rasters nuevos no deben tapar la cola
+
+    def sync_current_page(self):
+        """En la vista continua, la página actual es la que está en el centro de la vista."""
+        center_y = self.canvas.canvasy(self.canvas.winfo_height() / 2)
+        page_no = self.document_view.page_at(center_y)
+        if page_no != self.current_page:
+            self.current_page = page_no
+            self.update_page_controls()
+        view = self.document_view.views.get(page_no)
+        self.current_pil_image = view.image if view is not None else None
         self.lbl_page.config(text=f"Página: {self.current_page + 1}/{len(self.pdf_document)} (Zoom: {self.zoom_factor:.0%})")
 
+    def update_raster_status(self):
+        """Muestra la memoria ocupada por los rasters junto al zoom."""
+        if self.continuous_view.get() and self.document_view.doc is not None:
+            self.lbl_memory.config(text=f"Raster: {format_bytes(self.document_view.memory_bytes)} "
+                                        f"en {len(self.document_view.views)} páginas")
+            return
+        if self.page_view.page is None:
+            self.lbl_memory.config(text="Raster: -")
+            return
+        mode = f" en {len(self.page_view.tiles)} teselas" if self.page_view.tiled else ""
+        self.lbl_memory.config(text=f"Raster: {format_bytes(self.page_view.memory_bytes)}{mode}")
+
     def prev_page(self):
         """Cambia a la página anterior."""
         if self.pdf_document and self.current_page > 0:
-            self.current_page -= 1
-            self.canvas.xview_moveto(0)
-            self.canvas.yview_moveto(0)
-            self.render_page()
-            self.update_page_controls()
+            self.go_to_page(self.current_page - 1)
     
     def next_page(self):
         """Cambia a la página siguiente."""
         if self.pdf_document and self.current_page < len(self.pdf_document) - 1:
-            self.current_page += 1
+            self.go_to_page(self.current_page + 1)
+
+    def go_to_page(self, page_no):
+        """Muestra la página indicada (en la vista continua, desplazándose hasta ella)."""
+        self.current_page = page_no
+        if self.continuous_view.get() and self.document_view.height:
+            self.canvas.yview_moveto(self.document_view.page_top(page_no) / self.document_view.height)
+            self.update_visible_raster()
+            # La página en el centro puede ser la siguiente si la elegida es más baja que la vista
+            self.current_page = page_no
+        else:
             self.canvas.xview_moveto(0)
             self.canvas.yview_moveto(0)
             self.render_page()
-            self.update_page_controls()
+        self.update_page_controls()
+
+    def toggle_continuous_view(self):
+        """Cambia entre la vista de una página y la vista continua, conservando la página actual."""
+        if not self.pdf_document:
+            return
+        page_no = self.current_page
+        self.canvas.xview_moveto(0)
+        self.canvas.yview_moveto(0)
+        self.render_page()
+        if self.continuous_view.get():
+            self.go_to_page(page_no)
     
     def save_pdf(self):
         """Guarda el PDF con las modificaciones."""
@@ -202,51 +516,63 @@ class InchesToMMConverter:
         if not save_path:
             return
 
-        self.pdf_document.save(save_path, garbage=4, deflate=True, clean=True)
+        with span("save"):
+            self.pdf_document.save(save_path, garbage=4, deflate=True, clean=True)
         messagebox.showinfo("Éxito", "PDF guardado correctamente.")
 
+    def toggle_profiling(self, event=None):
+        """Activa o desactiva la medición de tiempos; al desactivarla exporta los resultados."""
+        if not profiler.enabled:
+            profiler.reset()
+            profiler.set_enabled(True)
+            print("Medición de tiempos activada (F9 para detener y exportar).")
+            return
+
+        profiler.set_enabled(False)
+        if not profiler.spans:
+            print("Medición de tiempos desactivada (sin datos).")
+            return
+        jsonl_path, trace_path = profiler.export()
+        print(profiler.report())
+        print(f"Perfil exportado en: {jsonl_path} y {trace_path}")
+
     def convert_inches_to_mm(self, text):
         """Convierte medidas en pulgadas a milímetros."""
-        import re
-        
-        # Limpiar el texto eliminando caracteres no deseados excepto números, puntos y espacios
-        cleaned_text = re.sub(r'[^\d\.\s]', '', text.strip())
-        print(f"Texto original: '{text}'")
-        print(f"Texto limpio antes de correcciones: '{cleaned_text}'")
-        # Corregir números que empiezan por punto añadiendo un 0 antes del punto
-        cleaned_text = re.sub(r'(^|\s)\.(\d+)', r'\g<1>0.\2', cleaned_text)        
-        print(f"Texto limpio: '{cleaned_text}'")
-        # Extraer números del texto
-        numbers = re.findall(r'\d+\.?\d*', cleaned_text)
-
-        if not numbers:
-            # Si no se encuentra ningún número, devolver el texto original
-            print(f"No se encontraron números en: '{text}' -> devolviendo texto original")
-            return text
-        
-        converted_numbers = []
-        for num_str in numbers:
-            try:
-                # Convertir a float
-                inches = float(num_str)
-                # Convertir pulgadas a milímetros (1 pulgada = 25.4 mm)
-                mm = inches * 25.4
-                # Mantener 4 decimales
-                mm_formatted = f"{mm:.4f}"
-                # Eliminar ceros innecesarios al final
-                converted_numbers.append(mm_formatted)
-                print(f"Conversión: {inches}\" = {mm_formatted} mm")
-            except ValueError:
-                # Si no se puede convertir, mantener el valor original
-                print(f"Error al convertir '{num_str}' -> manteniendo valor original")
-                converted_numbers.append(num_str)
-        
-        # Si solo hay un número, devolver solo ese número convertido
-        if len(converted_numbers) == 1:
-            return converted_numbers[0]
-        else:
-            # Si hay múltiples números, devolverlos separados por espacios
-            return ' '.join(converted_numbers)
+        return convert_inches_to_mm(text)
+
+    def convert_all_on_page(self):
+        """Detecta todas las cotas de la página actual y las convierte con OCR por lotes."""
+        if not self.pdf_document:
+            messagebox.showerror("Error", "No hay documento PDF abierto.")
+            return
+
+        backend = self.get_ocr_backend()
+        if backend is None:
+            messagebox.showerror("Error", "Motor OCR no disponible.")
+            return
+
+        page = self.pdf_document.load_page(self.current_page)
+        original_page_data = self.page_snapshot(page)
+        self.mark_page_edited(page.number)
+        converted = convert_page(page, backend, self.get_text_detector(), color_mode=self.color_mode.get(),
+                                 session=self.session)
+        if converted:
+            # Una sola entrada de deshacer para toda la página, con todas sus conversiones de la sesión
+            self.undo_stack.append({
+                "page_number": page.number,
+                "rect": page.rect,
+                "rect2": page.rect,
+                "text": "",
+                "original_page_data": original_page_data,
+                "restore_method": "full_page",
+                "edit_count": converted,
+            })
+        self.save_session()
+
+        self.rerender_keeping_view()
+        self.sidebar.update_page(page)
+        messagebox.showinfo("Convertir página", f"{converted} cotas convertidas.")
+
     def process_selection(self):
         """Procesa la selección del rectángulo y convierte las unidades - VERSIÓN OPTIMIZADA."""
         # Validación temprana combinada
@@ -256,128 +582,70 @@ class InchesToMMConverter:
                                 "No hay selección válida o coordenadas de selección.")
             return
 
-        # Pre-calcular valores reutilizables
-        x0_canvas, y0_canvas, x1_canvas, y1_canvas = self.selection_coords
-        img_width, img_height = self.current_pil_image.size
-        zoom_inv = 1.0 / self.zoom_factor  # Evitar divisiones repetidas
-        
-        # Calcular región de recorte una sola vez
-        padding = 10
-        crop_coords = (
-            max(0, x0_canvas - padding),
-            max(0, y0_canvas - padding), 
-            min(img_width, x1_canvas + padding),
-            min(img_height, y1_canvas + padding)
-        )
-        crop_x0, crop_y0, crop_x1, crop_y1 = crop_coords
-        
-        # Validar dimensiones del recorte
-        if crop_x1 <= crop_x0 or crop_y1 <= crop_y0:
+        # Rectángulos PDF de la selección y del recuadro con margen
+        rects = selection_rects(self.selection_coords, self.current_pil_image.size, self.zoom_factor)
+        if rects is None:
             messagebox.showwarning("Advertencia", "Área de selección inválida.")
             return
-        
-        # OCR optimizado
-        cropped_image = self.current_pil_image.crop(crop_coords)
-        
-        if self.ocr_engine is None:
-            messagebox.showerror("Error", "Motor OCR no disponible.")
-            return
-                   
-        # Convertir a numpy array una sola vez
-        cropped_array = np.array(cropped_image)
-        start = time.time()
-        ocr_results = self.ocr_engine.predict(cropped_array)
-        end = time.time()
-        print(f"Tiempo de OCR: {end - start:.2f} segundos")
-        
-        if not ocr_results:
-            messagebox.showwarning("Advertencia", "No se detectó texto en la selección.")
+        rect, rect2 = rects
+
+        # Cargar página una sola vez
+        page = self.pdf_document.load_page(self.current_page)
+
+        # Cota en la capa de texto: se reescribe en el contenido, sin OCR ni recuadro
+        if self.rewrite_mode.get() and self.rewrite_selection(page, rect, rect2):
             return
-        
-        # Procesar primer resultado válido solamente
-        result = ocr_results[0]
-        if not result.get('rec_texts'):
-            messagebox.showwarning("Advertencia", "No se pudo extraer texto.")
+
+        backend = self.get_ocr_backend()
+        if backend is None:
+            messagebox.showerror("Error", "Motor OCR no disponible.")
             return
-        
-        # Combinar texto una sola vez
-        text = "\n".join(result['rec_texts'])
+
+        # Si la misma región ya se leyó con este motor (en esta sesión o en otra), no repetir el OCR
+        ocr_result = self.session.cached_ocr(self.current_page, rect, backend.name) if self.session else None
+        if ocr_result is not None:
+            print(f"OCR leído de la sesión ({backend.name}): '{ocr_result.text}'")
+        else:
+            # Si el OCR ya se lanzó durante el arrastre sobre esta misma selección, usar ese resultado
+            start = time.time()
+            ocr_result = self.speculative_ocr.take(
+                self.selection_key(self.current_page, self.selection_coords, backend))
+            if ocr_result is not None:
+                print(f"OCR especulativo ({backend.name}): espera de {time.time() - start:.2f} segundos")
+            else:
+                ocr_result = read_selection(backend, self.current_pil_image, page,
+                                            self.selection_coords, self.zoom_factor)
+                end = time.time()
+                print(f"Tiempo de OCR ({backend.name}): {end - start:.2f} segundos")
+            if self.session is not None and ocr_result.text.strip():
+                self.session.record_ocr(self.current_page, rect, ocr_result)
+
+        text = ocr_result.text
         if not text.strip():
-            messagebox.showwarning("Advertencia", "Texto extraído está vacío.")
+            messagebox.showwarning("Advertencia", "No se detectó texto en la selección.")
             return
-        
-        # Pre-calcular rectángulos
-        pdf_coords = (
-            x0_canvas * zoom_inv,
-            y0_canvas * zoom_inv,
-            x1_canvas * zoom_inv, 
-            y1_canvas * zoom_inv
-        )
-        
-        rect = fitz.Rect(*pdf_coords)
-        rect2 = fitz.Rect(
-            crop_x0 * zoom_inv,
-            crop_y0 * zoom_inv,
-            crop_x1 * zoom_inv,
-            crop_y1 * zoom_inv
-        )
+        if ocr_result.flagged:
+            lecturas = ", ".join(f"'{r.text}' ({r.backend})" for r in ocr_result.disagreements)
+            print(f"Discrepancia OCR: '{text}' ({ocr_result.backend}) frente a {lecturas}")
         
         # Determinar orientación basada en aspecto
         rotate_angle = 90 if rect2.height > rect2.width else 0
         
-        # Cargar página una sola vez
-        page = self.pdf_document.load_page(self.current_page)
-        
         # Procesar conversión de texto
-        converted_text = self.convert_inches_to_mm(text)
+        with span("parse"):
+            converted_text = self.convert_inches_to_mm(text)
         print(f"Texto original: {text}")
         print(f"Texto convertido ({type(converted_text)}): {converted_text}")
         
-        # Optimización: Solo crear pixmap de alta resolución si es necesario
-        # Usar matriz 1.5x en lugar de 2x para reducir memoria
-        original_page_pixmap = page.get_pixmap(matrix=fitz.Matrix(1.5, 1.5))
-        original_page_data = original_page_pixmap.tobytes("png")
-        
-        # Limpiar pixmap de memoria inmediatamente
-        original_page_pixmap = None
-        
-        # Aplicar modificaciones al PDF
-        page.draw_rect(rect, color=(1, 1, 1), fill=(1, 1, 1), overlay=True)
-        
-        # Inserción de texto optimizada con rangos más eficientes
-        font_sizes = range(18, 5, -3)  # Pasos más grandes: 18, 15, 12, 9, 6
-        text_inserted = False
-        
-        for font_size in font_sizes:
-            rc = page.insert_textbox(
-                rect2, converted_text, 
-                fontsize=font_size, 
-                fontname="helv",
-                color=(0, 0, 0), 
-                align=fitz.TEXT_ALIGN_CENTER,
-                rotate=rotate_angle, 
-                overlay=True
-            )
-            if rc >= 0:
-                text_inserted = True
-                break
-        
-        if not text_inserted:
-            # Intentar una última vez con el tamaño mínimo exacto
-            rc = page.insert_textbox(
-                rect2, converted_text,
-                fontsize=6,
-                fontname="helv", 
-                color=(0, 0, 0),
-                align=fitz.TEXT_ALIGN_CENTER,
-                rotate=rotate_angle,
-                overlay=True
-            )
-            if rc < 0:
-                messagebox.showerror("Error", 
-                                "No se pudo insertar el texto en el PDF, incluso con tamaño mínimo.")
-                return
-            font_size = 6
+        original_page_data = self.page_snapshot(page)
+
+        # Aplicar modificaciones al PDF (tamaños 18, 15, 12, 9, 6)
+        self.mark_page_edited(page.number)
+        font_size = insert_converted_text(page, rect, rect2, converted_text, rotate_angle)
+        if font_size is None:
+            messagebox.showerror("Error", 
+                            "No se pudo insertar el texto en el PDF, incluso con tamaño mínimo.")
+            return
         
         # Guardar estado para undo de manera eficiente
         undo_data = {
@@ -388,15 +656,206 @@ class InchesToMMConverter:
             "fontsize": font_size,
             "rotation": rotate_angle,
             "original_page_data": original_page_data,
-            "restore_method": "full_page"
+            "restore_method": "full_page",
+            "ocr_flagged": ocr_result.flagged
         }
         self.undo_stack.append(undo_data)
+        if self.session is not None:
+            self.session.record_edit(self.current_page, rect, rect2, text, converted_text,
+                                     font_size, rotate_angle, ocr_result)
+            self.save_session()
         
-        # Preservar vista y renderizar
-        view_state = (self.canvas.xview(), self.canvas.yview())
-        self.render_page()
-        self.canvas.xview_moveto(view_state[0][0])
-        self.canvas.yview_moveto(view_state[1][0])
+        # Re-renderizar solo la zona modificada
+        self.refresh_region(page, rect2)
+        self.sidebar.update_page(page)
+
+        # Modo cascada: avisar si otro motor leyó una cota distinta
+        if ocr_result.flagged:
+            messagebox.showwarning("Revisar cota",
+                                   f"Los motores OCR no coinciden ({lecturas}).\n"
+                                   f"Se ha escrito {converted_text} a partir de '{text}'. Ctrl+Z para deshacer.")
+
+    def rewrite_selection(self, page, rect, rect2):
+        """Reescribe la cota de texto de la selección en el contenido de la página.
+
+        Devuelve False si no se puede (sin texto, fuente sin los glifos...) y
+        hay que convertir como siempre, con OCR y recuadro.
+        """
+        with span("rewrite", page=page.number):
+            rewrite = rewrite_dimension_text(page, rect)
+        if rewrite is None:
+            print("No se puede reescribir el texto de la selección: se sustituye con recuadro")
+            return False
+        self.speculative_ocr.cancel()
+        self.mark_page_edited(page.number)
+        print(f"Texto reescrito: '{rewrite.source_text}' -> '{rewrite.converted_text}'")
+
+        # Deshacer: basta con devolver los streams de contenido a su estado anterior
+        self.undo_stack.append({
+            "page_number": page.number,
+            "rect": rect,
+            "rect2": rect2,
+            "text": rewrite.converted_text,
+            "rewrite": rewrite,
+            "restore_method": "content_stream",
+        })
+        if self.session is not None:
+            self.session.record_edit(page.number, rect, rect2, rewrite.source_text, rewrite.converted_text,
+                                     None, None, method="rewrite")
+            self.save_session()
+
+        self.refresh_region(page, rewrite.rect)
+        self.sidebar.update_page(page)
+        return True
+
+    def page_snapshot(self, page):
+        """PNG de la página antes de modificarla, para deshacer."""
+        # Optimización: Solo crear pixmap de alta resolución si es necesario
+        # Usar matriz 1.5x en lugar de 2x para reducir memoria
+        with span("undo_snapshot"):
+            # Espacio de color de esta página (la cola puede tener selecciones de otras)
+            original_page_pixmap = page.get_pixmap(matrix=fitz.Matrix(1.5, 1.5),
+                                                   colorspace=self.get_page_colorspace(page))
+            return original_page_pixmap.tobytes("png")
+
+    # ========================================================
+    # =================Cola de selecciones====================
+    # ========================================================
+    def queue_selection(self, page_no, selection_coords):
+        """Añade una selección (píxeles de la página) a la cola."""
+        self.selection_queue.append((page_no, canvas_to_pdf_rect(selection_coords, self.zoom_factor)))
+        self.draw_selection_queue()
+        self.update_queue_controls()
+
+    def clear_selection_queue(self):
+        self.selection_queue = []
+        self.canvas.delete("queued")
+        self.update_queue_controls()
+
+    def update_queue_controls(self):
+        self.btn_convert_queue.config(text=f"Convertir selecciones ({len(self.selection_queue)})",
+                                      state=tk.NORMAL if self.selection_queue else tk.DISABLED)
+
+    def draw_selection_queue(self):
+        """Dibuja las selecciones en cola de las páginas que se muestran."""
+        self.canvas.delete("queued")
+        continuous = self.continuous_view.get()
+        for page_no, rect in self.selection_queue:
+            if continuous:
+                if page_no >= len(self.document_view.page_boxes):
+                    continue
+                offset_x, offset_y = self.document_view.page_boxes[page_no][:2]
+            elif page_no == self.current_page:
+                offset_x = offset_y = 0
+            else:
+                continue
+            self.canvas.create_rectangle(rect.x0 * self.zoom_factor + offset_x, rect.y0 * self.zoom_factor + offset_y,
+                                         rect.x1 * self.zoom_factor + offset_x, rect.y1 * self.zoom_factor + offset_y,
+                                         outline="blue", dash=(4, 2), width=2, tags="queued")
+
+    def page_image(self, page):
+        """Imagen de la página al zoom actual para recortar: el raster mostrado o recortes desde el PDF."""
+        if self.continuous_view.get():
+            view = self.document_view.views.get(page.number)
+            if view is not None and view.image is not None:
+                return view.image
+        elif page.number == self.current_page and self.current_pil_image is not None:
+            return self.current_pil_image
+        size = (int(page.rect.width * self.zoom_factor), int(page.rect.height * self.zoom_factor))
+        return PageClipImage(page, self.zoom_factor, size, self.get_page_colorspace(page))
+
+    def convert_selection_queue(self):
+        """Convierte todas las selecciones en cola: OCR por lotes, una escritura y un re-render."""
+        if not self.pdf_document or not self.selection_queue:
+            return
+        backend = self.get_ocr_backend()
+        if backend is None:
+            messagebox.showerror("Error", "Motor OCR no disponible.")
+            return
+
+        by_page = {}
+        for page_no, rect in self.selection_queue:
+            by_page.setdefault(page_no, []).append(rect)
+        queued = len(self.selection_queue)
+        converted = sum(self.convert_page_selections(self.pdf_document.load_page(page_no), rects, backend)
+                        for page_no, rects in by_page.items())
+        self.clear_selection_queue()
+        self.save_session()
+        messagebox.showinfo("Convertir selecciones", f"{converted} de {queued} selecciones convertidas.")
+
+    def convert_page_selections(self, page, selection_rects_pdf, backend):
+        """Lee por lotes y convierte las selecciones de una página. Devuelve cuántas se convirtieron."""
+        page_image = self.page_image(page)
+        selections, results, regions = [], [], []
+        for selection_rect in selection_rects_pdf:
+            coords = tuple(int(round(c * self.zoom_factor)) for c in selection_rect)
+            rects = selection_rects(coords, page_image.size, self.zoom_factor)
+            if rects is None:
+                continue
+            cached = self.session.cached_ocr(page.number, rects[0], backend.name) if self.session else None
+            if cached is None:
+                regions.append(selection_region(backend, page_image, page, coords, self.zoom_factor))
+            selections.append(rects)
+            results.append(cached)
+
+        if regions:
+            start = time.time()
+            with span("ocr", backend=backend.name, regions=len(regions)):
+                batch = iter(backend.recognize_batch(regions))
+            print(f"Tiempo de OCR ({backend.name}, {len(regions)} selecciones): {time.time() - start:.2f} segundos")
+            results = [result if result is not None else next(batch) for result in results]
+
+        items, converted = [], []
+        for (rect, rect2), ocr_result in zip(selections, results):
+            if self.session is not None and ocr_result.text.strip():
+                self.session.record_ocr(page.number, rect, ocr_result)
+            if not ocr_result.text.strip():
+                print(f"Sin texto en la selección {tuple(round(c, 1) for c in rect)}")
+                continue
+            if ocr_result.flagged:
+                lecturas = ", ".join(f"'{r.text}' ({r.backend})" for r in ocr_result.disagreements)
+                print(f"Discrepancia OCR: '{ocr_result.text}' ({ocr_result.backend}) frente a {lecturas}")
+            with span("parse"):
+                converted_text = self.convert_inches_to_mm(ocr_result.text)
+            rotate_angle = 90 if rect2.height > rect2.width else 0
+            items.append((rect, rect2, converted_text, rotate_angle))
+            converted.append(ocr_result)
+        if not items:
+            return 0
+
+        original_page_data = self.page_snapshot(page)
+        self.mark_page_edited(page.number)
+        font_sizes = insert_converted_texts(page, items)
+
+        done = 0
+        for (rect, rect2, converted_text, rotate_angle), ocr_result, font_size in zip(items, converted, font_sizes):
+            if font_size is None:
+                print(f"No se pudo insertar '{converted_text}' en el PDF, incluso con tamaño mínimo.")
+                continue
+            done += 1
+            if self.session is not None:
+                self.session.record_edit(page.number, rect, rect2, ocr_result.text, converted_text,
+                                         font_size, rotate_angle, ocr_result)
+
+        # Una sola entrada de deshacer para todo el lote de la página
+        union_rect, union_rect2 = fitz.Rect(items[0][0]), fitz.Rect(items[0][1])
+        for rect, rect2, _text, _rotate in items[1:]:
+            union_rect |= rect
+            union_rect2 |= rect2
+        self.undo_stack.append({
+            "page_number": page.number,
+            "rect": union_rect,
+            "rect2": union_rect2,
+            "text": " ".join(item[2] for item in items),
+            "original_page_data": original_page_data,
+            "restore_method": "full_page",
+            "edit_count": done,
+            "ocr_flagged": any(r.flagged for r in converted)
+        })
+        for rect, rect2, _text, _rotate in items:
+            self.refresh_region(page, rect2)
+        self.sidebar.update_page(page)
+        return done
 
     def undo_last_action(self, event=None):
         """Deshace la última acción restaurando el estado original de la página."""
@@ -405,10 +864,19 @@ class InchesToMMConverter:
             return
 
         last_action = self.undo_stack.pop()
+        self.mark_page_edited(last_action["page_number"])
+        if self.session is not None:
+            for _ in range(last_action.get("edit_count", 1)):
+                self.session.pop_edit()
+            self.session.save()
         
         try:
+            # Texto reescrito: devolver los streams de contenido originales
+            if last_action.get("restore_method") == "content_stream":
+                last_action["rewrite"].restore(self.pdf_document)
+
             # Método 1: Restauración completa de página (recomendado)
-            if last_action.get("restore_method") == "full_page" and "original_page_data" in last_action:
+            elif last_action.get("restore_method") == "full_page" and "original_page_data" in last_action:
                 # Reemplazar completamente la página con la versión original
                 page = self.pdf_document.load_page(last_action["page_number"])
                 
@@ -452,6 +920,8 @@ class InchesToMMConverter:
         self.render_page()
         self.canvas.xview_moveto(xview[0])
         self.canvas.yview_moveto(yview[0])
+        self.update_visible_raster()
+        self.sidebar.update_page(self.pdf_document[last_action["page_number"]])
 
 
     # Método alternativo más avanzado (usar solo si el anterior no funciona)
@@ -462,6 +932,11 @@ class InchesToMMConverter:
             return
 
         last_action = self.undo_stack.pop()
+        self.mark_page_edited(last_action["page_number"])
+        if self.session is not None:
+            for _ in range(last_action.get("edit_count", 1)):
+                self.session.pop_edit()
+            self.session.save()
         
         try:
             page_num = last_action["page_number"]
@@ -492,6 +967,8 @@ class InchesToMMConverter:
         self.render_page()
         self.canvas.xview_moveto(xview[0])
         self.canvas.yview_moveto(yview[0])
+        self.update_visible_raster()
+        self.sidebar.update_page(self.pdf_document[last_action["page_number"]])
 
         messagebox.showinfo("Deshacer", "Acción deshecha correctamente.")
 
@@ -502,6 +979,7 @@ class InchesToMMConverter:
         """Inicia el rectángulo de selección."""
         if self.current_rect_id is not None:
             self.canvas.delete(self.current_rect_id)
+        self.cancel_speculative_ocr()
 
         self.rect_start_x = self.canvas.canvasx(event.x)
         self.rect_start_y = self.canvas.canvasy(event.y)
@@ -524,9 +1002,82 @@ class InchesToMMConverter:
         self.canvas.coords( self.current_rect_id,
                             self.rect_start_x, self.rect_start_y,
                             cur_x_canvas, cur_y_canvas)
-        
+
+        # El rectángulo ha cambiado: descartar el OCR especulativo y esperar a que se quede quieto
+        # (no con mayúsculas: la selección va a la cola)
+        self.cancel_speculative_ocr()
+        if event.state & SHIFT_MASK:
+            return
+        self._speculative_after_id = self.root.after(SPECULATIVE_DELAY_MS, self.start_speculative_ocr,
+                                                     cur_x_canvas, cur_y_canvas)
+
+    def locate_selection(self, end_x, end_y):
+        """Selección desde el punto inicial hasta (end_x, end_y) del canvas.
+
+        Devuelve (página, coordenadas en la página, imagen de la página) o None
+        si en la vista continua no cae dentro de ninguna página renderizada.
+        """
+        coords = (int(min(self.rect_start_x, end_x)), int(min(self.rect_start_y, end_y)),
+                  int(max(self.rect_start_x, end_x)), int(max(self.rect_start_y, end_y)))
+        if not self.continuous_view.get():
+            return self.current_page, coords, self.current_pil_image
+        # Pasar la selección a coordenadas de la página que la contiene
+        located = self.document_view.locate(coords)
+        view = self.document_view.views.get(located[0]) if located else None
+        if view is None:
+            return None
+        return located[0], located[1], view.image
+
+    def selection_key(self, page_no, selection_coords, backend):
+        """Identifica un OCR de la selección: si algo de esto cambia, el resultado puede cambiar."""
+        return (page_no, tuple(selection_coords), self.zoom_factor, backend.name,
+                self.preprocess_enabled.get())
+
+    def start_speculative_ocr(self, end_x, end_y):
+        """Lanza en segundo plano el OCR del rectángulo, que lleva un rato sin moverse."""
+        self._speculative_after_id = None
+        if not self.pdf_document or self.rect_start_x is None or self.is_panning:
+            return
+        backend = self.get_ocr_backend(load=False)  # no cargar modelos a mitad del arrastre
+        if not SpeculativeOCR.can_speculate(backend):
+            return
+        located = self.locate_selection(end_x, end_y)
+        if located is None:
+            return
+        page_no, coords, page_image = located
+        if coords[2] - coords[0] < self.min_area or coords[3] - coords[1] < self.min_area:
+            return
+        rects = selection_rects(coords, page_image.size, self.zoom_factor)
+        if rects is None:
+            return
+        if self.session is not None and self.session.cached_ocr(page_no, rects[0], backend.name):
+            return  # se leerá de la sesión
+        page = self.pdf_document.load_page(page_no)
+        self.speculative_ocr.start(self.selection_key(page_no, coords, backend), backend,
+                                   page_image, page, coords, self.zoom_factor)
+
+    def snap_click(self, page_no, point):
+        """Coordenadas (píxeles de la página) de la cota candidata más cercana al clic, o None."""
+        page = self.pdf_document.load_page(page_no)
+        skip = (lambda rect: self.session.is_converted(page_no, rect)) if self.session is not None else None
+        rect = self.click_targets.nearest(page, fitz.Point(point[0] / self.zoom_factor, point[1] / self.zoom_factor),
+                                          SNAP_DISTANCE / self.zoom_factor, skip=skip,
+                                          color_mode=self.color_mode.get())
+        if rect is None:
+            return None
+        return tuple(int(round(c * self.zoom_factor)) for c in rect)
+
+    def cancel_speculative_ocr(self):
+        if self._speculative_after_id is not None:
+            self.root.after_cancel(self._speculative_after_id)
+            self._speculative_after_id = None
+        self.speculative_ocr.cancel()
+
     def on_mouse_up(self, event):
         """Finaliza el rectángulo de selección y procesa la conversión."""
+        if self._speculative_after_id is not None:
+            self.root.after_cancel(self._speculative_after_id)
+            self._speculative_after_id = None
         if self.is_panning:
             return
         if not self.current_pil_image or self.rect_start_x is None or \
@@ -540,20 +1091,39 @@ class InchesToMMConverter:
         self.rect_end_x = self.canvas.canvasx(event.x)
         self.rect_end_y = self.canvas.canvasy(event.y)
 
-        x0_canvas = int(min(self.rect_start_x, self.rect_end_x))
-        y0_canvas = int(min(self.rect_start_y, self.rect_end_y))
-        x1_canvas = int(max(self.rect_start_x, self.rect_end_x))
-        y1_canvas = int(max(self.rect_start_y, self.rect_end_y))
+        located = self.locate_selection(self.rect_end_x, self.rect_end_y)
+        if located is None:
+            messagebox.showwarning("Advertencia", "La selección no está dentro de ninguna página.")
+            return
+        page_no, self.selection_coords, page_image = located
+        if self.continuous_view.get():
+            self.current_page, self.current_pil_image = page_no, page_image
+            self.update_page_controls()
+        x0_canvas, y0_canvas, x1_canvas, y1_canvas = self.selection_coords
 
-        self.selection_coords = (x0_canvas, y0_canvas, x1_canvas, y1_canvas)
+        snapped = None
+        if self.click_mode.get() and (x1_canvas - x0_canvas < self.min_area and
+                                      y1_canvas - y0_canvas < self.min_area):
+            # Un clic: seleccionar la cota candidata más cercana
+            snapped = self.snap_click(page_no, ((x0_canvas + x1_canvas) / 2, (y0_canvas + y1_canvas) / 2))
+            if snapped is None:
+                messagebox.showwarning("Advertencia", "No hay ninguna cota cerca del clic.")
+                self.canvas.delete(self.current_rect_id)
+                self.current_rect_id = None
+                return
+            self.selection_coords = x0_canvas, y0_canvas, x1_canvas, y1_canvas = snapped
 
-        if(abs(x1_canvas - x0_canvas) < self.min_area or 
-            abs(y1_canvas - y0_canvas) < self.min_area):
+        if snapped is None and (abs(x1_canvas - x0_canvas) < self.min_area or
+                                abs(y1_canvas - y0_canvas) < self.min_area):
             messagebox.showwarning("Advertencia", "El área seleccionada es demasiado pequeña.")
             return
-        
-        # Procesar la selección
-        self.process_selection()
+
+        if event.state & SHIFT_MASK:
+            # Mayúsculas: a la cola, se convierte después con "Convertir selecciones"
+            self.queue_selection(page_no, self.selection_coords)
+        else:
+            # Procesar la selección
+            self.process_selection()
 
         # Elimina el rectángulo de selección
         self.canvas.delete(self.current_rect_id)
@@ -575,19 +1145,29 @@ class InchesToMMConverter:
         self.canvas.config(cursor="fleur")
     
     def on_pan_motion(self, event):
-        """Mueve el canvas durante el panning."""
+        """Registra la posición del ratón; el desplazamiento se aplica una vez por fotograma."""
         if not self.is_panning:
             return
-        
-        content_width = self.current_tk_image.width()
-        content_height = self.current_tk_image.height()
+        self._pan_pointer = (event.x, event.y)
+        if self._pan_after_id is None:
+            self._pan_after_id = self.root.after(FRAME_MS, self.apply_pan)
+
+    def apply_pan(self):
+        """Mueve el canvas a la última posición del ratón (todos los eventos del fotograma en uno)."""
+        self._pan_after_id = None
+        if self._pan_pointer is None:
+            return
+        pointer_x, pointer_y = self._pan_pointer
+        self._pan_pointer = None
+
+        content_width, content_height = self.content_size()
 
         if content_width == 0 or content_height == 0:
             return
         
         # Calcular el desplazamiento basado en la posición del ratón
-        dx = event.x - self.pan_start_x
-        dy = event.y - self.pan_start_y
+        dx = pointer_x - self.pan_start_x
+        dy = pointer_y - self.pan_start_y
 
         delta_scroll_xfrac = -dx / content_width
         delta_scroll_yfrac = -dy / content_height
@@ -598,14 +1178,28 @@ class InchesToMMConverter:
         new_xfrac = max(0, min(1, new_xfrac))
         new_yfrac = max(0, min(1, new_yfrac))
 
-        # Mover el canvas
+        # Mover el canvas; las teselas nuevas se piden después, ya con la vista definitiva
         self.canvas.xview_moveto(new_xfrac)
         self.canvas.yview_moveto(new_yfrac)
+        self.schedule_visible_update()
+
+    def schedule_visible_update(self):
+        """Programa update_visible_raster para cuando Tk quede libre (varias peticiones, una ejecución)."""
+        if self._visible_update_id is None:
+            self._visible_update_id = self.root.after_idle(self._run_visible_update)
+
+    def _run_visible_update(self):
+        self._visible_update_id = None
+        self.update_visible_raster()
 
     def on_pan_release(self, event):
         """Finaliza el panning."""
         if not self.is_panning:
             return
+        # Aplicar el último movimiento pendiente sin esperar al siguiente fotograma
+        if self._pan_after_id is not None:
+            self.root.after_cancel(self._pan_after_id)
+            self.apply_pan()
         self.is_panning = False
         self.canvas.config(cursor="arrow")
 
@@ -628,6 +1222,12 @@ class InchesToMMConverter:
         # Evitar el zoom si se está haciendo panning
         if self.is_panning:
             return
+
+        # En la vista continua la rueda desplaza; Ctrl + rueda hace zoom
+        if self.continuous_view.get() and not event.state & 0x0004:
+            self.canvas.yview_scroll(-3 if scroll_direction == "up" else 3, "units")
+            self.schedule_visible_update()
+            return
         
         old_zoom_factor = self.zoom_factor
         if scroll_direction == "up":
@@ -656,7 +1256,7 @@ class InchesToMMConverter:
         self.render_page()
 
         # Nuevo tamaño de la imagen
-        new_img_width, new_img_height = self.current_tk_image.width(), self.current_tk_image.height()
+        new_img_width, new_img_height = self.content_size()
 
         # Calcular las nuevas coordenadas del cursor en la imagen
         new_canvas_cx = img_cx * self.zoom_factor
@@ -673,23 +1273,15 @@ class InchesToMMConverter:
         # Mover el canvas al nuevo scroll
         self.canvas.xview_moveto(scroll_xfrac)
         self.canvas.yview_moveto(scroll_yfrac)
+        self.update_visible_raster()
 
 if __name__ == "__main__":
     print("Iniciando aplicación PDF OCR Annotator con PaddleOCR...")
-    # Para obtener los valores de config y mostrarlos sin ejecutar toda la app
-    _dummy_root = tk.Tk()
-    _dummy_root.withdraw() # Ocultar la ventana dummy
-    _dummy_app_for_config = InchesToMMConverter(_dummy_root)
-    target_lang = _dummy_app_for_config.target_language
-    ocr_version = _dummy_app_for_config.ocr_model_version
-    _dummy_root.destroy() 
-
-    print(f"Intentando usar idioma: '{target_lang}', versión OCR: '{ocr_version}'.")
-    print("La primera vez, PaddleOCR descargará modelos (requiere internet).")
-    print("Si la inicialización de PaddleOCR falla, revisa la consola.")
-
     root = tk.Tk()
     app = InchesToMMConverter(root)
-    if app.ocr_engine is None:
-        print("ADVERTENCIA: El motor OCR no se inicializó. La funcionalidad OCR no estará disponible.")
+
+    print(f"Intentando usar idioma: '{app.target_language}', versión OCR: '{app.ocr_model_version}'.")
+    print("PaddleOCR se carga con la primera selección; la primera vez descargará modelos (requiere internet).")
+    print("Si la inicialización de PaddleOCR falla, revisa la consola.")
+    report_when_interactive(root)
     root.mainloop()
\ No newline at end of file
@@ -15,7 +15,8 @@ from PIL import Image, ImageTk
 import fitz  # PyMuPDF
 import os
 import numpy as np
-from paddleocr import PaddleOCR
+
+from ocr_backends import OCRRegion, create_backend
 
 # ========================================================
 # ====================Clase principal=====================
@@ -99,14 +100,12 @@ class InchesToMMConverter:
     def initialize_ocr(self):
         """Inicializa el motor OCR de PaddleOCR."""
         if self.ocr_engine is None:
-            self.ocr_engine = PaddleOCR(
+            self.ocr_engine = create_backend(
+                "paddleocr",
                 use_angle_cls=True,                             # Habilita la clasificación de ángulos
                 lang=self.target_language, 
                 ocr_version=self.ocr_model_version
             )
-        else:
-            self.ocr_engine.lang = self.target_language
-            self.ocr_engine.ocr_version = self.ocr_model_version
 
     def open_pdf(self):
         """Abre un archivo PDF y carga la primera página."""
@@ -263,46 +262,44 @@ class InchesToMMConverter:
             cropped_image = self.current_pil_image.crop((crop_x0, crop_y0, crop_x1, crop_y1))
             if self.ocr_engine is not None:
                 cropped_image = np.array(cropped_image)
-                ocr_results = self.ocr_engine.predict(cropped_image)
-                if ocr_results:
-                    for result in ocr_results:
-                        for i in range(len(result['rec_texts'])):
-                            text = "\n".join(result['rec_texts']) or ""
-                            
-                            pdf_x0 = x0_canvas / self.zoom_factor
-                            pdf_y0 = y0_canvas / self.zoom_factor
-                            pdf_x1 = x1_canvas / self.zoom_factor
-                            pdf_y1 = y1_canvas / self.zoom_factor
-
-                            rect = fitz.Rect(pdf_x0, pdf_y0, pdf_x1, pdf_y1)
-                            rect2 = fitz.Rect(crop_x0 / self.zoom_factor,
-                                              crop_y0 / self.zoom_factor,
-                                              crop_x1 / self.zoom_factor,
-                                              crop_y1 / self.zoom_factor)
-
-                            page = self.pdf_document.load_page(self.current_page)
-                            print(text)
-                            converted_text = self.convert_inches_to_mm(text)
-                            print(type(converted_text), converted_text)
-                            # Cubrir la región y escribir el texto nuevo
-                            page.draw_rect(rect, color=(1, 1, 1), fill=(1, 1, 1), overlay=True)
-                            font_size = 18
-                            min_font_size = 6  # tamaño mínimo aceptado
-                            success = False
-
-                            while font_size >= min_font_size:
-                                rc = page.insert_textbox(
-                                    rect2, converted_text, fontsize=font_size, fontname="helv",
-                                    color=(0, 0, 0), align=fitz.TEXT_ALIGN_CENTER, overlay=True
-                                )
-                                if rc >= 0:
-                                    success = True
-                                    break  # texto insertado correctamente
-                                font_size -= 2  # reducir tamaño e intentar de nuevo
-
-                            if not success:
-                                messagebox.showerror("Error", "No se pudo insertar el texto en el PDF, incluso con tamaño reducido.")
-                                return
+                ocr_result = self.ocr_engine.recognize(OCRRegion(image=cropped_image))
+                if ocr_result.text:
+                    text = ocr_result.text
+
+                    pdf_x0 = x0_canvas / self.zoom_factor
+                    pdf_y0 = y0_canvas / self.zoom_factor
+                    pdf_x1 = x1_canvas / self.zoom_factor
+                    pdf_y1 = y1_canvas / self.zoom_factor
+
+                    rect = fitz.Rect(pdf_x0, pdf_y0, pdf_x1, pdf_y1)
+                    rect2 = fitz.Rect(crop_x0 / self.zoom_factor,
+                                      crop_y0 / self.zoom_factor,
+                                      crop_x1 / self.zoom_factor,
+                                      crop_y1 / self.zoom_factor)
+
+                    page = self.pdf_document.load_page(self.current_page)
+                    print(text)
+                    converted_text = self.convert_inches_to_mm(text)
+                    print(type(converted_text), converted_text)
+                    # Cubrir la región y escribir el texto nuevo
+                    page.draw_rect(rect, color=(1, 1, 1), fill=(1, 1, 1), overlay=True)
+                    font_size = 18
+                    min_font_size = 6  # tamaño mínimo aceptado
+                    success = False
+
+                    while font_size >= min_font_size:
+                        rc = page.insert_textbox(
+                            rect2, converted_text, fontsize=font_size, fontname="helv",
+                            color=(0, 0, 0), align=fitz.TEXT_ALIGN_CENTER, overlay=True
+                        )
+                        if rc >= 0:
+                            success = True
+                            break  # texto insertado correctamente
+                        font_size -= 2  # reducir tamaño e intentar de nuevo
+
+                    if not success:
+                        messagebox.showerror("Error", "No se pudo insertar el texto en el PDF, incluso con tamaño reducido.")
+                        return
 
                 xview, yview = self.canvas.xview(), self.canvas.yview()
                 self.render_page()
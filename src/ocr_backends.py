@@ -0,0 +1,355 @@
+# Motores OCR intercambiables
+# Todas las aplicaciones (inches_to_mm*.py, pdf_python*.py, batch_convert.py)
+# hablan con el OCR a través de esta interfaz común, de modo que el motor se
+# elige en tiempo de ejecución y las optimizaciones (lotes, preprocesado,
+# caché, pools) se implementan una sola vez.
+#
+# Uso:
+#     backend = create_backend("tesseract")
+#     result = backend.recognize(OCRRegion(image=array_rgb))
+#     results = backend.recognize_batch([OCRRegion(...), ...])
+#     result = await backend.recognize_async(OCRRegion(...))
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from conversion import is_dimension_text
+from ocr_batch import CropBatcher, paddle_text_recognizer
+from preprocessing import preprocess_crop, as_pil, as_rgb
+from profiling import span
+from startup import lazy_import
+
+np = lazy_import("numpy")
+
+# Registro de motores: nombre -> clase
+BACKENDS = {}
+
+
+def register_backend(name):
+    """Decorador que registra una clase de motor OCR con el nombre dado."""
+    def decorator(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def create_backend(name, **options):
+    """Crea un motor OCR registrado a partir de su nombre."""
+    if name not in BACKENDS:
+        raise ValueError(f"Motor OCR desconocido: '{name}'. Disponibles: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
+
+
+# ========================================================
+# ===================Tipos de datos=======================
+# ========================================================
+class OCRRegion:
+    """Región a reconocer: el recorte renderizado y, si se conoce, la página y el rectángulo PDF."""
+
+    def __init__(self, image=None, page=None, clip=None, preprocessed=False):
+        self.image = image  # np.ndarray HxWx3 (RGB) o HxW (gris)
+        self.page = page    # fitz.Page de origen (necesario para la capa de texto)
+        self.clip = clip    # fitz.Rect en coordenadas PDF
+        self.preprocessed = preprocessed  # True si `image` ya viene preprocesada (el motor no la toca)
+
+
+class OCRResult:
+    """Texto reconocido con su confianza (0-1) y el motor que lo produjo."""
+
+    def __init__(self, text="", confidence=0.0, backend=None):
+        self.text = text
+        self.confidence = confidence
+        self.backend = backend
+        # Modo cascada: resultados de motores anteriores que no coinciden con este
+        self.disagreements = []
+
+    @property
+    def flagged(self):
+        """True si algún motor de la cascada leyó otra cota distinta."""
+        return bool(self.disagreements)
+
+    def __repr__(self):
+        return f"OCRResult({self.text!r}, confidence={self.confidence:.2f}, backend={self.backend!r})"
+
+
+# ========================================================
+# =====================Clase base=========================
+# ========================================================
+class OCRBackend:
+    """Interfaz común de los motores OCR.
+
+    Las subclases implementan `recognize`; `recognize_batch` y las variantes
+    asíncronas tienen una implementación por defecto que pueden mejorar.
+    """
+    name = None
+    crop_padding = 10   # margen (píxeles) que el recorte debe llevar alrededor de la selección
+    needs_image = True  # False si el motor no usa el recorte renderizado
+    uses_page = False   # True si el motor lee la página PDF (no se puede usar fuera del hilo de Tk)
+
+    def __init__(self, preprocess=None):
+        # Configuración de preprocessing.preprocess_crop o None para desactivarlo
+        self.preprocess = preprocess
+        # Un único hilo por motor: los modelos no son seguros entre hilos
+        self._executor = None
+
+    def prepare_image(self, image):
+        """Aplica el preprocesado configurado al recorte."""
+        if self.preprocess is None or image is None:
+            return image
+        with span("preprocess", shape=image.shape[:2]):
+            return preprocess_crop(image, self.preprocess)
+
+    def region_image(self, region):
+        """Recorte de la región listo para el motor (preprocesado aquí salvo que ya lo esté)."""
+        return region.image if region.preprocessed else self.prepare_image(region.image)
+
+    def recognize(self, region):
+        """Reconoce una región y devuelve un OCRResult."""
+        raise NotImplementedError
+
+    def recognize_batch(self, regions):
+        """Reconoce varias regiones; por defecto de una en una."""
+        return [self.recognize(region) for region in regions]
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"ocr-{self.name}")
+        return self._executor
+
+    async def recognize_async(self, region):
+        """Versión asíncrona de `recognize` (se ejecuta en el hilo propio del motor)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self.recognize, region)
+
+    async def recognize_batch_async(self, regions):
+        """Versión asíncrona de `recognize_batch`."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self.recognize_batch, regions)
+
+    def close(self):
+        """Libera el hilo del motor."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# ========================================================
+# ======================PaddleOCR=========================
+# ========================================================
+@register_backend("paddleocr")
+class PaddleOCRBackend(OCRBackend):
+    """PaddleOCR: pipeline completo para una región y solo-reconocimiento por lotes."""
+
+    def __init__(self, lang='en', ocr_version='PP-OCRv5', text_recognition_model_name=None,
+                 use_angle_cls=False, batch_size=16, preprocess=None):
+        super().__init__(preprocess)
+        from paddleocr import PaddleOCR
+
+        self.lang = lang
+        self.ocr_version = ocr_version
+        self.text_recognition_model_name = text_recognition_model_name
+        self.batch_size = batch_size
+        options = {}
+        if text_recognition_model_name:
+            options['text_recognition_model_name'] = text_recognition_model_name
+        self.engine = PaddleOCR(
+            use_angle_cls=use_angle_cls,
+            lang=lang,
+            ocr_version=ocr_version,
+            **options
+        )
+        # El modelo de solo-reconocimiento se carga al primer lote
+        self._batcher = None
+
+    def recognize(self, region):
+        image = self.region_image(region)
+        ocr_results = self.engine.predict(as_rgb(image))
+        if not ocr_results or not ocr_results[0].get('rec_texts'):
+            return OCRResult(backend=self.name)
+        result = ocr_results[0]
+        scores = result.get('rec_scores', [])
+        confidence = float(np.mean(scores)) if len(scores) else 0.0
+        return OCRResult("\n".join(result['rec_texts']), confidence, self.name)
+
+    def recognize_batch(self, regions):
+        if self._batcher is None:
+            model_name = self.text_recognition_model_name or f"{self.ocr_version}_mobile_rec"
+            self._batcher = CropBatcher(paddle_text_recognizer(model_name), batch_size=self.batch_size)
+        for i, region in enumerate(regions):
+            self._batcher.add(i, self.region_image(region))
+        results = self._batcher.run()
+        return [OCRResult(*results[i], self.name) if i in results else OCRResult(backend=self.name)
+                for i in range(len(regions))]
+
+
+# ========================================================
+# ======================Tesseract=========================
+# ========================================================
+@register_backend("tesseract")
+class TesseractBackend(OCRBackend):
+    """Tesseract en modo una línea y solo dígitos."""
+    crop_padding = 0
+
+    def __init__(self, psm=7, whitelist="0123456789.", tesseract_cmd=None, workers=4, preprocess=None):
+        super().__init__(preprocess)
+        import pytesseract
+
+        self.pytesseract = pytesseract
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        self.psm = psm
+        self.whitelist = whitelist
+        self.workers = workers  # cada llamada es un subproceso: los lotes se reparten en paralelo
+
+    @property
+    def config(self):
+        config = f"--psm {self.psm}"
+        if self.whitelist:
+            config += f" -c tessedit_char_whitelist={self.whitelist}"
+        return config
+
+    def recognize(self, region):
+        image = as_pil(np.asarray(self.region_image(region)))
+        data = self.pytesseract.image_to_data(image, config=self.config,
+                                              output_type=self.pytesseract.Output.DICT)
+        words = [(w, float(c)) for w, c in zip(data["text"], data["conf"]) if w.strip() and float(c) >= 0]
+        if not words:
+            return OCRResult(backend=self.name)
+        text = " ".join(w for w, _ in words)
+        confidence = sum(c for _, c in words) / len(words) / 100.0
+        return OCRResult(text, confidence, self.name)
+
+    def recognize_batch(self, regions):
+        if len(regions) <= 1 or self.workers <= 1:
+            return super().recognize_batch(regions)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(self.recognize, regions))
+
+
+# ========================================================
+# ===================Capa de texto PDF====================
+# ========================================================
+@register_backend("textlayer")
+class TextLayerBackend(OCRBackend):
+    """Lee el texto vectorial del PDF dentro del rectángulo; no rasteriza nada."""
+    crop_padding = 0
+    needs_image = False
+    uses_page = True
+
+    def recognize(self, region):
+        if region.page is None or region.clip is None:
+            return OCRResult(backend=self.name)
+        words = region.page.get_text("words", clip=region.clip)
+        # Orden de lectura: por línea y luego de izquierda a derecha
+        words.sort(key=lambda w: (w[5], w[6], w[7]))
+        text = " ".join(w[4] for w in words)
+        return OCRResult(text, 1.0 if text else 0.0, self.name)
+
+
+# ========================================================
+# ===================Cascada de motores===================
+# ========================================================
+@register_backend("cascade")
+class CascadeBackend(OCRBackend):
+    """Ejecuta los motores del más barato al más caro y se detiene en la primera cota fiable.
+
+    Un resultado se acepta si es una cota numérica válida con confianza
+    >= `min_confidence`. Si se escala a un motor posterior y este lee otra
+    cota distinta de la ya leída, el resultado final queda marcado
+    (`OCRResult.flagged`) para que el operador lo revise.
+
+    El preprocesado es el de la cascada: cada recorte se preprocesa una vez y
+    se entrega ya preparado a las etapas, que pueden ser motores compartidos
+    con la aplicación y conservan su propia configuración.
+    """
+    uses_page = True  # la primera etapa suele ser la capa de texto
+
+    def __init__(self, stages=("textlayer", "tesseract", "paddleocr"), min_confidence=0.8,
+                 stage_options=None, stage_backends=None, preprocess=None):
+        super().__init__(preprocess)
+        self.stage_names = list(stages)
+        self.min_confidence = min_confidence
+        self.stage_options = stage_options or {}
+        # Motores ya cargados que se pueden reutilizar (p. ej. los de la aplicación)
+        self.stages = dict(stage_backends or {})
+        self.unavailable = set()
+
+    def _get_stage(self, name):
+        """Crea el motor de una etapa al primer uso; las etapas no instalables se saltan."""
+        if name in self.unavailable:
+            return None
+        if name not in self.stages:
+            try:
+                self.stages[name] = create_backend(name, **self.stage_options.get(name, {}))
+            except Exception as e:
+                print(f"Cascada: motor '{name}' no disponible, se omite ({e})")
+                self.unavailable.add(name)
+                return None
+        return self.stages[name]
+
+    def is_accepted(self, result):
+        """Criterio de salida temprana."""
+        return is_dimension_text(result.text) and result.confidence >= self.min_confidence
+
+    @staticmethod
+    def _values(text):
+        """Valores numéricos de una cota ('1.250' y '1.25' son la misma lectura)."""
+        return [float(n) for n in re.findall(r'\d*\.?\d+', text)]
+
+    def _merge(self, candidates, final):
+        """Devuelve el resultado final marcando las cotas leídas de otra forma por motores previos."""
+        final_values = self._values(final.text)
+        for candidate in candidates:
+            if candidate is final:
+                continue
+            if is_dimension_text(candidate.text) and self._values(candidate.text) != final_values:
+                final.disagreements.append(candidate)
+        return final
+
+    def recognize(self, region):
+        return self.recognize_batch([region])[0]
+
+    def recognize_batch(self, regions):
+        candidates = [[] for _ in regions]
+        pending = list(range(len(regions)))
+        final = [None] * len(regions)
+        prepared = None  # recortes preprocesados, al llegar a la primera etapa que los usa
+
+        for name in self.stage_names:
+            if not pending:
+                break
+            stage = self._get_stage(name)
+            if stage is None:
+                continue
+            if stage.needs_image and prepared is None:
+                prepared = [OCRRegion(self.region_image(r), r.page, r.clip, preprocessed=True) for r in regions]
+            stage_regions = prepared if stage.needs_image else regions
+            if len(pending) == 1:
+                results = [stage.recognize(stage_regions[pending[0]])]
+            else:
+                results = stage.recognize_batch([stage_regions[i] for i in pending])
+            still_pending = []
+            for i, result in zip(pending, results):
+                candidates[i].append(result)
+                if self.is_accepted(result):
+                    final[i] = result
+                else:
+                    still_pending.append(i)
+            pending = still_pending
+
+        out = []
+        for i, tried in enumerate(candidates):
+            if final[i] is None:
+                # Nadie superó el umbral: la mejor cota válida o, si no hay, la más confiada
+                valid = [r for r in tried if is_dimension_text(r.text)]
+                pool = valid or tried
+                final[i] = max(pool, key=lambda r: r.confidence) if pool else OCRResult(backend=self.name)
+            out.append(self._merge(tried, final[i]))
+        return out
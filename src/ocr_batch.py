@@ -0,0 +1,143 @@
+# Reconocimiento OCR por lotes
+# Agrupa muchos recortes pequeños (cotas) por tamaño, los normaliza a la altura
+# de entrada del modelo de reconocimiento y ejecuta una sola llamada al motor por
+# lote. Los resultados se devuelven asociados a la clave de cada recorte.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+from preprocessing import as_rgb
+from startup import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# Altura de entrada de los modelos de reconocimiento PP-OCRv5
+REC_IMAGE_HEIGHT = 48
+# Relación ancho/alto máxima antes de partir un grupo (evita rellenar de más)
+MAX_RATIO_SPREAD = 2.0
+
+
+# ========================================================
+# ===================Agrupación de lotes==================
+# ========================================================
+def normalize_crop(crop, height=REC_IMAGE_HEIGHT):
+    """Escala un recorte (array HxWxC o HxW) a la altura del modelo manteniendo el aspecto."""
+    h, w = crop.shape[:2]
+    if h == height:
+        return crop
+    new_w = max(1, int(round(w * height / h)))
+    return np.asarray(Image.fromarray(crop).resize((new_w, height), Image.BILINEAR))
+
+
+def pad_batch(crops, pad_value=255):
+    """Rellena (por la derecha, en blanco) los recortes de un lote hasta el mismo ancho."""
+    max_w = max(c.shape[1] for c in crops)
+    padded = []
+    for c in crops:
+        if c.shape[1] == max_w:
+            padded.append(c)
+            continue
+        pad = [(0, 0), (0, max_w - c.shape[1])] + [(0, 0)] * (c.ndim - 2)
+        padded.append(np.pad(c, pad, mode="constant", constant_values=pad_value))
+    return padded
+
+
+def group_by_size(items, batch_size):
+    """Agrupa [(clave, recorte)] en lotes de aspecto parecido.
+
+    Ordenar por relación ancho/alto minimiza el relleno necesario dentro de
+    cada lote; un lote se cierra al llegar a `batch_size` o cuando el aspecto
+    se dispara respecto al primer recorte del lote.
+    """
+    ordered = sorted(items, key=lambda kv: kv[1].shape[1] / max(1, kv[1].shape[0]))
+    batches, current, first_ratio = [], [], None
+    for key, crop in ordered:
+        ratio = crop.shape[1] / max(1, crop.shape[0])
+        if current and (len(current) >= batch_size or ratio > first_ratio * MAX_RATIO_SPREAD):
+            batches.append(current)
+            current = []
+        if not current:
+            first_ratio = max(ratio, 1e-6)
+        current.append((key, crop))
+    if current:
+        batches.append(current)
+    return batches
+
+
+# ========================================================
+# ======================Motores OCR=======================
+# ========================================================
+def paddle_text_recognizer(model_name="PP-OCRv5_mobile_rec"):
+    """Crea una función de reconocimiento por lotes con el modelo de solo-reconocimiento de PaddleOCR.
+
+    Devuelve un callable `recognize(lista_de_arrays) -> [(texto, confianza), ...]`.
+    Al saltarse la detección, el coste por recorte baja drásticamente en CPU.
+    """
+    from paddleocr import TextRecognition
+
+    model = TextRecognition(model_name=model_name)
+
+    def recognize(crops):
+        results = model.predict(input=[as_rgb(c) for c in crops], batch_size=len(crops))
+        return [(res["rec_text"], float(res["rec_score"])) for res in results]
+
+    return recognize
+
+
+def paddle_pipeline_recognizer(ocr_engine):
+    """Adapta un objeto PaddleOCR completo (detección + reconocimiento) a la interfaz por lotes."""
+    def recognize(crops):
+        out = []
+        for res in ocr_engine.predict([as_rgb(c) for c in crops]):
+            texts = res.get('rec_texts', [])
+            scores = res.get('rec_scores', [])
+            score = float(np.mean(scores)) if len(scores) else 0.0
+            out.append(("\n".join(texts), score))
+        return out
+
+    return recognize
+
+
+# ========================================================
+# ====================Clase principal=====================
+# ========================================================
+class CropBatcher:
+    """Acumula recortes con su clave y los reconoce por lotes agrupados por tamaño."""
+
+    def __init__(self, recognizer, batch_size=16, normalize=True, preprocess=None):
+        self.recognizer = recognizer  # callable: [np.ndarray] -> [(texto, confianza)]
+        self.batch_size = batch_size
+        self.normalize = normalize    # escalar a REC_IMAGE_HEIGHT y rellenar cada lote
+        self.preprocess = preprocess  # callable opcional aplicado a cada recorte al encolarlo
+        self.pending = []             # [(clave, recorte)]
+
+    def add(self, key, crop):
+        """Encola un recorte; `key` identifica su rectángulo de origen."""
+        crop = np.asarray(crop)
+        if crop.size == 0:
+            return
+        if self.preprocess is not None:
+            crop = self.preprocess(crop)
+        self.pending.append((key, crop))
+
+    def __len__(self):
+        return len(self.pending)
+
+    def run(self):
+        """Ejecuta el reconocimiento de todo lo encolado y devuelve {clave: (texto, confianza)}."""
+        items, self.pending = self.pending, []
+        if self.normalize:
+            items = [(key, normalize_crop(crop)) for key, crop in items]
+
+        results = {}
+        for batch in group_by_size(items, self.batch_size):
+            keys = [key for key, _ in batch]
+            crops = [crop for _, crop in batch]
+            if self.normalize:
+                crops = pad_batch(crops)
+            for key, result in zip(keys, self.recognizer(crops)):
+                results[key] = result
+        return results
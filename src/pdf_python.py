@@ -4,9 +4,10 @@ from PIL import Image, ImageTk
 import fitz  # PyMuPDF
 import os
 import numpy as np
-from paddleocr import PaddleOCR
 import traceback # Añadido para depuración
 
+from ocr_backends import OCRRegion, create_backend
+
 # --- CLASE PRINCIPAL DE LA APLICACIÓN ---
 class PDFOCRAnnotator:
     def __init__(self, root):
@@ -82,7 +83,8 @@ class PDFOCRAnnotator:
     def initialize_paddleocr(self):
         try:
             print(f"Intentando inicializar PaddleOCR con lang='{self.target_lang_ocr}', version='{self.ocr_model_version}'...")
-            self.ocr_engine = PaddleOCR(
+            self.ocr_engine = create_backend(
+                "paddleocr",
                 use_angle_cls=True,
                 lang=self.target_lang_ocr,
                 ocr_version=self.ocr_model_version
@@ -90,7 +92,7 @@ class PDFOCRAnnotator:
             print(f"Motor PaddleOCR (lang='{self.target_lang_ocr}', version='{self.ocr_model_version}') parece inicializado.")
             print("Realizando prueba de OCR para asegurar que los modelos están listos...")
             # Usar ocr() con cls=True porque use_angle_cls=True en el constructor.
-            _ = self.ocr_engine.predict(np.zeros((100, 100, 3), dtype=np.uint8)) 
+            _ = self.ocr_engine.recognize(OCRRegion(image=np.zeros((100, 100, 3), dtype=np.uint8)))
             print("Modelos de PaddleOCR (probablemente) descargados/cargados correctamente.")
         except Exception as e:
             user_home = os.path.expanduser('~')
@@ -296,45 +298,42 @@ class PDFOCRAnnotator:
 
                 if self.ocr_engine:
                     np_img_cropped = np.array(cropped_img_for_display)
-                    debug_result = self.ocr_engine.predict(np_img_cropped) 
+                    debug_result = self.ocr_engine.recognize(OCRRegion(image=np_img_cropped))
                     print("\n--- TEXTO DETECTADO (DEBUG DESDE ON_MOUSE_RELEASE) ---")
-                    if debug_result and debug_result[0] is not None:
-                        for line_info in debug_result:
-                           for i in range(len(line_info['rec_texts'])):
-                                text = line_info['rec_texts'][i]
-                               # 1. Obtener coordenadas del recorte (relativas al PDF)
-                                pdf_x0 = selection_box_canvas_coords[0] / self.zoom_factor
-                                pdf_y0 = selection_box_canvas_coords[1] / self.zoom_factor
-                                pdf_x1 = selection_box_canvas_coords[2] / self.zoom_factor
-                                pdf_y1 = selection_box_canvas_coords[3] / self.zoom_factor
-
-                                fitz_rect = fitz.Rect(pdf_x0, pdf_y0, pdf_x1, pdf_y1)
-                                page = self.pdf_document.load_page(self.current_page_num)
-
-                                # 2. Pintar fondo blanco en el rectángulo
-                                page.draw_rect(fitz_rect, color=(1, 1, 1), fill=(1, 1, 1), overlay=True)
-
-                                # 3. Concatenar el texto detectado por OCR (reemplaza el print)
-                                ocr_text = "\n".join(line_info['rec_texts'])
-
-                                # 4. Ajustar tamaño de fuente según el alto del rectángulo
-                                rect_height_pt = fitz_rect.height
-                                font_size = 18                                
-                                # 5. Insertar el texto OCR en el rectángulo
-                                rc = page.insert_textbox(
-                                fitz_rect, ocr_text,
-                                fontsize=font_size, fontname="helv",
-                                color=(0, 0, 0), align=fitz.TEXT_ALIGN_LEFT,
-                                rotate=0, overlay=True
-                                )
-
-                                if rc < 0:
-                                    print(f"Advertencia: El texto OCR ('{ocr_text}') puede no caber completamente. Código: {rc}")
-
-                                # 6. Volver a mostrar la página con el texto sobreescrito
-                                current_xview = self.canvas.xview()
-                                current_yview = self.canvas.yview()
-                                self.display_page()
+                    if debug_result.text:
+                        # 1. Obtener coordenadas del recorte (relativas al PDF)
+                        pdf_x0 = selection_box_canvas_coords[0] / self.zoom_factor
+                        pdf_y0 = selection_box_canvas_coords[1] / self.zoom_factor
+                        pdf_x1 = selection_box_canvas_coords[2] / self.zoom_factor
+                        pdf_y1 = selection_box_canvas_coords[3] / self.zoom_factor
+
+                        fitz_rect = fitz.Rect(pdf_x0, pdf_y0, pdf_x1, pdf_y1)
+                        page = self.pdf_document.load_page(self.current_page_num)
+
+                        # 2. Pintar fondo blanco en el rectángulo
+                        page.draw_rect(fitz_rect, color=(1, 1, 1), fill=(1, 1, 1), overlay=True)
+
+                        # 3. Texto detectado por OCR (líneas ya concatenadas por el motor)
+                        ocr_text = debug_result.text
+
+                        # 4. Ajustar tamaño de fuente según el alto del rectángulo
+                        rect_height_pt = fitz_rect.height
+                        font_size = 18                                
+                        # 5. Insertar el texto OCR en el rectángulo
+                        rc = page.insert_textbox(
+                        fitz_rect, ocr_text,
+                        fontsize=font_size, fontname="helv",
+                        color=(0, 0, 0), align=fitz.TEXT_ALIGN_LEFT,
+                        rotate=0, overlay=True
+                        )
+
+                        if rc < 0:
+                            print(f"Advertencia: El texto OCR ('{ocr_text}') puede no caber completamente. Código: {rc}")
+
+                        # 6. Volver a mostrar la página con el texto sobreescrito
+                        current_xview = self.canvas.xview()
+                        current_yview = self.canvas.yview()
+                        self.display_page()
         except Exception as e:
             print(f"Error al procesar selección: {e}")
             traceback.print_exc()
@@ -477,12 +476,8 @@ class PDFOCRAnnotator:
             cropped_image_np = np.array(cropped_image_pil_for_ocr)
 
             print(f"Realizando OCR en región (coords canvas): {image_coords_on_canvas} con lang='{self.target_lang_ocr}'")
-            result = self.ocr_engine.predict(cropped_image_np)
-
-            ocr_text_parts = []
-            if result and result[0] is not None:
-                for line_info in result[0]: ocr_text_parts.append(line_info[1][0])
-            ocr_text = "\n".join(ocr_text_parts).strip()
+            result = self.ocr_engine.recognize(OCRRegion(image=cropped_image_np))
+            ocr_text = result.text.strip()
             print(f"Texto OCR para anotación (PaddleOCR): '{ocr_text}'")
 
             if not ocr_text:
@@ -4,9 +4,10 @@ from PIL import Image, ImageTk
 import fitz  # PyMuPDF
 import os
 import numpy as np
-from paddleocr import PaddleOCR
 import traceback # Para imprimir el stack trace completo en caso de error
 
+from ocr_backends import OCRRegion, create_backend
+
 
 class PDFOCRAnnotator:
     """
@@ -107,7 +108,8 @@ class PDFOCRAnnotator:
         """Inicializa el motor PaddleOCR. Muestra errores si falla."""
         try:
             print(f"Intentando inicializar PaddleOCR con lang='{self.target_lang_ocr}', version='{self.ocr_model_version}'...")
-            self.ocr_engine = PaddleOCR(
+            self.ocr_engine = create_backend(
+                "paddleocr",
                 use_angle_cls=True,         # Habilitar clasificación de ángulo del texto
                 lang=self.target_lang_ocr,
                 ocr_version=self.ocr_model_version)
@@ -116,7 +118,7 @@ class PDFOCRAnnotator:
             # Realizar una prueba de OCR para asegurar que los modelos están listos y se descargan si es necesario.
             # cls=True es importante porque use_angle_cls=True en el constructor.
             print("Realizando prueba de OCR para 'calentar' los modelos...")
-            _ = self.ocr_engine.ocr(np.zeros((100, 100, 3), dtype=np.uint8))
+            _ = self.ocr_engine.recognize(OCRRegion(image=np.zeros((100, 100, 3), dtype=np.uint8)))
             print("Modelos de PaddleOCR (probablemente) descargados/cargados correctamente.")
         except Exception as e:
             user_home = os.path.expanduser('~')
@@ -465,18 +467,10 @@ class PDFOCRAnnotator:
             
             # 2. Realizar OCR en la imagen recortada
             cropped_numpy_image = np.array(cropped_pil_image_for_ocr)
-            # Usar cls=True porque use_angle_cls=True en el constructor de PaddleOCR
-            ocr_result = self.ocr_engine.ocr(cropped_numpy_image)
-
-            # 3. Extraer el texto reconocido
-            ocr_text_parts = []
-            # Estructura de ocr_result: [[line1_info, line2_info, ...]]
-            # line_info: [bounding_box_dentro_del_crop, (text, confidence_score)]
-            if ocr_result and ocr_result[0] is not None: # ocr_result[0] contiene la lista de líneas para la imagen
-                for line_info in ocr_result[0]:
-                    ocr_text_parts.append(line_info[1][0]) # Extraer solo el texto
-            
-            ocr_text = "\n".join(ocr_text_parts).strip()
+            ocr_result = self.ocr_engine.recognize(OCRRegion(image=cropped_numpy_image))
+
+            # 3. Extraer el texto reconocido (el motor ya une las líneas con saltos de línea)
+            ocr_text = ocr_result.text.strip()
             # print(f"Texto OCR para anotación: '{ocr_text}'") # Log informativo
 
             if not ocr_text:
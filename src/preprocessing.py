@@ -0,0 +1,188 @@
+# Preprocesado de recortes antes del OCR
+# Todas las operaciones trabajan con NumPy vectorizado sobre el array del recorte:
+# escala de grises, umbral adaptativo, eliminación de líneas de cota/rayado,
+# corrección de inclinación y recorte ajustado a la tinta.
+# El resultado es un único buffer uint8 en escala de grises (tinta negra sobre
+# blanco) que pueden usar tanto PaddleOCR como Tesseract sin copias extra.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+from startup import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# Configuración por defecto; cada paso puede desactivarse por separado
+DEFAULT_PREPROCESS = {
+    "grayscale": True,
+    "threshold": True,        # umbral adaptativo por media local
+    "block_size": 31,         # lado de la ventana del umbral (píxeles)
+    "threshold_offset": 10,   # la tinta debe ser esta cantidad más oscura que la media local
+    "remove_lines": True,     # quitar líneas de cota, de extensión y rayado largos
+    "line_min_ratio": 0.6,    # longitud mínima de línea respecto al lado del recorte
+    "deskew": True,
+    "max_skew": 5.0,          # grados
+    "skew_step": 0.5,
+    "autocrop": True,
+    "autocrop_margin": 4,     # píxeles de blanco alrededor de la tinta
+}
+
+# Pesos ITU-R BT.601 para la conversión a gris
+_GRAY_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+# ========================================================
+# ===================Pasos individuales===================
+# ========================================================
+def to_grayscale(crop):
+    """Convierte un recorte RGB (HxWx3) a gris uint8; si ya es gris lo devuelve tal cual."""
+    if crop.ndim == 2:
+        return crop
+    return (crop[..., :3] @ np.array(_GRAY_WEIGHTS, dtype=np.float32)).astype(np.uint8)
+
+
+def adaptive_threshold(gray, block_size=31, offset=10):
+    """Máscara de tinta (True = tinta) comparando cada píxel con la media de su vecindario.
+
+    La media local se calcula con una imagen integral, así el coste no depende
+    del tamaño de la ventana. Tolera escaneos tenues y fondos no uniformes.
+    """
+    h, w = gray.shape
+    r = block_size // 2
+    integral = np.zeros((h + 1, w + 1), dtype=np.int64)
+    np.cumsum(np.cumsum(gray, axis=0, dtype=np.int64), axis=1, out=integral[1:, 1:])
+
+    ys = np.arange(h)
+    xs = np.arange(w)
+    y0 = np.clip(ys - r, 0, h)[:, None]
+    y1 = np.clip(ys + r + 1, 0, h)[:, None]
+    x0 = np.clip(xs - r, 0, w)[None, :]
+    x1 = np.clip(xs + r + 1, 0, w)[None, :]
+
+    sums = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+    area = (y1 - y0) * (x1 - x0)
+    return gray.astype(np.int64) * area < sums - offset * area
+
+
+def _long_runs(mask, min_len, axis):
+    """Marca los píxeles que pertenecen a tramos de tinta de al menos `min_len` a lo largo de `axis`."""
+    if min_len <= 1 or mask.shape[axis] < min_len:
+        return np.zeros_like(mask)
+    m = np.moveaxis(mask, axis, -1).astype(np.int32)
+    c = np.cumsum(m, axis=-1)
+    c = np.concatenate([np.zeros(c.shape[:-1] + (1,), np.int32), c], axis=-1)
+    # Ventanas de longitud min_len completamente llenas de tinta
+    full = (c[..., min_len:] - c[..., :-min_len]) == min_len
+    # Extender cada ventana completa a sus min_len píxeles
+    f = np.cumsum(np.concatenate([full.astype(np.int32),
+                                  np.zeros(full.shape[:-1] + (min_len - 1,), np.int32)], axis=-1), axis=-1)
+    f[..., min_len:] -= f[..., :-min_len].copy()
+    return np.moveaxis(f > 0, -1, axis)
+
+
+def remove_lines(mask, min_ratio=0.6):
+    """Elimina de la máscara las líneas horizontales y verticales largas (cotas, rayado, marcos).
+
+    Una línea debe medir al menos `min_ratio` del lado del recorte y el doble
+    del lado corto, para no confundirse con los trazos de los dígitos.
+    """
+    h, w = mask.shape
+    short = min(h, w)
+    horizontal = _long_runs(mask, max(int(min_ratio * w), 2 * short), axis=1)
+    vertical = _long_runs(mask, max(int(min_ratio * h), 2 * short), axis=0)
+    return mask & ~(horizontal | vertical)
+
+
+def estimate_skew(mask, max_skew=5.0, step=0.5):
+    """Ángulo (grados) que maximiza la nitidez del perfil de proyección horizontal de la tinta."""
+    ys, xs = np.nonzero(mask)
+    if len(ys) < 10:
+        return 0.0
+    angles = np.arange(-max_skew, max_skew + step / 2, step)
+    tans = np.tan(np.deg2rad(angles))
+    # Proyección de todos los píxeles de tinta para todos los ángulos a la vez
+    proj = np.rint(ys[None, :] - xs[None, :] * tans[:, None]).astype(np.int64)
+    proj -= proj.min(axis=1, keepdims=True)
+    n_bins = int(proj.max()) + 1
+    offsets = (np.arange(len(angles)) * n_bins)[:, None]
+    hist = np.bincount((proj + offsets).ravel(), minlength=len(angles) * n_bins)
+    scores = (hist.reshape(len(angles), n_bins).astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[int(np.argmax(scores))])
+
+
+def deskew(mask, max_skew=5.0, step=0.5):
+    """Endereza la máscara si su inclinación estimada supera medio paso."""
+    angle = estimate_skew(mask, max_skew, step)
+    if abs(angle) < step / 2:
+        return mask
+    img = Image.fromarray(mask.astype(np.uint8) * 255)
+    return np.asarray(img.rotate(angle, resample=Image.NEAREST, fillcolor=0)) > 0
+
+
+def autocrop(mask, margin=4):
+    """Recorta la máscara a la caja de la tinta dejando `margin` píxeles alrededor."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0:
+        return mask
+    h, w = mask.shape
+    y0, y1 = max(0, rows[0] - margin), min(h, rows[-1] + 1 + margin)
+    x0, x1 = max(0, cols[0] - margin), min(w, cols[-1] + 1 + margin)
+    return mask[y0:y1, x0:x1]
+
+
+# ========================================================
+# =======================Pipeline=========================
+# ========================================================
+def preprocess_crop(crop, config=None):
+    """Aplica los pasos activados en `config` y devuelve un buffer gris uint8 contiguo.
+
+    Si no se activa ningún paso de binarización se devuelve el gris (o el
+    recorte original si también se desactiva `grayscale`).
+    """
+    cfg = dict(DEFAULT_PREPROCESS)
+    if config:
+        cfg.update(config)
+
+    crop = np.asarray(crop)
+    if not cfg["grayscale"]:
+        return crop
+    gray = to_grayscale(crop)
+
+    binary_steps = cfg["threshold"] or cfg["remove_lines"] or cfg["deskew"] or cfg["autocrop"]
+    if not binary_steps:
+        return np.ascontiguousarray(gray)
+
+    if cfg["threshold"]:
+        mask = adaptive_threshold(gray, cfg["block_size"], cfg["threshold_offset"])
+    else:
+        mask = gray < 128
+    if cfg["remove_lines"]:
+        mask = remove_lines(mask, cfg["line_min_ratio"])
+    if cfg["deskew"]:
+        mask = deskew(mask, cfg["max_skew"], cfg["skew_step"])
+    if cfg["autocrop"]:
+        mask = autocrop(mask, cfg["autocrop_margin"])
+
+    # Tinta negra (0) sobre fondo blanco (255), en un único buffer contiguo
+    out = np.full(mask.shape, 255, dtype=np.uint8)
+    out[mask] = 0
+    return out
+
+
+def as_pil(buffer):
+    """Imagen PIL que comparte memoria con el buffer gris (para Tesseract)."""
+    h, w = buffer.shape[:2]
+    if buffer.ndim == 2:
+        return Image.frombuffer("L", (w, h), buffer, "raw", "L", 0, 1)
+    return Image.fromarray(buffer)
+
+
+def as_rgb(buffer):
+    """Vista HxWx3 de solo lectura sobre el buffer gris (para PaddleOCR), sin copiar datos."""
+    if buffer.ndim == 3:
+        return buffer
+    return np.broadcast_to(buffer[..., None], buffer.shape + (3,))
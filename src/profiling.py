@@ -0,0 +1,225 @@
+# Instrumentación de tiempos por etapa del pipeline
+# Cada etapa (render, recorte, preprocesado, OCR, conversión, ajuste del texto,
+# escritura en la página, re-render, guardado) se mide con un span:
+#
+#     with span("ocr", backend="tesseract"):
+#         ...
+#
+# Desactivado por defecto y sin coste apreciable. Se activa:
+# - con la variable de entorno INCHES_TO_MM_PROFILE=1 (o =<directorio de salida>),
+# - con F9 en la aplicación gráfica (al desactivar se exportan los ficheros),
+# - con --profile en batch_convert.py.
+# La exportación genera JSON lines (un span por línea + histogramas) y el formato
+# Chrome trace (abrir en chrome://tracing o https://ui.perfetto.dev).
+#
+# La memoria está acotada: se guardan los últimos MAX_SPANS spans y los
+# histogramas se acumulan al registrar cada uno. Con INCHES_TO_MM_PROFILE los
+# procesos de larga duración (servidor de conversión, carpeta vigilada y sus
+# procesos de trabajo) exportan y vacían lo capturado cada FLUSH_S segundos.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import atexit
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Límites superiores (ms) de los cubos de los histogramas por etapa
+HISTOGRAM_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+ENV_VAR = "INCHES_TO_MM_PROFILE"
+MAX_SPANS = 100_000  # spans en memoria para las trazas; los más antiguos se descartan
+FLUSH_S = 600        # exportación periódica con INCHES_TO_MM_PROFILE
+
+
+# ========================================================
+# ====================Clase principal=====================
+# ========================================================
+class Profiler:
+    """Registra spans (nombre, inicio, duración, hilo, atributos) y agrega histogramas por etapa.
+
+    Con `flush_s` lo capturado se exporta y se descarta cada `flush_s` segundos.
+    """
+
+    def __init__(self, enabled=False, output_dir=".", max_spans=MAX_SPANS, flush_s=None):
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.spans = deque(maxlen=max_spans)  # [(nombre, inicio_ns, duración_ns, id_hilo, atributos)]
+        self.stages = {}  # nombre -> {"count", "total_ms", "max_ms", "bucket_counts"} de todos los spans
+        self.flush_s = flush_s
+        self._next_flush = time.monotonic() + flush_s if flush_s else None
+        self._flushes = 0
+        self._lock = threading.Lock()
+        self._origin_ns = time.perf_counter_ns()
+
+    # -------------------- Registro --------------------
+    def span(self, name, **attrs):
+        """Context manager que mide el bloque; no hace nada si el profiler está desactivado."""
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name, attrs)
+
+    @contextmanager
+    def _span(self, name, attrs):
+        start = time.perf_counter_ns()
+        try:
+            yield attrs  # el bloque puede añadir atributos (p. ej. tamaño del recorte)
+        finally:
+            duration = time.perf_counter_ns() - start
+            self._record(name, start - self._origin_ns, duration, threading.get_ident(), attrs)
+
+    def _record(self, name, start, duration, tid, attrs):
+        duration_ms = duration / 1e6
+        with self._lock:
+            self.spans.append((name, start, duration, tid, attrs))
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                             "bucket_counts": [0] * len(HISTOGRAM_BUCKETS_MS)}
+            stats["count"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            stats["bucket_counts"][bisect.bisect_left(HISTOGRAM_BUCKETS_MS, duration_ms)] += 1
+            flush = self._next_flush is not None and time.monotonic() >= self._next_flush
+            if flush:
+                self._next_flush = time.monotonic() + self.flush_s
+                self._flushes += 1
+                basename = time.strftime("profile_%Y%m%d_%H%M%S") + f"_{os.getpid()}_{self._flushes}"
+                snapshot = self._take()
+        if flush:
+            paths = snapshot.export(basename)
+            print(f"Perfil exportado en: {', '.join(paths)}")
+
+    def set_enabled(self, enabled):
+        """Activa o desactiva la captura en tiempo de ejecución."""
+        self.enabled = enabled
+
+    def reset(self):
+        """Descarta los spans capturados y los histogramas."""
+        with self._lock:
+            self._take()
+
+    def _take(self):
+        """Pasa lo capturado a un Profiler aparte (para exportarlo) y empieza de cero. Con el cerrojo tomado."""
+        snapshot = Profiler(output_dir=self.output_dir, max_spans=self.spans.maxlen)
+        snapshot.spans, snapshot.stages = self.spans, self.stages
+        snapshot._origin_ns = self._origin_ns
+        self.spans = deque(maxlen=self.spans.maxlen)
+        self.stages = {}
+        return snapshot
+
+    # -------------------- Agregación --------------------
+    def histograms(self):
+        """Resumen por etapa: número, total, p50, p95, máximo (ms) y cuentas por cubo.
+
+        Número, total, máximo y cubos cuentan todos los spans; p50 y p95 se
+        calculan sobre los spans que siguen en memoria (los últimos MAX_SPANS).
+        """
+        by_stage = {}
+        with self._lock:
+            spans = list(self.spans)
+            stages = {name: dict(stats, bucket_counts=list(stats["bucket_counts"]))
+                      for name, stats in self.stages.items()}
+        for name, _start, duration, _tid, _attrs in spans:
+            by_stage.setdefault(name, []).append(duration / 1e6)
+
+        summary = {}
+        for name, stats in stages.items():
+            values = sorted(by_stage.get(name, []))
+            summary[name] = {
+                "count": stats["count"],
+                "total_ms": stats["total_ms"],
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "max_ms": stats["max_ms"],
+                "buckets_ms": [("inf" if b == float("inf") else b) for b in HISTOGRAM_BUCKETS_MS],
+                "bucket_counts": stats["bucket_counts"],
+            }
+        return summary
+
+    def report(self):
+        """Tabla legible de tiempos por etapa, ordenada por tiempo total."""
+        rows = sorted(self.histograms().items(), key=lambda kv: -kv[1]["total_ms"])
+        lines = [f"{'Etapa':<16}{'N':>6}{'Total ms':>12}{'p50 ms':>10}{'p95 ms':>10}{'Máx ms':>10}"]
+        for name, h in rows:
+            lines.append(f"{name:<16}{h['count']:>6}{h['total_ms']:>12.1f}{h['p50_ms']:>10.1f}"
+                         f"{h['p95_ms']:>10.1f}{h['max_ms']:>10.1f}")
+        return "\n".join(lines)
+
+    # -------------------- Exportación --------------------
+    def export_jsonl(self, path):
+        """Un objeto JSON por span y uno por histograma de etapa."""
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "w", encoding="utf-8") as f:
+            for name, start, duration, tid, attrs in spans:
+                f.write(json.dumps({"type": "span", "name": name, "start_ms": start / 1e6,
+                                    "duration_ms": duration / 1e6, "thread": tid,
+                                    "attrs": attrs}, default=str) + "\n")
+            for name, h in self.histograms().items():
+                f.write(json.dumps({"type": "histogram", "name": name, **h}) + "\n")
+
+    def export_chrome_trace(self, path):
+        """Formato Chrome trace (eventos completos 'X', tiempos en microsegundos)."""
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        events = [{"name": name, "cat": "pipeline", "ph": "X", "ts": start / 1e3, "dur": duration / 1e3,
+                   "pid": pid, "tid": tid, "args": attrs}
+                  for name, start, duration, tid, attrs in spans]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+    def export(self, basename=None):
+        """Exporta ambos formatos en `output_dir` y devuelve las rutas generadas."""
+        basename = basename or time.strftime("profile_%Y%m%d_%H%M%S")
+        os.makedirs(self.output_dir, exist_ok=True)
+        jsonl_path = os.path.join(self.output_dir, basename + ".jsonl")
+        trace_path = os.path.join(self.output_dir, basename + ".trace.json")
+        self.export_jsonl(jsonl_path)
+        self.export_chrome_trace(trace_path)
+        return jsonl_path, trace_path
+
+
+def percentile(sorted_values, q):
+    """Percentil por el método del rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def _profiler_from_env():
+    """Crea el profiler global según INCHES_TO_MM_PROFILE ('', '0', '1' o un directorio)."""
+    value = os.environ.get(ENV_VAR, "")
+    if value in ("", "0"):
+        return Profiler(enabled=False)
+    if value == "1":
+        return Profiler(enabled=True, flush_s=FLUSH_S)
+    return Profiler(enabled=True, output_dir=value, flush_s=FLUSH_S)
+
+
+# Profiler global compartido por todos los módulos
+profiler = _profiler_from_env()
+
+
+def span(name, **attrs):
+    """Atajo a `profiler.span` del profiler global."""
+    return profiler.span(name, **attrs)
+
+
+@atexit.register
+def _export_at_exit():
+    """Si la captura sigue activa al salir, exporta lo capturado para no perderlo."""
+    if profiler.enabled and profiler.spans:
+        paths = profiler.export()
+        print(profiler.report())
+        print(f"Perfil exportado en: {', '.join(paths)}")
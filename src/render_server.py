@@ -0,0 +1,260 @@
+# Proceso de renderizado con memoria compartida
+# Las llamadas a PyMuPDF retienen el GIL y se hacían en el hilo de Tk: durante
+# un render pesado la ventana no respondía. Los hilos no sirven porque los
+# documentos de fitz no son seguros entre hilos. Aquí el render se hace en un
+# proceso aparte con su propio manejador del documento:
+# - la interfaz pide (página, zoom, zona, espacio de color) con una prioridad
+#   (primero las teselas visibles, después las de precarga) y puede cancelar
+#   las peticiones que ya no hacen falta;
+# - el proceso escribe los píxeles en un bloque de memoria compartida que
+#   reserva la interfaz, y esta lo mapea sin copiarlo (en gris la imagen PIL
+#   apunta directamente al bloque).
+#
+# El proceso lee el PDF tal como está en disco: las páginas que se editan en
+# la aplicación se marcan como modificadas y se renderizan en el propio
+# proceso de la interfaz. Se desactiva con INCHES_TO_MM_RENDER_SERVER=0.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import heapq
+import multiprocessing
+import os
+import queue
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from rendering import render_clip_pixmap
+from startup import lazy_import
+
+Image = lazy_import("PIL.Image")
+fitz = lazy_import("fitz")  # PyMuPDF
+
+ENABLED = os.environ.get("INCHES_TO_MM_RENDER_SERVER", "1") != "0"
+PRIORITY_VISIBLE = 0   # teselas que se ven: antes que nada
+PRIORITY_PREFETCH = 1  # teselas del margen de precarga
+PRIORITY_THUMBNAIL = 2 # miniaturas de la barra lateral: cuando no queda nada de la vista
+POLL_MS = 15           # cada cuánto recoge la interfaz los renders terminados
+
+
+# ========================================================
+# ===================Proceso de render====================
+# ========================================================
+def _attach(name):
+    """Abre un bloque de memoria compartida creado por la interfaz sin adueñarse de él."""
+    try:
+        return SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = SharedMemory(name=name)
+        # Sin esto, el resource_tracker de este proceso borraría el bloque al salir
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _render_into(doc, page_no, zoom, box, channels, shm_name):
+    """Renderiza la zona en el bloque compartido y devuelve (ancho, alto, canales)."""
+    colorspace = fitz.csGRAY if channels == 1 else fitz.csRGB
+    pix = render_clip_pixmap(doc[page_no], zoom, box, colorspace)
+    nbytes = pix.width * pix.height * pix.n
+    shm = _attach(shm_name)
+    try:
+        if nbytes > shm.size:
+            raise ValueError(f"el render ({pix.width}x{pix.height}) no cabe en el bloque compartido")
+        shm.buf[:nbytes] = pix.samples_mv
+    finally:
+        shm.close()
+    return pix.width, pix.height, pix.n
+
+
+def _serve(requests, results):
+    """Bucle del proceso de render: atiende las peticiones por prioridad.
+
+    Mensajes de entrada: ("open", ruta), ("render", id, prioridad, página,
+    zoom, zona, canales, bloque), ("cancel", id) y ("stop",). Salida:
+    ("done", id, ancho, alto, canales) o ("error", id, mensaje).
+    """
+    doc = None
+    heap = []          # (prioridad, id, mensaje): a igual prioridad, por orden de llegada
+    cancelled = set()
+    while True:
+        # Leer todo lo que haya llegado antes de elegir la siguiente petición
+        block = not heap
+        try:
+            while True:
+                message = requests.get(block=block)
+                block = False
+                kind = message[0]
+                if kind == "stop":
+                    if doc is not None:
+                        doc.close()
+                    return
+                if kind == "open":
+                    if doc is not None:
+                        doc.close()
+                    doc = fitz.open(message[1])
+                    heap.clear()
+                    cancelled.clear()
+                elif kind == "cancel":
+                    cancelled.add(message[1])
+                elif kind == "render":
+                    heapq.heappush(heap, (message[2], message[1], message))
+        except queue.Empty:
+            pass
+        if not heap:
+            continue
+
+        _priority, request_id, message = heapq.heappop(heap)
+        if request_id in cancelled:
+            cancelled.discard(request_id)
+            continue
+        _kind, _id, _priority, page_no, zoom, box, channels, shm_name = message
+        try:
+            results.put(("done", request_id, *_render_into(doc, page_no, zoom, box, channels, shm_name)))
+        except Exception as e:
+            results.put(("error", request_id, str(e)))
+
+
+# ========================================================
+# ====================Lado de la interfaz=================
+# ========================================================
+class RenderResult:
+    """Render terminado: imagen PIL sobre el bloque compartido, que se libera con `release`."""
+
+    def __init__(self, image, shm, client):
+        self.image = image
+        self._shm = shm
+        self._client = client
+
+    def release(self):
+        if self._shm is not None:
+            self.image = None
+            self._client._release(self._shm)
+            self._shm = None
+
+
+class RenderClient:
+    """Envía peticiones de render al proceso y entrega los resultados con callbacks.
+
+    `poll()` se llama periódicamente desde el hilo de Tk; cada resultado se
+    entrega a la función `callback(RenderResult o None)` de su petición (None
+    si el render falló y hay que hacerlo en local).
+    """
+
+    def __init__(self):
+        self.process = None
+        self.requests = None
+        self.results = None
+        self.pending = {}    # id -> (bloque compartido, callback)
+        self.dirty = set()   # páginas editadas en la interfaz: el proceso tiene la versión de disco
+        self._next_id = 0
+        self._closing = []   # bloques liberados que aún tienen vistas (se cierran cuando se pueda)
+
+    @property
+    def available(self):
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        self.requests = context.Queue()
+        self.results = context.Queue()
+        self.process = context.Process(target=_serve, args=(self.requests, self.results),
+                                       daemon=True, name="render-server")
+        self.process.start()
+
+    def open(self, pdf_path):
+        """Abre el documento en el proceso de render (arrancándolo la primera vez)."""
+        if self.process is None:
+            try:
+                self.start()
+            except Exception as e:
+                print(f"Proceso de render no disponible, se renderiza en la interfaz ({e})")
+                self.process = None
+                return
+        self.cancel_all()
+        self.dirty = set()
+        self.requests.put(("open", pdf_path))
+
+    def mark_dirty(self, page_no):
+        """La página se ha modificado en la interfaz: a partir de ahora se renderiza en local."""
+        self.dirty.add(page_no)
+
+    def can_render(self, page_no):
+        return self.available and page_no not in self.dirty
+
+    def request(self, page_no, zoom, box, colorspace, priority, callback):
+        """Pide el render de `box` (píxeles a ese zoom) de la página. Devuelve el id de la petición."""
+        # Un píxel de más por lado: el redondeo de MuPDF puede dar una fila o columna más
+        width, height = int(box[2] - box[0]) + 1, int(box[3] - box[1]) + 1
+        shm = SharedMemory(create=True, size=max(1, width * height * colorspace.n))
+        self._next_id += 1
+        request_id = self._next_id
+        self.pending[request_id] = (shm, callback)
+        self.requests.put(("render", request_id, priority, page_no, zoom, tuple(box), colorspace.n, shm.name))
+        return request_id
+
+    def cancel(self, request_id):
+        entry = self.pending.pop(request_id, None)
+        if entry is not None:
+            self.requests.put(("cancel", request_id))
+            self._release(entry[0])
+
+    def cancel_all(self):
+        for request_id in list(self.pending):
+            self.cancel(request_id)
+
+    def poll(self):
+        """Entrega los renders terminados. Devuelve cuántos resultados se han entregado."""
+        delivered = 0
+        while self.results is not None:
+            try:
+                message = self.results.get_nowait()
+            except queue.Empty:
+                break
+            entry = self.pending.pop(message[1], None)
+            if entry is None:
+                continue  # cancelada mientras se renderizaba (el bloque ya está liberado)
+            shm, callback = entry
+            if message[0] == "error":
+                print(f"Error en el proceso de render: {message[2]}")
+                self._release(shm)
+                callback(None)
+            else:
+                width, height, channels = message[2:5]
+                mode = "L" if channels == 1 else "RGB"
+                # En gris la imagen apunta al bloque compartido; en RGB PIL hace su propia copia
+                image = Image.frombuffer(mode, (width, height), shm.buf, "raw", mode, 0, 1)
+                callback(RenderResult(image, shm, self))
+            delivered += 1
+        self._collect()
+        return delivered
+
+    def _release(self, shm):
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+        self._closing.append(shm)
+        self._collect()
+
+    def _collect(self):
+        """Cierra los bloques liberados cuyas imágenes ya no existen."""
+        still_open = []
+        for shm in self._closing:
+            try:
+                shm.close()
+            except BufferError:
+                still_open.append(shm)  # alguna imagen PIL aún apunta al bloque
+        self._closing = still_open
+
+    def close(self):
+        """Detiene el proceso de render y libera los bloques pendientes."""
+        self.cancel_all()
+        if self.process is not None:
+            self.requests.put(("stop",))
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+        self._collect()
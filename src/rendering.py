@@ -0,0 +1,74 @@
+# Renderizado de páginas en color o en gris
+# Casi todos los planos son en blanco y negro: renderizarlos en un solo canal
+# gris reduce a un tercio la memoria del pixmap, de las imágenes PIL, de las
+# instantáneas de deshacer y de los recortes que van al OCR.
+#
+# Modos de color:
+# - "auto": se decide por página con un render a baja resolución,
+# - "gray": siempre en gris,
+# - "rgb":  siempre en color (comportamiento original).
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+from startup import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+fitz = lazy_import("fitz")  # PyMuPDF
+
+COLOR_MODES = ("auto", "gray", "rgb")
+DETECT_ZOOM = 0.25          # zoom del render de muestra para el modo "auto"
+GRAY_TOLERANCE = 12         # diferencia máxima entre canales de un píxel "gris"
+GRAY_MIN_FRACTION = 0.999   # fracción de píxeles grises para tratar la página como monocroma
+
+
+# ========================================================
+# ==================Detección de color====================
+# ========================================================
+def is_grayscale_page(page, zoom=DETECT_ZOOM, tolerance=GRAY_TOLERANCE, min_fraction=GRAY_MIN_FRACTION):
+    """True si la página no tiene color apreciable (según un render pequeño)."""
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    spread = img.max(axis=2) - img.min(axis=2)  # 0 en píxeles perfectamente grises
+    colored = np.count_nonzero(spread > tolerance)
+    return colored <= (1 - min_fraction) * spread.size
+
+
+def page_colorspace(page, mode="auto"):
+    """Espacio de color con el que renderizar la página según el modo."""
+    if mode not in COLOR_MODES:
+        raise ValueError(f"Modo de color desconocido: '{mode}' (use {', '.join(COLOR_MODES)})")
+    if mode == "gray":
+        return fitz.csGRAY
+    if mode == "rgb":
+        return fitz.csRGB
+    return fitz.csGRAY if is_grayscale_page(page) else fitz.csRGB
+
+
+# ========================================================
+# ======================Renderizado=======================
+# ========================================================
+def render_page_array(page, zoom, colorspace=None):
+    """Renderiza la página a un array HxW (gris) o HxWx3 (RGB, por defecto) sin copias sobre el pixmap."""
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace or fitz.csRGB, alpha=False)
+    img = np.frombuffer(pix.samples, dtype=np.uint8)
+    if pix.n == 1:
+        return img.reshape(pix.height, pix.width)
+    return img.reshape(pix.height, pix.width, pix.n)
+
+
+def render_clip_pixmap(page, zoom, box, colorspace=None):
+    """Pixmap de la zona `box` (píxeles a ese zoom) de la página, sin canal alfa (RGB por defecto)."""
+    clip = fitz.Rect(box) / zoom
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, colorspace=colorspace or fitz.csRGB,
+                           alpha=False)
+
+
+def render_clip(page, zoom, box, colorspace=None):
+    """Renderiza la zona `box` (píxeles a ese zoom) de la página como imagen PIL ("L" o "RGB")."""
+    pix = render_clip_pixmap(page, zoom, box, colorspace)
+    mode = "L" if pix.n == 1 else "RGB"
+    return Image.frombytes(mode, [pix.width, pix.height], pix.samples)
@@ -0,0 +1,72 @@
+# Lectura de una selección rectangular
+# Parte de process_selection que no depende de la interfaz: geometría de la
+# selección (recorte con margen, rectángulos PDF) y OCR del recorte. La usan la
+# aplicación gráfica y el benchmark de precisión, que así miden exactamente el
+# mismo camino que recorre el usuario.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+from ocr_backends import OCRRegion
+from profiling import span
+from startup import lazy_import
+
+np = lazy_import("numpy")
+fitz = lazy_import("fitz")  # PyMuPDF
+
+SELECTION_PADDING = 10  # margen (píxeles) del recuadro donde se escribe el texto convertido
+
+
+# ========================================================
+# =======================Geometría========================
+# ========================================================
+def clamp_box(coords, image_size, padding):
+    """Expande (x0, y0, x1, y1) en `padding` píxeles sin salirse de la imagen."""
+    x0, y0, x1, y1 = coords
+    img_width, img_height = image_size
+    return (
+        max(0, x0 - padding),
+        max(0, y0 - padding),
+        min(img_width, x1 + padding),
+        min(img_height, y1 + padding)
+    )
+
+
+def selection_rects(selection_coords, image_size, zoom_factor, padding=SELECTION_PADDING):
+    """Rectángulos PDF de una selección en el canvas.
+
+    Devuelve (rect, rect2): `rect` es la selección (se tapa en blanco) y
+    `rect2` la selección con margen (donde se escribe el texto convertido),
+    o None si el recorte queda vacío.
+    """
+    crop_x0, crop_y0, crop_x1, crop_y1 = clamp_box(selection_coords, image_size, padding)
+    if crop_x1 <= crop_x0 or crop_y1 <= crop_y0:
+        return None
+    zoom_inv = 1.0 / zoom_factor
+    rect = fitz.Rect(*(c * zoom_inv for c in selection_coords))
+    rect2 = fitz.Rect(crop_x0 * zoom_inv, crop_y0 * zoom_inv, crop_x1 * zoom_inv, crop_y1 * zoom_inv)
+    return rect, rect2
+
+
+# ========================================================
+# ==========================OCR===========================
+# ========================================================
+def selection_region(backend, page_image, page, selection_coords, zoom_factor):
+    """OCRRegion de la selección: recorte del render (PIL) con el margen del motor."""
+    ocr_coords = clamp_box(selection_coords, page_image.size, backend.crop_padding)
+    with span("crop"):
+        cropped_array = np.array(page_image.crop(ocr_coords)) if backend.needs_image else None
+    return OCRRegion(image=cropped_array, page=page,
+                     clip=fitz.Rect(*(c / zoom_factor for c in ocr_coords)))
+
+
+def read_selection(backend, page_image, page, selection_coords, zoom_factor):
+    """Recorta la selección del render (PIL) con el margen del motor y la reconoce.
+
+    Devuelve el OCRResult del motor.
+    """
+    region = selection_region(backend, page_image, page, selection_coords, zoom_factor)
+    with span("ocr", backend=backend.name):
+        return backend.recognize(region)
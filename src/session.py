@@ -0,0 +1,184 @@
+# Sesión de trabajo guardada junto al PDF
+# Cada documento abierto tiene un fichero compañero <pdf>.inches_to_mm.json con:
+# - el diario de conversiones hechas (región, texto leído, texto escrito, fuente),
+# - los resultados de OCR por región (texto y confianza, por motor),
+# - la última página y el zoom.
+# Al reabrir el PDF se recupera la posición y las conversiones se pueden
+# reaplicar sin volver a pasar el OCR; batch_convert.py reaplica el diario y
+# salta las regiones ya convertidas. El fichero lleva el hash del PDF: si el
+# PDF cambia, la sesión antigua se descarta.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import hashlib
+import json
+import os
+import time
+
+from conversion import insert_converted_text
+from ocr_backends import OCRResult
+from startup import lazy_import
+from text_rewrite import rewrite_dimension_text
+
+fitz = lazy_import("fitz")  # PyMuPDF
+
+SIDECAR_SUFFIX = ".inches_to_mm.json"
+SESSION_VERSION = 1
+MATCH_IOU = 0.8  # solape mínimo (intersección / unión) para considerar que dos regiones son la misma
+
+
+def sidecar_path(pdf_path):
+    return pdf_path + SIDECAR_SUFFIX
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 del contenido del fichero (identifica el documento aunque cambie de nombre)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def rect_iou(a, b):
+    """Intersección sobre unión de dos rectángulos (x0, y0, x1, y1)."""
+    a, b = fitz.Rect(a), fitz.Rect(b)
+    inter = a & b
+    if inter.is_empty:
+        return 0.0
+    inter_area = inter.width * inter.height
+    union = a.width * a.height + b.width * b.height - inter_area
+    return inter_area / union if union > 0 else 0.0
+
+
+# ========================================================
+# ====================Clase principal=====================
+# ========================================================
+class Session:
+    """Estado persistente de la conversión de un PDF."""
+
+    def __init__(self, pdf_path, doc_hash, data=None, path=None):
+        self.pdf_path = pdf_path
+        self.path = path or sidecar_path(pdf_path)
+        self.doc_hash = doc_hash
+        data = data or {}
+        self.last_page = data.get("last_page", 0)
+        self.zoom = data.get("zoom", 1.0)
+        self.ocr = data.get("ocr", {})      # "página" -> [{"rect", "text", "confidence", "backend"}]
+        self.edits = data.get("edits", [])  # diario de conversiones, en orden
+
+    @classmethod
+    def open(cls, pdf_path, path=None):
+        """Carga la sesión del PDF o crea una nueva si no existe o el PDF ha cambiado.
+
+        `path` guarda la sesión en otro sitio en lugar de junto al PDF.
+        """
+        doc_hash = file_hash(pdf_path)
+        path = path or sidecar_path(pdf_path)
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Sesión ilegible, se empieza una nueva ({e})")
+                data = None
+            if data and data.get("version") == SESSION_VERSION and data.get("file_hash") == doc_hash:
+                return cls(pdf_path, doc_hash, data, path)
+            if data:
+                print("El PDF ha cambiado desde la última sesión: se empieza una nueva.")
+        return cls(pdf_path, doc_hash, path=path)
+
+    def save(self):
+        """Escribe la sesión de forma atómica."""
+        data = {
+            "version": SESSION_VERSION,
+            "file_hash": self.doc_hash,
+            "pdf": os.path.basename(self.pdf_path),
+            "last_page": self.last_page,
+            "zoom": self.zoom,
+            "ocr": self.ocr,
+            "edits": self.edits,
+        }
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"No se pudo guardar la sesión en {self.path}: {e}")
+
+    # -------------------- Caché de OCR --------------------
+    def cached_ocr(self, page_no, rect, backend=None):
+        """Resultado de OCR guardado para la misma región (y el mismo motor, si se indica) o None."""
+        for entry in self.ocr.get(str(page_no), []):
+            if backend is not None and entry["backend"] != backend:
+                continue
+            if rect_iou(entry["rect"], rect) >= MATCH_IOU:
+                return OCRResult(entry["text"], entry["confidence"], entry["backend"])
+        return None
+
+    def record_ocr(self, page_no, rect, result):
+        """Guarda (o sustituye) el resultado de OCR de una región."""
+        entries = self.ocr.setdefault(str(page_no), [])
+        entries[:] = [e for e in entries
+                      if not (e["backend"] == result.backend and rect_iou(e["rect"], rect) >= MATCH_IOU)]
+        entries.append({"rect": list(fitz.Rect(rect)), "text": result.text,
+                        "confidence": result.confidence, "backend": result.backend})
+
+    # -------------------- Diario de conversiones --------------------
+    def record_edit(self, page_no, rect, rect2, source_text, converted_text, fontsize, rotation, result=None,
+                    method="overlay"):
+        """Añade una conversión al diario.
+
+        `method` es "overlay" (recuadro y texto encima) o "rewrite" (texto
+        reescrito en el contenido, ver text_rewrite.py).
+        """
+        self.edits.append({
+            "page": page_no,
+            "rect": list(fitz.Rect(rect)),
+            "rect2": list(fitz.Rect(rect2)),
+            "source_text": source_text,
+            "converted_text": converted_text,
+            "fontsize": fontsize,
+            "rotation": rotation,
+            "backend": result.backend if result is not None else None,
+            "confidence": result.confidence if result is not None else None,
+            "flagged": result.flagged if result is not None else False,
+            "method": method,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+
+    def pop_edit(self):
+        """Quita la última conversión del diario (deshacer)."""
+        return self.edits.pop() if self.edits else None
+
+    def edits_for(self, page_no):
+        return [e for e in self.edits if e["page"] == page_no]
+
+    def is_converted(self, page_no, rect):
+        """True si la región ya se convirtió (su centro cae en una conversión del diario)."""
+        center = fitz.Rect(rect).tl + (fitz.Rect(rect).br - fitz.Rect(rect).tl) * 0.5
+        return any(center in fitz.Rect(e["rect2"]) for e in self.edits_for(page_no))
+
+    def apply_edits(self, page, stamps=None):
+        """Reaplica en la página las conversiones del diario, sin OCR. Devuelve cuántas.
+
+        Las hechas reescribiendo el texto se reescriben otra vez (con recuadro
+        si ya no se puede). Con `stamps` (ver stamps.py) las cotas se escriben
+        como sellos reutilizables.
+        """
+        applied, items = 0, []
+        for edit in self.edits_for(page.number):
+            rect, rect2 = fitz.Rect(edit["rect"]), fitz.Rect(edit["rect2"])
+            if edit.get("method") == "rewrite" and rewrite_dimension_text(page, rect) is not None:
+                applied += 1
+                continue
+            items.append((rect, rect2, edit["converted_text"], edit["rotation"]))
+        if stamps is not None:
+            font_sizes = stamps.place(page, items)
+        else:
+            font_sizes = [insert_converted_text(page, *item) for item in items]
+        return applied + sum(size is not None for size in font_sizes)
@@ -0,0 +1,88 @@
+# OCR especulativo durante el arrastre de la selección
+# Mientras el usuario arrastra el rectángulo la CPU está parada y, al soltar,
+# se paga el OCR entero. Si el rectángulo se queda quieto un momento
+# (SPECULATIVE_DELAY_MS) se lanza el OCR de ese rectángulo en segundo plano;
+# si se mueve, el trabajo pendiente se cancela y el que esté en marcha se
+# ignora. Al soltar, si la selección final coincide con la especulada, se usa
+# su resultado (ya terminado o a medias) en lugar de empezar de cero.
+#
+# El recorte se hace en el hilo de Tk (puede renderizar desde el PDF) y solo
+# el reconocimiento va al hilo propio del motor, de modo que un mismo modelo
+# nunca se usa desde dos hilos a la vez. Los motores que leen la página PDF
+# (capa de texto, cascada) no se especulan: PyMuPDF no es seguro entre hilos.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import concurrent.futures
+
+from profiling import span
+from selection import selection_region
+
+SPECULATIVE_DELAY_MS = 100  # tiempo que el rectángulo debe estar quieto para lanzar el OCR
+
+
+# ========================================================
+# ====================Clase principal=====================
+# ========================================================
+class SpeculativeOCR:
+    """Un único trabajo de OCR especulativo, identificado por la clave de su selección.
+
+    La clave incluye todo lo que cambia el resultado: página, coordenadas,
+    zoom, motor y preprocesado. Un trabajo nuevo sustituye al anterior.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.future = None
+        self._last_future = None  # último trabajo enviado, aunque se haya descartado
+
+    @staticmethod
+    def can_speculate(backend):
+        return backend is not None and not backend.uses_page
+
+    def start(self, key, backend, page_image, page, selection_coords, zoom_factor):
+        """Lanza el OCR de la selección en el hilo del motor (si no es ya el trabajo en curso)."""
+        if key == self.key and self.future is not None:
+            return
+        self.cancel()
+        region = selection_region(backend, page_image, page, selection_coords, zoom_factor)
+        region.page = None  # el hilo del motor no debe tocar la página
+        self.key = key
+        self.future = backend._get_executor().submit(self._recognize, backend, region)
+        self._last_future = self.future
+
+    @staticmethod
+    def _recognize(backend, region):
+        with span("ocr", backend=backend.name, speculative=True):
+            return backend.recognize(region)
+
+    def cancel(self):
+        """Cancela el trabajo si aún no ha empezado; si ya corre, su resultado se ignorará."""
+        if self.future is not None:
+            self.future.cancel()
+        self.key = self.future = None
+
+    def take(self, key):
+        """Resultado del trabajo si su selección es `key` (esperando a que termine), o None.
+
+        Si no coincide, se descarta y se espera a que el motor quede libre para
+        que el OCR definitivo no lo use a la vez desde el hilo de Tk.
+        """
+        future = self.future if key == self.key else None
+        last_future, self._last_future = self._last_future, None
+        if future is None:
+            self.cancel()
+            if last_future is not None:
+                concurrent.futures.wait([last_future])
+            return None
+        self.key = self.future = None
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            return None
+        except Exception as e:
+            print(f"OCR especulativo fallido: {e}")
+            return None
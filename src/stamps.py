@@ -0,0 +1,160 @@
+# Sellos reutilizables para las cotas convertidas (modo por lotes, opcional)
+# En los planos repetitivos el mismo valor (p. ej. '12.7000') aparece cientos
+# de veces y cada insert_textbox escribe de nuevo su texto en el contenido de
+# la página. Con --stamps, cuando una combinación de texto, tamaño de fuente y
+# rotación ya ha aparecido STAMP_MIN_USES veces, su texto se guarda en un Form
+# XObject del documento y a partir de ahí cada aparición es solo una
+# referencia colocada con una traslación:
+#
+#     q 1 0 0 1 x y cm /MM12 Do Q
+#
+# El ajuste (tamaño de fuente, líneas) es exactamente el de
+# insert_converted_texts: se hace con un Shape de prueba y solo se sella el
+# texto que queda en una línea. Los recuadros blancos, que cambian en cada
+# cota, y las primeras apariciones se escriben como siempre. Los sellos (sus
+# xref) se conservan entre guardados incrementales, así que en el modo
+# streaming también se crean una vez por documento. Las páginas rotadas o sin
+# /Resources propios se escriben enteras con insert_converted_texts.
+#
+# Solo compensa en juegos muy repetitivos: con valores casi todos distintos no
+# ahorra nada y por eso está desactivado por defecto.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+from conversion import fit_textbox, insert_converted_texts
+from profiling import span
+from startup import lazy_import
+from text_rewrite import GraphicsState, text_shows
+
+fitz = lazy_import("fitz")  # PyMuPDF
+
+STAMP_PREFIX = "MM"
+STAMP_MIN_USES = 8  # apariciones sin sello antes de crearlo: un sello cuesta más que unas pocas cadenas
+
+
+def single_line_origin(text_cont):
+    """Origen (espacio de usuario del PDF) del texto de un Shape si es una sola cadena, o None."""
+    shows = list(text_shows(text_cont.encode("latin-1"), GraphicsState()))
+    return shows[0][3] if len(shows) == 1 else None
+
+
+# ========================================================
+# ====================Clase principal=====================
+# ========================================================
+class StampCache:
+    """Form XObjects de las cotas convertidas de un documento, por (texto, tamaño de fuente, rotación)."""
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.stamps = {}   # clave -> xref del sello
+        self.seen = {}     # clave -> veces que se ha escrito sin sello
+        self.font_xref = None
+
+    def bind(self, doc):
+        """Documento reabierto (modo streaming): los xref de los sellos siguen siendo válidos."""
+        self.doc = doc
+
+    def close(self):
+        self.stamps, self.seen = {}, {}
+
+    def can_stamp(self, page):
+        if page.rotation != 0:
+            return False
+        if not all(self.doc.xref_is_stream(xref) for xref in page.get_contents()):
+            return False  # /Contents dañado: mejor no tocarlo
+        return self.doc.xref_get_key(page.xref, "Resources")[0] != "null"
+
+    def place(self, page, items):
+        """Como conversion.insert_converted_texts, pero colocando sellos. Devuelve los tamaños de fuente."""
+        if not items:
+            return []
+        if not self.can_stamp(page):
+            return insert_converted_texts(page, items)
+
+        stamped, direct, font_sizes = [], [], []
+        with span("textbox_fit", regions=len(items), stamps=True):
+            for rect, rect2, converted_text, rotate_angle in items:
+                if rotate_angle is None:
+                    rotate_angle = 90 if rect2.height > rect2.width else 0
+                probe = page.new_shape()  # solo para ajustar y leer el texto generado, no se confirma
+                font_size = fit_textbox(probe, rect2, converted_text, rotate_angle)
+                font_sizes.append(font_size)
+                if font_size is None:
+                    continue
+                key = (converted_text, font_size, rotate_angle)
+                origin = single_line_origin(probe.text_cont)
+                if origin is not None and key not in self.stamps:
+                    if self.seen.get(key, 0) >= STAMP_MIN_USES:
+                        self.stamps[key] = self._make_stamp(page, probe.text_cont, origin, converted_text,
+                                                            font_size)
+                    else:
+                        self.seen[key] = self.seen.get(key, 0) + 1
+                if origin is not None and key in self.stamps:
+                    stamped.append((self.stamps[key], origin))
+                else:
+                    direct.append((rect2, converted_text, rotate_angle))
+
+        with span("page_write", regions=len(items), stamps=len(stamped)):
+            # Recuadros blancos de todas las cotas y textos sin sello, como insert_converted_texts
+            shape = page.new_shape()
+            for rect, _rect2, _text, _rotate in items:
+                shape.draw_rect(rect)
+            shape.finish(color=(1, 1, 1), fill=(1, 1, 1))
+            for rect2, converted_text, rotate_angle in direct:
+                fit_textbox(shape, rect2, converted_text, rotate_angle)
+            shape.commit(overlay=True)
+
+            if stamped:
+                ops = []
+                for xref in {xref for xref, _origin in stamped}:
+                    self._set_resource(page, "XObject", f"{STAMP_PREFIX}{xref}", f"{xref} 0 R")
+                for xref, origin in stamped:
+                    ops.append(f"q 1 0 0 1 {origin.x:.3f} {origin.y:.3f} cm /{STAMP_PREFIX}{xref} Do Q")
+                self._append_contents(page, ("\n".join(ops) + "\n").encode())
+        return font_sizes
+
+    def _make_stamp(self, page, text_cont, origin, converted_text, font_size):
+        """Form XObject con el texto del Shape trasladado para que su origen quede en (0, 0)."""
+        if self.font_xref is None:
+            self.font_xref = page.insert_font(fontname="helv")
+        # Caja holgada: la línea de texto, en cualquier dirección desde el origen
+        size = fitz.get_text_length(converted_text, fontname="helv", fontsize=font_size) + font_size
+        xref = self.doc.get_new_xref()
+        self.doc.update_object(xref, f"<</Type/XObject/Subtype/Form/BBox[{-size:.3f} {-size:.3f} {size:.3f} "
+                                     f"{size:.3f}]/Resources<</Font<</helv {self.font_xref} 0 R>>>>>>")
+        contents = f"1 0 0 1 {-origin.x:.3f} {-origin.y:.3f} cm" + text_cont
+        self.doc.update_stream(xref, contents.encode("latin-1"), new=True)
+        return xref
+
+    def _set_resource(self, page, kind, name, value):
+        """Añade /kind/name a los recursos de la página (xref_set_key no atraviesa referencias)."""
+        target, path = page.xref, "Resources"
+        ref_kind, ref = self.doc.xref_get_key(target, path)
+        if ref_kind == "xref":
+            target, path = int(ref.split()[0]), ""
+        path = f"{path}/{kind}" if path else kind
+        ref_kind, ref = self.doc.xref_get_key(target, path)
+        if ref_kind == "xref":
+            target, path = int(ref.split()[0]), ""
+        self.doc.xref_set_key(target, f"{path}/{name}" if path else name, value)
+
+    def _append_contents(self, page, data):
+        """Añade un stream al final del contenido de la página.
+
+        /Contents puede ser un stream, un array o una referencia a un array:
+        get_contents resuelve los tres casos y da los xref de los streams.
+        """
+        contents = page.get_contents()
+        previous = self.doc.xref_get_key(page.xref, "Contents")
+        xref = self.doc.get_new_xref()
+        self.doc.update_object(xref, "<<>>")
+        self.doc.update_stream(xref, data, new=True)
+        refs = " ".join(f"{ref} 0 R" for ref in contents + [xref])
+        self.doc.xref_set_key(page.xref, "Contents", f"[{refs}]")
+        # Comprobación: el contenido original sigue entero delante del sello (si no, se perdería el plano)
+        if page.get_contents() != contents + [xref]:
+            self.doc.xref_set_key(page.xref, "Contents", previous[1])
+            raise ValueError(f"No se pudo ampliar /Contents de la página {page.number + 1}")
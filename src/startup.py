@@ -0,0 +1,134 @@
+# Arranque rápido
+# La aplicación solo necesita Tk para mostrar la ventana; PyMuPDF, NumPy y PIL
+# (y el motor OCR, con PaddleOCR y todas sus dependencias) se cargan la
+# primera vez que se usan:
+#
+#     fitz = lazy_import("fitz")  # el módulo se importa al primer fitz.algo
+#
+# Con --startup-profile se mide cuánto tarda cada importación hasta que la
+# ventana responde y se imprime el desglose por módulo:
+#
+#     python inches_to_mm.py --startup-profile
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import builtins
+import importlib
+import sys
+import time
+import types
+
+PROCESS_START = time.perf_counter()  # este módulo se importa lo primero
+STARTUP_PROFILE_FLAG = "--startup-profile"
+REPORT_TOP = 25  # módulos que se listan en el informe
+
+
+# ========================================================
+# ================Importaciones diferidas=================
+# ========================================================
+class LazyModule(types.ModuleType):
+    """Módulo que se importa de verdad al primer acceso a uno de sus atributos."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_name"] = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__dict__["_lazy_name"])
+        # Copiar sus atributos: los accesos siguientes ya no pasan por aquí
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    """El módulo si ya está cargado o un LazyModule que lo cargará al usarlo."""
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+# ========================================================
+# ==================Perfil de arranque====================
+# ========================================================
+class ImportTimer:
+    """Mide el tiempo de cada importación nueva (propio y con sus dependencias)."""
+
+    def __init__(self):
+        self.times = {}   # módulo -> (tiempo propio, tiempo acumulado) en segundos
+        self._stack = []  # tiempo de los hijos de cada importación en curso
+        self._original_import = None
+
+    @property
+    def enabled(self):
+        return self._original_import is not None
+
+    def start(self):
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def stop(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Módulos nuevos: el propio o, en "from paquete import sub", los submódulos
+        if level != 0:
+            return self._original_import(name, globals, locals, fromlist, level)
+        if name not in sys.modules:
+            candidates = [name]
+        else:
+            candidates = [f"{name}.{item}" for item in fromlist or () if f"{name}.{item}" not in sys.modules]
+        if not candidates:
+            return self._original_import(name, globals, locals, fromlist, level)
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._stack.pop()
+            loaded = [module for module in candidates if module in sys.modules]
+            if loaded:
+                self.times[", ".join(loaded)] = (elapsed - children, elapsed)
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    def report(self, top=REPORT_TOP):
+        """Tabla de los módulos más lentos (por tiempo acumulado)."""
+        total = sum(own for own, _cumulative in self.times.values())
+        lines = [f"Importaciones: {len(self.times)} módulos, {total * 1000:.0f} ms",
+                 f"{'acumulado (ms)':>15} {'propio (ms)':>12}  módulo"]
+        ranked = sorted(self.times.items(), key=lambda kv: kv[1][1], reverse=True)
+        for name, (own, cumulative) in ranked[:top]:
+            lines.append(f"{cumulative * 1000:15.1f} {own * 1000:12.1f}  {name}")
+        return "\n".join(lines)
+
+
+import_timer = ImportTimer()
+
+
+def begin_startup_profile(argv=None):
+    """Empieza a medir las importaciones si se pasó --startup-profile (y quita la opción de argv)."""
+    argv = sys.argv if argv is None else argv
+    if STARTUP_PROFILE_FLAG in argv:
+        argv.remove(STARTUP_PROFILE_FLAG)
+        import_timer.start()
+    return import_timer.enabled
+
+
+def report_when_interactive(root):
+    """Imprime el desglose cuando la ventana ya se ha dibujado y atiende eventos."""
+    if not import_timer.enabled:
+        return
+
+    def report():
+        import_timer.stop()
+        print(f"Ventana interactiva en {time.perf_counter() - PROCESS_START:.2f} s")
+        print(import_timer.report())
+
+    root.after_idle(lambda: root.after(0, report))
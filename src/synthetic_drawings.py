@@ -0,0 +1,207 @@
+# Generador de planos sintéticos para benchmarks
+# Crea PDFs con PyMuPDF que imitan un plano: marco, cajetín, geometría y cotas
+# en pulgadas (línea de cota con flechas, líneas de extensión y etiqueta), a
+# distintos tamaños de página, densidades y rotaciones, como texto vectorial o
+# como escaneo rasterizado. Devuelve la verdad de campo de cada cota (texto y
+# posición) para medir velocidad y precisión. No necesita red ni fuentes externas.
+#
+# Uso:
+#     python synthetic_drawings.py salida.pdf --size A1 --dimensions 200 --mode raster
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import argparse
+import json
+import random
+import numpy as np
+import fitz  # PyMuPDF
+
+# Tamaños ISO en puntos (apaisados, como suelen ir los planos)
+PAGE_SIZES = {
+    "A4": (842, 595),
+    "A3": (1191, 842),
+    "A2": (1684, 1191),
+    "A1": (2384, 1684),
+    "A0": (3370, 2384),
+}
+
+LABEL_FONTSIZE = 10
+ARROW_LENGTH = 6
+ARROW_HALF_WIDTH = 2
+
+
+# ========================================================
+# =========================Cotas==========================
+# ========================================================
+def random_inch_label(rng):
+    """Etiqueta de cota en pulgadas con los formatos habituales ('1.250', '.75', '12.5')."""
+    value = rng.choice([rng.uniform(0.05, 1.0), rng.uniform(1.0, 40.0)])
+    decimals = rng.choice([1, 2, 3, 3, 4])
+    text = f"{value:.{decimals}f}"
+    if text.startswith("0.") and rng.random() < 0.5:
+        text = text[1:]
+    return text
+
+
+def draw_arrowhead(shape, tip, direction):
+    """Flecha rellena (triángulo) con la punta en `tip` apuntando en `direction`."""
+    dx, dy = direction
+    base = fitz.Point(tip.x - dx * ARROW_LENGTH, tip.y - dy * ARROW_LENGTH)
+    normal = fitz.Point(-dy * ARROW_HALF_WIDTH, dx * ARROW_HALF_WIDTH)
+    shape.draw_polyline([tip, base + normal, base - normal, tip])
+
+
+def draw_dimension(page, shape, p0, p1, label, rotation):
+    """Dibuja una cota entre p0 y p1 (horizontal si rotation == 0, vertical si 90).
+
+    Devuelve el rectángulo de la etiqueta en coordenadas PDF.
+    """
+    ext = 12  # longitud de las líneas de extensión
+    if rotation == 0:
+        shape.draw_line(fitz.Point(p0.x, p0.y - ext), fitz.Point(p0.x, p0.y + 3))
+        shape.draw_line(fitz.Point(p1.x, p1.y - ext), fitz.Point(p1.x, p1.y + 3))
+        shape.draw_line(p0, p1)
+        draw_arrowhead(shape, p0, (-1, 0))
+        draw_arrowhead(shape, p1, (1, 0))
+        width = fitz.get_text_length(label, fontname="helv", fontsize=LABEL_FONTSIZE)
+        mid = fitz.Point((p0.x + p1.x) / 2, p0.y)
+        origin = fitz.Point(mid.x - width / 2, mid.y - 3)
+        page.insert_text(origin, label, fontname="helv", fontsize=LABEL_FONTSIZE)
+        return fitz.Rect(origin.x, origin.y - LABEL_FONTSIZE * 0.8, origin.x + width, origin.y + LABEL_FONTSIZE * 0.25)
+
+    shape.draw_line(fitz.Point(p0.x - ext, p0.y), fitz.Point(p0.x + 3, p0.y))
+    shape.draw_line(fitz.Point(p1.x - ext, p1.y), fitz.Point(p1.x + 3, p1.y))
+    shape.draw_line(p0, p1)
+    draw_arrowhead(shape, p0, (0, -1))
+    draw_arrowhead(shape, p1, (0, 1))
+    width = fitz.get_text_length(label, fontname="helv", fontsize=LABEL_FONTSIZE)
+    mid = fitz.Point(p0.x, (p0.y + p1.y) / 2)
+    # Texto girado 90° (se lee de abajo arriba), a la izquierda de la línea de cota
+    origin = fitz.Point(mid.x - 3, mid.y + width / 2)
+    page.insert_text(origin, label, fontname="helv", fontsize=LABEL_FONTSIZE, rotate=90)
+    return fitz.Rect(origin.x - LABEL_FONTSIZE * 0.8, origin.y - width, origin.x + LABEL_FONTSIZE * 0.25, origin.y)
+
+
+def _overlaps(rect, placed, margin=6):
+    grown = fitz.Rect(rect.x0 - margin, rect.y0 - margin, rect.x1 + margin, rect.y1 + margin)
+    return any(grown.intersects(r) for r in placed)
+
+
+def draw_background(page, shape, rng, n_shapes):
+    """Marco, cajetín y geometría de relleno (rectángulos, círculos y rayado)."""
+    r = page.rect
+    shape.draw_rect(fitz.Rect(20, 20, r.width - 20, r.height - 20))
+    title = fitz.Rect(r.width - 260, r.height - 90, r.width - 20, r.height - 20)
+    shape.draw_rect(title)
+    page.insert_text(fitz.Point(title.x0 + 8, title.y0 + 20), "SYNTHETIC DRAWING - UNITS: INCHES",
+                     fontname="helv", fontsize=9)
+    for _ in range(n_shapes):
+        x, y = rng.uniform(60, r.width - 160), rng.uniform(60, r.height - 160)
+        w, h = rng.uniform(20, 120), rng.uniform(20, 120)
+        if rng.random() < 0.5:
+            shape.draw_rect(fitz.Rect(x, y, x + w, y + h))
+        else:
+            shape.draw_circle(fitz.Point(x + w / 2, y + h / 2), min(w, h) / 2)
+        if rng.random() < 0.2:
+            # Rayado de sección en gris
+            for k in range(0, int(w), 6):
+                shape.draw_line(fitz.Point(x + k, y + h), fitz.Point(x + min(w, k + h), y + max(0, h - (w - k))))
+    shape.finish(color=(0.2, 0.2, 0.2), width=0.5)
+
+
+# ========================================================
+# ==================Generación de planos==================
+# ========================================================
+def build_vector_document(page_size="A3", n_dimensions=50, rotations=(0, 90), n_pages=1, seed=0):
+    """Crea el plano vectorial en memoria y devuelve (documento, verdad de campo)."""
+    rng = random.Random(seed)
+    width, height = PAGE_SIZES[page_size]
+    doc = fitz.open()
+    truth = []
+    for page_no in range(n_pages):
+        page = doc.new_page(width=width, height=height)
+        shape = page.new_shape()
+        draw_background(page, shape, rng, n_shapes=max(5, n_dimensions // 4))
+
+        dim_shape = page.new_shape()
+        placed = []
+        attempts = 0
+        while len(placed) < n_dimensions and attempts < n_dimensions * 20:
+            attempts += 1
+            rotation = rng.choice(rotations)
+            length = rng.uniform(50, 200)
+            x, y = rng.uniform(60, width - 260), rng.uniform(60, height - 260)
+            p0 = fitz.Point(x, y)
+            p1 = fitz.Point(x + length, y) if rotation == 0 else fitz.Point(x, y + length)
+            bbox = fitz.Rect(p0, p1) + (-16, -16, 16, 16)
+            if _overlaps(bbox, placed):
+                continue
+            label = random_inch_label(rng)
+            label_rect = draw_dimension(page, dim_shape, p0, p1, label, rotation)
+            placed.append(bbox)
+            truth.append({"page": page_no, "text": label, "rect": list(label_rect),
+                          "rotation": rotation})
+        dim_shape.finish(color=(0, 0, 0), fill=(0, 0, 0), width=0.6)
+        dim_shape.commit()
+        shape.commit(overlay=False)
+    return doc, truth
+
+
+def rasterize_document(doc, dpi=150, noise=8.0, seed=0):
+    """Convierte cada página en una imagen en gris con ruido, como un escaneo."""
+    rng = np.random.default_rng(seed)
+    scanned = fitz.open()
+    for page in doc:
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+        img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+        if noise:
+            # Papel ligeramente gris y ruido gaussiano, todo vectorizado
+            noisy = img.astype(np.float32) * 0.92 + 10 + rng.normal(0, noise, img.shape)
+            img = np.clip(noisy, 0, 255).astype(np.uint8)
+        out = fitz.Pixmap(fitz.csGRAY, pix.width, pix.height, img.tobytes(), False)
+        new_page = scanned.new_page(width=page.rect.width, height=page.rect.height)
+        new_page.insert_image(new_page.rect, pixmap=out)
+    return scanned
+
+
+def generate_drawing(path, page_size="A3", n_dimensions=50, rotations=(0, 90), mode="vector",
+                     n_pages=1, dpi=150, seed=0):
+    """Genera un plano sintético en `path` y devuelve la lista de cotas (verdad de campo).
+
+    Cada cota: {"page", "text", "rect" (x0, y0, x1, y1 en puntos PDF), "rotation"}.
+    """
+    doc, truth = build_vector_document(page_size, n_dimensions, rotations, n_pages, seed)
+    if mode == "raster":
+        scanned = rasterize_document(doc, dpi=dpi, seed=seed)
+        doc.close()
+        doc = scanned
+    elif mode != "vector":
+        raise ValueError(f"Modo desconocido: '{mode}' (use 'vector' o 'raster')")
+    doc.save(path, garbage=4, deflate=True)
+    doc.close()
+    return truth
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un plano sintético con cotas en pulgadas.")
+    parser.add_argument("output", help="PDF de salida")
+    parser.add_argument("--size", choices=list(PAGE_SIZES), default="A3")
+    parser.add_argument("--dimensions", type=int, default=50, help="Cotas por página")
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--rotations", default="0,90", help="Rotaciones de las etiquetas (0 y/o 90)")
+    parser.add_argument("--mode", choices=("vector", "raster"), default="vector")
+    parser.add_argument("--dpi", type=int, default=150, help="Resolución del escaneo simulado")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--truth", help="Fichero JSON donde guardar la verdad de campo")
+    args = parser.parse_args()
+
+    rotations = tuple(int(r) for r in args.rotations.split(","))
+    truth = generate_drawing(args.output, args.size, args.dimensions, rotations, args.mode,
+                             args.pages, args.dpi, args.seed)
+    if args.truth:
+        with open(args.truth, "w", encoding="utf-8") as f:
+            json.dump(truth, f, indent=2)
+    print(f"{len(truth)} cotas generadas en {args.output}")
@@ -0,0 +1,451 @@
+# Reescritura de las cotas de la capa de texto en el contenido de la página
+# Cuando la cota en pulgadas es texto real del PDF, tapar con un recuadro
+# blanco y escribir encima hace crecer el documento con cada edición y la
+# búsqueda sigue encontrando el valor antiguo. Aquí se localizan los
+# operadores de texto (Tj, TJ, ', ") cuyo origen cae en la selección y se
+# sustituye su cadena por el valor en milímetros, con la misma fuente,
+# posición y rotación (se conserva la matriz de texto). No se renderiza nada.
+#
+# Solo se reescribe si se entiende todo el texto de la selección y la fuente
+# tiene todos los glifos del valor nuevo (las fuentes incrustadas como
+# subconjunto suelen traer solo los caracteres usados). Si no, rewrite_dimension_text
+# devuelve None y se usa la sustitución de siempre (recuadro + texto encima).
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import re
+
+from conversion import convert_inches_to_mm, is_dimension_text
+from profiling import span
+from startup import lazy_import
+
+fitz = lazy_import("fitz")  # PyMuPDF
+
+ORIGIN_TOLERANCE = 1.0  # puntos: margen alrededor de la selección para el origen del texto
+SHOW_OPERATORS = ("Tj", "TJ", "'", '"')
+
+# Nombres de glifo (Differences) de los caracteres que aparecen en una cota
+_GLYPH_NAMES = {"zero": "0", "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6",
+                "seven": "7", "eight": "8", "nine": "9", "period": ".", "space": " ", "quotedbl": '"',
+                "comma": ",", "hyphen": "-", "minus": "-"}
+_UNKNOWN = "�"
+
+_WHITESPACE = b"\x00\t\n\x0c\r "
+_DELIMITERS = b"()<>[]{}/%"
+_NUMBER_RE = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)$")
+_INLINE_IMAGE_END_RE = re.compile(rb"[\x00\t\n\x0c\r ]EI(?=[\x00\t\n\x0c\r /\[<(]|$)")
+_ESCAPES = {ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b", ord("f"): b"\f",
+            ord("("): b"(", ord(")"): b")", ord("\\"): b"\\"}
+
+
+class TextRewrite:
+    """Resultado de una reescritura: textos y contenido original de los streams (para deshacer)."""
+
+    def __init__(self, source_text, converted_text, originals, rect):
+        self.source_text = source_text
+        self.converted_text = converted_text
+        self.originals = originals  # xref -> bytes del stream antes de reescribirlo
+        self.rect = rect            # zona afectada (texto antiguo y nuevo)
+
+    def restore(self, doc):
+        for xref, data in self.originals.items():
+            doc.update_stream(xref, data)
+
+
+# ========================================================
+# ==================Lectura del contenido=================
+# ========================================================
+def _literal_string(data, pos):
+    """Cadena (...) que empieza en data[pos]: (bytes, posición tras el paréntesis de cierre)."""
+    out, depth, i, n = bytearray(), 1, pos + 1, len(data)
+    while i < n:
+        c = data[i]
+        if c == 0x5C:  # barra invertida
+            i += 1
+            if i >= n:
+                break
+            c = data[i]
+            if c in _ESCAPES:
+                out += _ESCAPES[c]
+            elif 0x30 <= c <= 0x37:
+                digits = data[i:i + 3]
+                k = 1
+                while k < len(digits) and 0x30 <= digits[k] <= 0x37:
+                    k += 1
+                out.append(int(digits[:k], 8) & 0xFF)
+                i += k - 1
+            elif c == 0x0D:  # fin de línea escapado: continuación
+                if i + 1 < n and data[i + 1] == 0x0A:
+                    i += 1
+            elif c != 0x0A:
+                out.append(c)
+        elif c == 0x28:
+            depth += 1
+            out.append(c)
+        elif c == 0x29:
+            depth -= 1
+            if depth == 0:
+                return bytes(out), i + 1
+            out.append(c)
+        else:
+            out.append(c)
+        i += 1
+    raise ValueError("cadena sin cerrar en el contenido de la página")
+
+
+def tokenize(data):
+    """Tokens del contenido: (tipo, valor, inicio, fin), tipo en num/name/str/op/[/]/<</>>."""
+    i, n = 0, len(data)
+    while i < n:
+        c = data[i]
+        if c in _WHITESPACE:
+            i += 1
+        elif c == 0x25:  # comentario
+            while i < n and data[i] not in b"\r\n":
+                i += 1
+        elif c == 0x28:
+            value, end = _literal_string(data, i)
+            yield "str", value, i, end
+            i = end
+        elif data.startswith(b"<<", i):
+            yield "<<", None, i, i + 2
+            i += 2
+        elif data.startswith(b">>", i):
+            yield ">>", None, i, i + 2
+            i += 2
+        elif c == 0x3C:
+            end = data.index(b">", i)
+            digits = bytes(b for b in data[i + 1:end] if b not in _WHITESPACE)
+            if len(digits) % 2:
+                digits += b"0"
+            yield "str", bytes.fromhex(digits.decode("ascii")), i, end + 1
+            i = end + 1
+        elif c in b"[]{}":
+            yield chr(c), None, i, i + 1
+            i += 1
+        else:
+            start = i
+            i += 1
+            while i < n and data[i] not in _WHITESPACE and data[i] not in _DELIMITERS:
+                i += 1
+            token = data[start:i]
+            if c == 0x2F:
+                yield "name", token[1:].decode("latin-1"), start, i
+            elif _NUMBER_RE.match(token):
+                yield "num", float(token), start, i
+            else:
+                yield "op", token.decode("latin-1"), start, i
+                if token == b"ID":  # imagen en línea: datos binarios hasta EI
+                    match = _INLINE_IMAGE_END_RE.search(data, i + 1)
+                    i = match.end() if match else n
+
+
+def text_shows(data, state):
+    """Operadores de texto del stream: (operador, operando de la cadena o array, fuente, origen o None).
+
+    `state` es el estado gráfico, que continúa de un stream de la página al
+    siguiente. El origen (espacio de usuario del PDF) es None cuando no se
+    conoce, p. ej. en una segunda cadena sin reposicionar tras la primera.
+    """
+    operands, stack = [], []
+    for kind, value, start, end in tokenize(data):
+        if kind in ("[", "<<"):
+            stack.append((operands, start))
+            operands = []
+        elif kind in ("]", ">>"):
+            items = operands
+            operands, begin = stack.pop() if stack else ([], start)
+            operands.append(("array" if kind == "]" else "dict", items, begin, end))
+        elif kind != "op" or stack:
+            operands.append((kind, value, start, end))
+        else:
+            show = state.apply(value, operands)
+            if show is not None:
+                yield show
+            operands = []
+
+
+class GraphicsState:
+    """Lo justo del estado gráfico y de texto para saber dónde empieza cada cadena."""
+
+    def __init__(self):
+        self.ctm = fitz.Matrix(1, 0, 0, 1, 0, 0)
+        self.saved = []
+        self.font = None
+        self.leading = 0.0
+        self.rise = 0.0
+        self.tm = self.tlm = fitz.Matrix(1, 0, 0, 1, 0, 0)
+        self.known = False
+
+    def _move(self, tx, ty):
+        self.tlm = fitz.Matrix(1, 0, 0, 1, tx, ty) * self.tlm
+        self.tm, self.known = self.tlm, True
+
+    def apply(self, op, operands):
+        nums = [v for kind, v, _s, _e in operands if kind == "num"]
+        if op == "q":
+            self.saved.append((self.ctm, self.font, self.leading, self.rise))
+        elif op == "Q":
+            if self.saved:
+                self.ctm, self.font, self.leading, self.rise = self.saved.pop()
+        elif op == "cm" and len(nums) == 6:
+            self.ctm = fitz.Matrix(*nums) * self.ctm
+        elif op == "BT":
+            self.tm = self.tlm = fitz.Matrix(1, 0, 0, 1, 0, 0)
+            self.known = True
+        elif op == "Tf" and operands and operands[0][0] == "name":
+            self.font = operands[0][1]
+        elif op == "TL" and nums:
+            self.leading = nums[0]
+        elif op == "Ts" and nums:
+            self.rise = nums[0]
+        elif op == "Td" and len(nums) == 2:
+            self._move(*nums)
+        elif op == "TD" and len(nums) == 2:
+            self.leading = -nums[1]
+            self._move(*nums)
+        elif op == "Tm" and len(nums) == 6:
+            self.tm = self.tlm = fitz.Matrix(*nums)
+            self.known = True
+        elif op == "T*":
+            self._move(0, -self.leading)
+        elif op in SHOW_OPERATORS and operands:
+            if op in ("'", '"'):
+                self._move(0, -self.leading)
+            origin = fitz.Point(0, self.rise) * self.tm * self.ctm if self.known else None
+            self.known = False  # tras la cadena la posición depende del ancho de los glifos
+            return op, operands[-1], self.font, origin
+        return None
+
+
+# ========================================================
+# ========================Fuentes=========================
+# ========================================================
+def _resolve(doc, kind, value):
+    """Objeto referenciado por una entrada de xref_get_key: (tipo, texto, xref o 0)."""
+    if kind == "xref":
+        xref = int(value.split()[0])
+        return ("stream" if doc.xref_is_stream(xref) else "object"), doc.xref_object(xref), xref
+    return kind, value, 0
+
+
+def _numbers(text):
+    return [float(v) for v in re.findall(r"[+-]?(?:\d+\.?\d*|\.\d+)", text)]
+
+
+def _font_program(doc, xref):
+    """fitz.Font de la fuente incrustada (None si no está incrustada: el visor pone la completa)."""
+    try:
+        content = doc.extract_font(xref)[3]
+        return fitz.Font(fontbuffer=content) if content else None
+    except Exception:
+        return None
+
+
+def parse_to_unicode(cmap):
+    """Códigos -> texto de un CMap ToUnicode. Devuelve (mapa, bytes por código)."""
+    mapping, width = {}, 1
+    text = cmap.decode("latin-1")
+    # UTF-16BE; algunos generadores escriben el punto de código con un número impar de cifras
+    utf16 = lambda h: bytes.fromhex(h).decode("utf-16-be", "replace") if len(h) % 2 == 0 else chr(int(h, 16))
+    for block in re.findall(r"beginbfchar(.*?)endbfchar", text, re.S):
+        for src, dst in re.findall(r"<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]*)>", block):
+            mapping[int(src, 16)] = utf16(dst)
+            width = max(width, len(src) // 2)
+    for block in re.findall(r"beginbfrange(.*?)endbfrange", text, re.S):
+        for lo, hi, dst in re.findall(r"<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>\s*(<[0-9A-Fa-f]*>|\[[^\]]*\])", block):
+            width = max(width, len(lo) // 2)
+            lo, hi = int(lo, 16), int(hi, 16)
+            if dst.startswith("["):
+                for code, item in zip(range(lo, hi + 1), re.findall(r"<([0-9A-Fa-f]*)>", dst)):
+                    mapping[code] = utf16(item)
+            else:
+                first = utf16(dst[1:-1])
+                if not first:
+                    continue
+                for offset in range(hi - lo + 1):
+                    # Se incrementa el último carácter del destino
+                    mapping[lo + offset] = first[:-1] + chr(ord(first[-1]) + offset)
+    return mapping, width
+
+
+class FontCodec:
+    """Pasa cadenas de un operador de texto a texto y al revés con la codificación de la fuente.
+
+    `encode` devuelve None si a la fuente le falta algún glifo del texto: el
+    código no tiene ancho o el programa de fuente incrustado (un subconjunto)
+    no tiene el carácter. El ToUnicode no basta, hay generadores que lo dejan
+    completo al recortar la fuente.
+    """
+
+    def __init__(self, decode_map, code_width, available=None, program=None):
+        self.decode_map = decode_map  # código -> carácter
+        self.code_width = code_width  # bytes por código
+        self.program = program        # fitz.Font del programa incrustado, o None si no lo hay
+        self.encode_map = {}
+        for code in sorted(decode_map):
+            if available is None or code in available:
+                self.encode_map.setdefault(decode_map[code], code)
+
+    def decode(self, data):
+        w = self.code_width
+        return "".join(self.decode_map.get(int.from_bytes(data[i:i + w], "big"), _UNKNOWN)
+                       for i in range(0, len(data) - w + 1, w))
+
+    def encode(self, text):
+        codes = [self.encode_map.get(ch) for ch in text]
+        if any(code is None for code in codes):
+            return None
+        if self.program is not None and any(ch != " " and not self.program.has_glyph(ord(ch)) for ch in text):
+            return None
+        return b"".join(code.to_bytes(self.code_width, "big") for code in codes)
+
+    @classmethod
+    def for_font(cls, doc, xref, subtype):
+        """Codificador de la fuente del xref, o None si no se sabe reescribir con ella."""
+        tounicode = _resolve(doc, *doc.xref_get_key(xref, "ToUnicode"))
+        cmap = parse_to_unicode(doc.xref_stream(tounicode[2])) if tounicode[0] == "stream" else None
+        if subtype == "Type0":
+            # CID de dos bytes: solo Identity-H/V, y el ToUnicode dice qué glifos hay en el subconjunto
+            encoding = doc.xref_get_key(xref, "Encoding")
+            if encoding[1] not in ("/Identity-H", "/Identity-V") or cmap is None or cmap[1] != 2:
+                return None
+            return cls(cmap[0], 2, program=_font_program(doc, xref))
+        if subtype not in ("Type1", "MMType1", "TrueType"):
+            return None  # Type3: glifos dibujados, no se reescriben
+
+        # Fuente simple: un byte por código; solo tienen glifo los códigos con ancho
+        first = doc.xref_get_key(xref, "FirstChar")
+        widths = _resolve(doc, *doc.xref_get_key(xref, "Widths"))
+        available = None
+        if first[0] == "int" and widths[0] in ("array", "object"):
+            first_char = int(first[1])
+            available = {first_char + i for i, w in enumerate(_numbers(widths[1])) if w > 0}
+            available.add(0x20)  # el espacio puede tener ancho 0 en el array y no necesita glifo
+        program = _font_program(doc, xref)
+        if cmap is not None and cmap[1] == 1:
+            return cls(cmap[0], 1, available, program)
+
+        decode_map = {code: chr(code) for code in range(0x20, 0x7F)}  # común a las codificaciones estándar
+        encoding = _resolve(doc, *doc.xref_get_key(xref, "Encoding"))
+        differences = re.search(r"/Differences\s*\[(.*?)\]", encoding[1], re.S) if encoding[0] != "name" else None
+        if differences:
+            code = 0
+            for token in re.findall(r"/[^\s/\[\]]+|\d+", differences.group(1)):
+                if token.startswith("/"):
+                    decode_map[code] = _GLYPH_NAMES.get(token[1:], _UNKNOWN)
+                    code += 1
+                else:
+                    code = int(token)
+        return cls(decode_map, 1, available, program)
+
+
+def page_codecs(page):
+    """Codificadores por nombre de recurso de las fuentes de la página."""
+    codecs = {}
+    for xref, _ext, subtype, _basefont, refname, _encoding, *_rest in page.get_fonts():
+        codecs[refname] = FontCodec.for_font(page.parent, xref, subtype)
+    return codecs
+
+
+# ========================================================
+# ======================Reescritura=======================
+# ========================================================
+def _shared_contents(doc, page, xrefs):
+    """True si algún stream de contenido de la página lo usa también otra página."""
+    for page_no in range(doc.page_count):
+        if page_no == page.number:
+            continue
+        kind, value = doc.xref_get_key(doc.page_xref(page_no), "Contents")
+        if kind in ("xref", "array") and {int(x) for x in re.findall(r"(\d+)\s+0\s+R", value)} & xrefs:
+            return True
+    return False
+
+
+def _compact(text):
+    return "".join(text.split())
+
+
+def rewrite_dimension_text(page, rect, convert=convert_inches_to_mm):
+    """Reescribe en el contenido de la página la cota de texto que hay en `rect` (Rect PDF).
+
+    Devuelve un TextRewrite o None si no se puede (sin texto, texto que no
+    es una cota, página rotada, fuente sin los glifos necesarios...); en ese
+    caso la página no se toca.
+    """
+    doc = page.parent
+    if page.rotation != 0:
+        return None
+    xrefs = page.get_contents()
+    if not xrefs or _shared_contents(doc, page, set(xrefs)):
+        return None
+
+    with span("rewrite_parse", page=page.number):
+        codecs = page_codecs(page)
+        to_page = page.transformation_matrix
+        area = fitz.Rect(rect) + (-ORIGIN_TOLERANCE, -ORIGIN_TOLERANCE, ORIGIN_TOLERANCE, ORIGIN_TOLERANCE)
+        state, matches = GraphicsState(), []
+        streams = {xref: doc.xref_stream(xref) for xref in xrefs}
+        for xref, data in streams.items():
+            previous = False  # la cadena anterior era de la selección
+            for op, operand, font, origin in text_shows(data, state):
+                # Sin origen conocido, la cadena sigue a la anterior en la misma línea
+                previous = previous if origin is None else (origin * to_page) in area
+                if not previous:
+                    continue
+                codec = codecs.get(font)
+                if codec is None:
+                    return None
+                strings = [operand] if operand[0] == "str" else [v for v in operand[1] if v[0] == "str"]
+                text = "".join(codec.decode(s[1]) for s in strings)
+                matches.append((xref, operand, codec, text))
+
+    # La cota tal como se lee en la página (MuPDF decide qué cadenas forman una palabra)
+    # y todo el texto de la selección tiene que estar entre las cadenas localizadas
+    source_text = " ".join(page.get_text("text", clip=rect).split())
+    if not matches or not is_dimension_text(source_text) or \
+            _compact(source_text) != _compact("".join(text for *_rest, text in matches)):
+        return None
+
+    # Una cota partida en varias cadenas se convierte entera y se escribe en la
+    # primera; las demás quedan vacías. Todas tienen que usar la misma fuente.
+    codecs_used = {id(codec) for _xref, _operand, codec, _text in matches}
+    if len(codecs_used) != 1:
+        print("La cota usa varias fuentes: se sustituye con recuadro")
+        return None
+    converted_text = convert(source_text)
+    encoded = matches[0][2].encode(converted_text)
+    if encoded is None:
+        print(f"La fuente no tiene los glifos de '{converted_text}': se sustituye con recuadro")
+        return None
+
+    edits = {}
+    for index, (xref, operand, _codec, _text) in enumerate(matches):
+        # TJ: el array entero (con sus ajustes de espaciado) pasa a ser una sola cadena
+        replacement = b"<" + (encoded.hex().encode("ascii") if index == 0 else b"") + b">"
+        if operand[0] == "array":
+            replacement = b"[" + replacement + b"]"
+        edits.setdefault(xref, []).append((operand[2], operand[3], replacement))
+
+    with span("page_write", rewrite=True):
+        originals = {}
+        for xref, changes in edits.items():
+            data = streams[xref]
+            originals[xref] = data
+            parts, last = [], 0
+            for start, end, replacement in sorted(changes):
+                parts += [data[last:start], replacement]
+                last = end
+            parts.append(data[last:])
+            doc.update_stream(xref, b"".join(parts))
+
+    # Zona afectada: la selección y las palabras nuevas, que pueden ser más largas
+    affected = fitz.Rect(rect)
+    for word in page.get_text("words"):
+        word_rect = fitz.Rect(word[:4])
+        if word_rect.intersects(rect):
+            affected |= word_rect
+    return TextRewrite(source_text, converted_text, originals, affected)
@@ -0,0 +1,323 @@
+# Miniaturas de las páginas
+# Barra lateral con una miniatura por página para saltar directamente a
+# cualquier hoja. Un hilo en segundo plano calcula el hash del fichero y lee
+# las miniaturas de la caché en disco (indexada por el hash y el número de
+# página), de modo que al reabrir el mismo documento aparecen al instante. Ese
+# hilo no toca PyMuPDF, que no es seguro entre hilos: las que faltan se
+# renderizan en el proceso de render (render_server.py), detrás de las teselas
+# de la vista, o, si no está disponible, de una en una en el hilo de Tk con
+# after() para no bloquear la ventana.
+#
+# La caché está en ~/.cache/inches_to_mm/thumbnails (%LOCALAPPDATA% en
+# Windows) o en el directorio indicado por INCHES_TO_MM_CACHE.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import os
+import queue
+import threading
+import tkinter as tk
+
+from render_server import PRIORITY_THUMBNAIL
+from session import file_hash
+from startup import lazy_import
+
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
+fitz = lazy_import("fitz")  # PyMuPDF
+
+THUMB_SIZE = 120        # lado mayor de las miniaturas (píxeles)
+THUMB_LABEL_HEIGHT = 18 # espacio para el número de página bajo cada miniatura
+THUMB_PADDING = 8
+POLL_MS = 50            # cada cuánto recoge la interfaz las miniaturas terminadas
+THUMBS_IN_FLIGHT = 4    # peticiones de miniaturas pendientes a la vez en el proceso de render
+
+
+def default_cache_dir():
+    """Directorio de la caché de miniaturas según el sistema."""
+    if os.environ.get("INCHES_TO_MM_CACHE"):
+        return os.path.join(os.environ["INCHES_TO_MM_CACHE"], "thumbnails")
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "inches_to_mm", "thumbnails")
+
+
+def thumbnail_zoom(page_rect, size=THUMB_SIZE):
+    return size / max(page_rect.width, page_rect.height)
+
+
+def render_thumbnail(page, size=THUMB_SIZE):
+    """Miniatura PIL de la página con el lado mayor igual a `size`."""
+    zoom = thumbnail_zoom(page.rect, size)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+
+# ========================================================
+# ========================Caché===========================
+# ========================================================
+class ThumbnailCache:
+    """Miniaturas PNG en disco: <directorio>/<hash del fichero>/<página>_<tamaño>.png."""
+
+    def __init__(self, cache_dir=None, size=THUMB_SIZE):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.size = size
+
+    def path(self, doc_hash, page_no):
+        return os.path.join(self.cache_dir, doc_hash, f"{page_no:05d}_{self.size}.png")
+
+    def load(self, doc_hash, page_no):
+        """Miniatura guardada o None."""
+        path = self.path(doc_hash, page_no)
+        if not os.path.exists(path):
+            return None
+        try:
+            with Image.open(path) as img:
+                return img.convert("RGB")
+        except OSError:
+            return None  # fichero corrupto o a medio escribir: se regenera
+
+    def store(self, doc_hash, page_no, image):
+        path = self.path(doc_hash, page_no)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        image.save(tmp_path, "PNG")
+        os.replace(tmp_path, path)  # escritura atómica: nunca se lee un PNG a medias
+
+
+# ========================================================
+# ==================Hilo de la caché======================
+# ========================================================
+class ThumbnailLoader(threading.Thread):
+    """Calcula el hash del PDF y lee de la caché las miniaturas ya generadas.
+
+    No usa PyMuPDF. Deja en la cola ("cached", página, imagen PIL) por cada
+    miniatura guardada y ("missing", página, None) por las que hay que
+    renderizar.
+    """
+
+    def __init__(self, pdf_path, page_count, cache, results):
+        super().__init__(daemon=True, name="thumbnails")
+        self.pdf_path = pdf_path
+        self.page_count = page_count
+        self.cache = cache
+        self.results = results
+        self.doc_hash = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        try:
+            doc_hash = file_hash(self.pdf_path)
+        except OSError as e:
+            print(f"Caché de miniaturas no disponible: {e}")
+            doc_hash = None
+        self.doc_hash = doc_hash
+        for page_no in range(self.page_count):
+            if self._stop_event.is_set():
+                return
+            image = self.cache.load(doc_hash, page_no) if doc_hash else None
+            self.results.put(("cached", page_no, image) if image is not None else ("missing", page_no, None))
+
+
+# ========================================================
+# ====================Barra lateral=======================
+# ========================================================
+class ThumbnailSidebar(tk.Frame):
+    """Columna de miniaturas; al hacer clic en una se llama a `on_select(página)`.
+
+    Con `renderer` (un RenderClient) las miniaturas que no están en caché se
+    piden al proceso de render; sus resultados llegan con el `poll()` que ya
+    hace la aplicación.
+    """
+
+    def __init__(self, master, on_select, cache=None, renderer=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_select = on_select
+        self.cache = cache or ThumbnailCache()
+        self.renderer = renderer
+        slot_width = self.cache.size + 2 * THUMB_PADDING
+        self.slot_height = self.cache.size + THUMB_LABEL_HEIGHT + THUMB_PADDING
+
+        self.canvas = tk.Canvas(self, width=slot_width, bg="grey85", highlightthickness=0)
+        scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.canvas.yview)
+        self.canvas.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.Y, expand=True)
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+
+        self.results = queue.Queue()
+        self.loader = None
+        self.pdf_path = None
+        self.doc = None         # manejador propio del PDF en disco, solo si se renderiza en la interfaz
+        self.missing = []       # páginas sin miniatura en caché, por orden
+        self.in_flight = {}     # página -> id de la petición al proceso de render
+        self.render_locally = renderer is None
+        self._poll_job = None
+        self.page_rects = []
+        self.images = {}      # página -> PhotoImage (hay que mantener la referencia)
+        self.edited = set()   # páginas con la miniatura de la versión editada: no se sustituye
+        self.page_count = 0
+        self.current = None
+
+    def load(self, pdf_path, doc):
+        """Prepara los huecos de las páginas y lanza la generación de miniaturas."""
+        self.clear()
+        self.pdf_path = pdf_path
+        self.page_count = len(doc)
+        self.page_rects = [doc[page_no].rect for page_no in range(self.page_count)]
+        size = self.cache.size
+        for page_no, rect in enumerate(self.page_rects):
+            # Marcador con la proporción real de la página hasta que llegue la miniatura
+            scale = thumbnail_zoom(rect, size)
+            x0, y0 = self._slot_origin(page_no)
+            w, h = rect.width * scale, rect.height * scale
+            self.canvas.create_rectangle(x0, y0, x0 + w, y0 + h, fill="white", outline="grey60",
+                                         tags=("thumb", f"thumb_{page_no}"))
+            self.canvas.create_text(x0 + size / 2, y0 + size + THUMB_LABEL_HEIGHT / 2, text=str(page_no + 1),
+                                    tags=("thumb",))
+        self.canvas.config(scrollregion=(0, 0, size + 2 * THUMB_PADDING, self.page_count * self.slot_height))
+        self.loader = ThumbnailLoader(pdf_path, self.page_count, self.cache, self.results)
+        self.loader.start()
+        self._poll()
+
+    def clear(self):
+        if self.loader is not None:
+            self.loader.stop()
+            self.loader = None
+        if self.renderer is not None:
+            for request_id in self.in_flight.values():
+                self.renderer.cancel(request_id)
+        self.in_flight = {}
+        self.missing = []
+        self.render_locally = self.renderer is None
+        if self._poll_job is not None:
+            self.after_cancel(self._poll_job)
+            self._poll_job = None
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+        self.results = queue.Queue()  # descartar resultados del documento anterior
+        self.canvas.delete("all")
+        self.images.clear()
+        self.edited.clear()
+        self.page_rects = []
+        self.page_count = 0
+        self.current = None
+
+    def update_page(self, page):
+        """Regenera la miniatura de una página editada (solo en memoria: el fichero no ha cambiado)."""
+        self.edited.add(page.number)
+        self._place(page.number, render_thumbnail(page, self.cache.size))
+
+    def set_current(self, page_no):
+        """Resalta la página actual y desplaza la barra para que se vea."""
+        self.canvas.delete("current_marker")
+        if not (0 <= page_no < self.page_count):
+            return
+        self.current = page_no
+        x0, y0 = self._slot_origin(page_no)
+        size = self.cache.size
+        self.canvas.create_rectangle(x0 - 3, y0 - 3, x0 + size + 3, y0 + size + 3, outline="red", width=2,
+                                     tags="current_marker")
+        top, bottom = self.canvas.yview()
+        total = max(1, self.page_count * self.slot_height)
+        if not top <= y0 / total <= bottom - self.slot_height / total:
+            self.canvas.yview_moveto(max(0, (y0 - THUMB_PADDING) / total))
+
+    # -------------------- Internos --------------------
+    def _slot_origin(self, page_no):
+        return THUMB_PADDING, page_no * self.slot_height + THUMB_PADDING / 2
+
+    def _place(self, page_no, image):
+        tk_image = ImageTk.PhotoImage(image)
+        self.images[page_no] = tk_image
+        self.canvas.delete(f"thumb_{page_no}")
+        x0, y0 = self._slot_origin(page_no)
+        self.canvas.create_image(x0, y0, anchor=tk.NW, image=tk_image, tags=("thumb", f"thumb_{page_no}"))
+        self.canvas.tag_raise("current_marker")
+
+    def _finish(self, page_no, image):
+        """Guarda en caché una miniatura recién renderizada (versión en disco) y la muestra."""
+        if self.loader is not None and self.loader.doc_hash:
+            try:
+                self.cache.store(self.loader.doc_hash, page_no, image)
+            except OSError as e:
+                print(f"No se pudo guardar la miniatura en caché: {e}")
+        if page_no not in self.edited:
+            self._place(page_no, image)
+
+    def _request_missing(self):
+        """Pide al proceso de render las miniaturas que faltan, unas pocas a la vez."""
+        while self.missing and len(self.in_flight) < THUMBS_IN_FLIGHT:
+            page_no = self.missing.pop(0)
+            rect = self.page_rects[page_no]
+            zoom = thumbnail_zoom(rect, self.cache.size)
+            box = (0, 0, rect.width * zoom, rect.height * zoom)
+            self.in_flight[page_no] = self.renderer.request(
+                page_no, zoom, box, fitz.csRGB, PRIORITY_THUMBNAIL,
+                lambda result, page_no=page_no: self._on_rendered(page_no, result))
+
+    def _on_rendered(self, page_no, result):
+        """Callback del proceso de render (llega desde el poll del hilo de Tk)."""
+        self.in_flight.pop(page_no, None)
+        if result is None:
+            self.missing.append(page_no)  # falló allí: se renderiza aquí
+            self.render_locally = True
+            return
+        image = result.image.copy()  # la imagen no debe apuntar al bloque compartido
+        result.release()
+        self._finish(page_no, image)
+        self._request_missing()
+
+    def _render_one(self):
+        """Sin proceso de render: una miniatura por vuelta del bucle de Tk, con un manejador propio."""
+        page_no = self.missing.pop(0)
+        if self.doc is None:
+            self.doc = fitz.open(self.pdf_path)
+        self._finish(page_no, render_thumbnail(self.doc[page_no], self.cache.size))
+
+    def _poll(self):
+        """Recoge lo que ha leído el hilo de la caché y avanza con las miniaturas que faltan."""
+        results = self.results
+        try:
+            while True:
+                kind, page_no, image = results.get_nowait()
+                if kind == "cached":
+                    if page_no not in self.edited:
+                        self._place(page_no, image)
+                else:
+                    self.missing.append(page_no)
+        except queue.Empty:
+            pass
+        if self.in_flight and not self.renderer.available:
+            # El proceso de render ha terminado: lo pedido se renderiza aquí
+            self.missing = list(self.in_flight) + self.missing
+            self.in_flight = {}
+            self.render_locally = True
+        if self.missing:
+            if not self.render_locally and self.renderer.available:
+                self._request_missing()
+            elif not self.in_flight:
+                try:
+                    self._render_one()
+                except Exception as e:
+                    print(f"Miniaturas no disponibles: {e}")
+                    self.missing = []
+        loading = self.loader is not None and (self.loader.is_alive() or not results.empty())
+        self._poll_job = None
+        if loading or self.missing or self.in_flight:
+            self._poll_job = self.after(POLL_MS, self._poll)
+        elif self.doc is not None:
+            self.doc.close()
+            self.doc = None
+
+    def _on_click(self, event):
+        page_no = int(self.canvas.canvasy(event.y) // self.slot_height)
+        if 0 <= page_no < self.page_count:
+            self.on_select(page_no)
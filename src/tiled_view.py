@@ -0,0 +1,469 @@
+# Visor de página con presupuesto de memoria
+# A zoom alto una hoja A0 se convierte en un raster de ~16k x 11k píxeles
+# (más de 500 MB solo el pixmap, más las copias de PIL y Tk). Esta clase pinta
+# la página en el canvas respetando un presupuesto de píxeles:
+# - si la página cabe, se renderiza entera en un único raster (como siempre);
+# - si no cabe, se divide en teselas y solo se renderizan las que se ven (más
+#   un margen); las que salen de la vista se liberan cuando se supera el
+#   presupuesto (estrategia "tiles"),
+# - o bien se limita el zoom efectivo para que el raster quepa (estrategia "cap").
+#
+# ContinuousDocumentView apila todas las páginas en vertical: cada página tiene
+# un marcador del tamaño de page.rect y solo las cercanas a la vista se renderizan.
+#
+# Con un `renderer` (render_server.RenderClient) los rasters se piden al
+# proceso de render y se pintan cuando llegan, las visibles primero; mientras
+# tanto los recortes para el OCR se renderizan desde el PDF.
+#
+# El presupuesto se puede cambiar con la variable de entorno
+# INCHES_TO_MM_PIXEL_BUDGET (en píxeles).
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import math
+import os
+from collections import OrderedDict
+import tkinter as tk
+
+from render_server import PRIORITY_PREFETCH, PRIORITY_VISIBLE
+from rendering import render_clip
+from startup import lazy_import
+
+ImageTk = lazy_import("PIL.ImageTk")
+fitz = lazy_import("fitz")  # PyMuPDF
+
+# 40 Mpx: ~120 MB en RGB para PIL más ~160 MB en la imagen de Tk
+DEFAULT_PIXEL_BUDGET = int(os.environ.get("INCHES_TO_MM_PIXEL_BUDGET", 40_000_000))
+TILE_SIZE = 1024        # lado de las teselas (píxeles)
+PREFETCH_MARGIN = 256   # píxeles alrededor de la vista que también se renderizan
+TK_BYTES_PER_PIXEL = 4  # las imágenes de Tk guardan RGBA
+PAGE_GAP = 10           # separación entre páginas en la vista continua (puntos PDF)
+PAGE_PREFETCH_MARGIN = 512  # píxeles por encima y debajo de la vista con páginas ya renderizadas
+REFRESH_MARGIN = 4      # píxeles añadidos alrededor de una zona editada al re-renderizarla (antialiasing)
+
+
+def format_bytes(n):
+    """'12.3 MB' a partir de un número de bytes."""
+    return f"{n / 2**20:.1f} MB"
+
+
+# ========================================================
+# ===================Imagen bajo demanda==================
+# ========================================================
+class PageClipImage:
+    """Sustituto de la imagen PIL de la página cuando está en teselas.
+
+    Ofrece `size` y `crop` como una imagen PIL, pero cada recorte se renderiza
+    directamente desde el PDF, sin tener la página entera en memoria.
+    """
+
+    def __init__(self, page, zoom, size, colorspace=None):
+        self.page = page
+        self.zoom = zoom
+        self.size = size
+        self.colorspace = colorspace
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    def crop(self, box):
+        return render_clip(self.page, self.zoom, box, self.colorspace)
+
+
+class RasterTile:
+    """Raster mostrado en el canvas: su zona, la imagen de Tk y (opcional) la imagen PIL."""
+
+    def __init__(self, box, pil_image, tk_image, item_id, buffer=None):
+        self.box = box
+        self.pil_image = pil_image
+        self.tk_image = tk_image
+        self.item_id = item_id
+        self.buffer = buffer  # RenderResult cuya memoria compartida usa pil_image, si la hay
+
+    def release(self, canvas):
+        canvas.delete(self.item_id)
+        self.pil_image = None
+        if self.buffer is not None:
+            self.buffer.release()
+            self.buffer = None
+
+    @property
+    def nbytes(self):
+        width, height = self.box[2] - self.box[0], self.box[3] - self.box[1]
+        pil_bytes = width * height * len(self.pil_image.getbands()) if self.pil_image is not None else 0
+        return width * height * TK_BYTES_PER_PIXEL + pil_bytes
+
+
+# ========================================================
+# =====================Vista de página====================
+# ========================================================
+class TiledPageView:
+    """Pinta una página en un canvas de Tk sin superar un presupuesto de píxeles."""
+
+    def __init__(self, canvas, pixel_budget=DEFAULT_PIXEL_BUDGET, tile_size=TILE_SIZE,
+                 strategy="tiles", prefetch_margin=PREFETCH_MARGIN, stack_above=None, renderer=None):
+        if strategy not in ("tiles", "cap"):
+            raise ValueError(f"Estrategia desconocida: '{strategy}' (use 'tiles' o 'cap')")
+        self.canvas = canvas
+        self.pixel_budget = pixel_budget
+        self.tile_size = tile_size
+        self.strategy = strategy
+        self.prefetch_margin = prefetch_margin
+        # Etiqueta de canvas sobre la que se apilan los rasters (None: al fondo del canvas)
+        self.stack_above = stack_above
+
+        self.page = None
+        self.zoom = 1.0
+        self.origin = (0, 0)  # posición de la esquina superior izquierda de la página en el canvas
+        self.colorspace = None  # el de la página mostrada (RGB si no se indica)
+        self.width = 0
+        self.height = 0
+        self.tiled = False
+        self.tiles = OrderedDict()  # (columna, fila) -> RasterTile, en orden de uso (LRU)
+        # Proceso de render (ver render_server.py) y peticiones en curso: (columna, fila) -> id
+        self.renderer = renderer
+        self.pending = {}
+
+    # -------------------- Estado --------------------
+    @property
+    def memory_bytes(self):
+        """Memoria ocupada por los rasters mostrados (PIL + Tk)."""
+        return sum(tile.nbytes for tile in self.tiles.values())
+
+    @property
+    def image(self):
+        """Imagen de la página para recortar (PIL si está entera, PageClipImage si está en teselas)."""
+        if self.page is None:
+            return None
+        if not self.tiled and self.tiles:
+            return next(iter(self.tiles.values())).pil_image
+        return PageClipImage(self.page, self.zoom, (self.width, self.height), self.colorspace)
+
+    def raster_size(self, page, zoom):
+        """Tamaño en píxeles del raster de la página a ese zoom (igual que get_pixmap)."""
+        irect = (page.rect * fitz.Matrix(zoom, zoom)).irect
+        return irect.width, irect.height
+
+    # -------------------- Pintado --------------------
+    def clear(self):
+        """Quita los rasters del canvas y los libera (y cancela los que estaban pedidos)."""
+        for request_id in self.pending.values():
+            self.renderer.cancel(request_id)
+        self.pending.clear()
+        for tile in self.tiles.values():
+            tile.release(self.canvas)
+        self.tiles.clear()
+        self.page = None
+        self.width = self.height = 0
+
+    def show(self, page, zoom, colorspace=None, origin=(0, 0)):
+        """Muestra la página al zoom pedido y devuelve el zoom efectivo (menor si se limita).
+
+        La región de scroll del canvas la fija quien llama (ver `width` y `height`).
+        """
+        self.clear()
+        self.colorspace = colorspace or fitz.csRGB
+        self.origin = origin
+        width, height = self.raster_size(page, zoom)
+        self.tiled = width * height > self.pixel_budget
+        if self.tiled and self.strategy == "cap":
+            # Reducir el zoom hasta que el raster quepa en el presupuesto
+            zoom *= math.sqrt(self.pixel_budget / (width * height))
+            width, height = self.raster_size(page, zoom)
+            while width * height > self.pixel_budget:
+                zoom *= 0.99
+                width, height = self.raster_size(page, zoom)
+            self.tiled = False
+
+        self.page, self.zoom = page, zoom
+        self.width, self.height = width, height
+        if self.tiled:
+            self.update_visible()
+        else:
+            self._add_tile((0, 0), (0, 0, width, height), keep_pil=True)
+        return zoom
+
+    def visible_box(self, margin=0):
+        """Zona visible (más `margin` píxeles) en coordenadas de la página, recortada a su tamaño."""
+        ox, oy = self.origin
+        x0 = self.canvas.canvasx(0) - ox - margin
+        y0 = self.canvas.canvasy(0) - oy - margin
+        x1 = self.canvas.canvasx(self.canvas.winfo_width()) - ox + margin
+        y1 = self.canvas.canvasy(self.canvas.winfo_height()) - oy + margin
+        return max(0, x0), max(0, y0), min(self.width, x1), min(self.height, y1)
+
+    def tiles_in(self, box):
+        """Índices (columna, fila) de las teselas que tocan `box`."""
+        x0, y0, x1, y1 = box
+        size = self.tile_size
+        cols = range(int(x0 // size), int(math.ceil(x1 / size)))
+        rows = range(int(y0 // size), int(math.ceil(y1 / size)))
+        return [(c, r) for r in rows for c in cols]
+
+    def update_visible(self):
+        """Renderiza las teselas visibles que falten y libera las sobrantes si se pasa del presupuesto.
+
+        Devuelve el número de teselas nuevas.
+        """
+        if not self.tiled or self.page is None:
+            return 0
+        needed = self.tiles_in(self.visible_box(self.prefetch_margin))
+        visible = set(self.tiles_in(self.visible_box()))
+        # Las visibles se piden antes que las de precarga
+        needed.sort(key=lambda key: key not in visible)
+        added = 0
+        for key in needed:
+            if key in self.tiles:
+                self.tiles.move_to_end(key)
+                continue
+            if key in self.pending:
+                continue
+            c, r = key
+            size = self.tile_size
+            box = (c * size, r * size, min(self.width, (c + 1) * size), min(self.height, (r + 1) * size))
+            self._add_tile(key, box, keep_pil=False,
+                           priority=PRIORITY_VISIBLE if key in visible else PRIORITY_PREFETCH)
+            added += 1
+        # Cancelar lo pedido que ha salido de la vista antes de que se renderice
+        for key in [k for k in self.pending if k not in needed]:
+            self.renderer.cancel(self.pending.pop(key))
+        self._evict(set(needed))
+        return added
+
+    def refresh(self, rect, page=None, margin=REFRESH_MARGIN):
+        """Vuelve a renderizar solo la zona `rect` (PDF) tras editarla, sin tocar el resto de la página.
+
+        El trozo renderizado se copia dentro de las imágenes de Tk mostradas (y
+        de la imagen PIL si la página está entera); las teselas que no están en
+        memoria ya saldrán actualizadas cuando se rendericen. `page` sustituye
+        a la página guardada (la que se acaba de modificar). Devuelve los
+        píxeles renderizados.
+        """
+        if self.page is None:
+            return 0
+        if page is not None:
+            self.page = page
+        # Lo que aún estaba pidiéndose al proceso de render saldría sin la edición
+        self.render_pending()
+        zone = fitz.Rect(rect) * fitz.Matrix(self.zoom, self.zoom)
+        box = (max(0, math.floor(zone.x0) - margin), max(0, math.floor(zone.y0) - margin),
+               min(self.width, math.ceil(zone.x1) + margin), min(self.height, math.ceil(zone.y1) + margin))
+        rendered = 0
+        for tile in self.tiles.values():
+            x0, y0 = max(box[0], tile.box[0]), max(box[1], tile.box[1])
+            x1, y1 = min(box[2], tile.box[2]), min(box[3], tile.box[3])
+            if x0 >= x1 or y0 >= y1:
+                continue
+            patch = render_clip(self.page, self.zoom, (x0, y0, x1, y1), self.colorspace)
+            offset = (x0 - tile.box[0], y0 - tile.box[1])
+            # Copiar el trozo dentro de la imagen de Tk ya mostrada (sin crear elementos nuevos en el canvas)
+            patch_tk = ImageTk.PhotoImage(patch)
+            self.canvas.tk.call(str(tile.tk_image), "copy", str(patch_tk), "-to", *offset)
+            if tile.pil_image is not None:
+                tile.pil_image.paste(patch, offset)
+            rendered += patch.width * patch.height
+        return rendered
+
+    def _add_tile(self, key, box, keep_pil, priority=PRIORITY_VISIBLE):
+        """Renderiza un raster: en el proceso de render si lo hay (llega después) o aquí mismo."""
+        if self.renderer is not None and self.renderer.can_render(self.page.number):
+            page = self.page
+
+            def deliver(result):
+                if self.pending.pop(key, None) is None or self.page is not page:
+                    if result is not None:
+                        result.release()
+                    return
+                if result is None:  # el proceso falló: renderizar aquí
+                    self._place_tile(key, box, render_clip(self.page, self.zoom, box, self.colorspace), keep_pil)
+                    return
+                # Solo la imagen en gris que se conserva apunta a la memoria compartida
+                shared = keep_pil and result.image.mode == "L"
+                self._place_tile(key, box, result.image, keep_pil, buffer=result if shared else None)
+                if not shared:
+                    result.release()
+
+            self.pending[key] = self.renderer.request(self.page.number, self.zoom, box, self.colorspace,
+                                                      priority, deliver)
+            return
+        self._place_tile(key, box, render_clip(self.page, self.zoom, box, self.colorspace), keep_pil)
+
+    def render_pending(self):
+        """Cancela los rasters pedidos al proceso de render y los renderiza aquí (p. ej. tras editar la página)."""
+        for key in list(self.pending):
+            self.renderer.cancel(self.pending.pop(key))
+            c, r = key
+            size = self.tile_size
+            if self.tiled:
+                box = (c * size, r * size, min(self.width, (c + 1) * size), min(self.height, (r + 1) * size))
+            else:
+                box = (0, 0, self.width, self.height)
+            self._place_tile(key, box, render_clip(self.page, self.zoom, box, self.colorspace),
+                             keep_pil=not self.tiled)
+
+    def _place_tile(self, key, box, pil_image, keep_pil, buffer=None):
+        tk_image = ImageTk.PhotoImage(pil_image)
+        item_id = self.canvas.create_image(self.origin[0] + box[0], self.origin[1] + box[1], anchor=tk.NW,
+                                           image=tk_image, tags="page_raster")
+        # Por debajo del rectángulo de selección (y encima de los marcadores de página, si los hay)
+        if self.stack_above is None:
+            self.canvas.tag_lower(item_id)
+        else:
+            self.canvas.tag_raise(item_id, self.stack_above)
+        self.tiles[key] = RasterTile(box, pil_image if keep_pil else None, tk_image, item_id, buffer)
+
+    def _evict(self, keep):
+        """Libera las teselas menos usadas fuera de `keep` hasta volver al presupuesto."""
+        pixels = sum((t.box[2] - t.box[0]) * (t.box[3] - t.box[1]) for t in self.tiles.values())
+        for key in list(self.tiles):
+            if pixels <= self.pixel_budget:
+                break
+            if key in keep:
+                continue
+            tile = self.tiles.pop(key)
+            tile.release(self.canvas)
+            pixels -= (tile.box[2] - tile.box[0]) * (tile.box[3] - tile.box[1])
+
+
+# ========================================================
+# ==================Vista continua========================
+# ========================================================
+class ContinuousDocumentView:
+    """Todas las páginas una debajo de otra, virtualizadas.
+
+    Cada página ocupa su hueco (calculado de `page.rect`) con un marcador
+    blanco; solo las páginas que tocan la vista (más un margen) tienen raster,
+    cada una en su propio TiledPageView, y las que salen de la vista se liberan.
+    """
+
+    def __init__(self, canvas, pixel_budget=DEFAULT_PIXEL_BUDGET, page_gap=PAGE_GAP,
+                 page_margin=PAGE_PREFETCH_MARGIN, renderer=None):
+        self.canvas = canvas
+        self.pixel_budget = pixel_budget
+        self.renderer = renderer        # proceso de render compartido por las páginas (o None)
+        self.page_gap = page_gap        # separación entre páginas (puntos PDF, escala con el zoom)
+        self.page_margin = page_margin  # píxeles por encima y por debajo de la vista que se renderizan
+        self.doc = None
+        self.zoom = 1.0
+        self.page_boxes = []            # [(x0, y0, x1, y1)] de cada página en el canvas
+        self.width = 0
+        self.height = 0
+        self.views = {}                 # página -> TiledPageView con raster
+        self._sizes = []                # tamaño (puntos) de cada página del último documento
+        self._sizes_doc = None
+
+    # -------------------- Disposición --------------------
+    def layout(self, doc, zoom):
+        """Calcula la posición de cada página y dibuja los marcadores (sin renderizar nada)."""
+        self.clear()
+        self.doc, self.zoom = doc, zoom
+        if self._sizes_doc is not doc:
+            # Los tamaños se leen una vez por documento; al cambiar de zoom solo se escalan
+            self._sizes = [(page.rect.width, page.rect.height) for page in doc]
+            self._sizes_doc = doc
+        gap = self.page_gap * zoom
+        y = 0
+        self.page_boxes = []
+        for width, height in self._sizes:
+            w, h = width * zoom, height * zoom
+            self.page_boxes.append((0, y, w, y + h))
+            self.canvas.create_rectangle(0, y, w, y + h, fill="white", outline="grey", tags="placeholder")
+            y += h + gap
+        self.width = max((box[2] for box in self.page_boxes), default=0)
+        self.height = max(0, y - gap)
+
+    def clear(self):
+        """Libera todos los rasters y marcadores."""
+        for view in self.views.values():
+            view.clear()
+        self.views.clear()
+        self.canvas.delete("placeholder")
+        self.doc = None
+        self.page_boxes = []
+        self.width = self.height = 0
+
+    def page_top(self, page_no):
+        """Coordenada y del borde superior de la página en el canvas."""
+        return self.page_boxes[page_no][1]
+
+    def page_at(self, y):
+        """Página cuyo hueco contiene (o queda más cerca de) la coordenada y del canvas."""
+        for page_no, (_x0, y0, _x1, y1) in enumerate(self.page_boxes):
+            if y < y1 + self.page_gap * self.zoom / 2:
+                return page_no
+        return len(self.page_boxes) - 1
+
+    def locate(self, coords):
+        """Traduce un rectángulo del canvas a (página, rectángulo en píxeles de esa página).
+
+        La página es la que contiene el centro del rectángulo; devuelve None si el
+        centro cae fuera de toda página.
+        """
+        x0, y0, x1, y1 = coords
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        for page_no, (px0, py0, px1, py1) in enumerate(self.page_boxes):
+            if px0 <= cx <= px1 and py0 <= cy <= py1:
+                local = (max(0, x0 - px0), max(0, y0 - py0),
+                         min(px1 - px0, x1 - px0), min(py1 - py0, y1 - py0))
+                return page_no, tuple(int(c) for c in local)
+        return None
+
+    # -------------------- Pintado --------------------
+    @property
+    def memory_bytes(self):
+        return sum(view.memory_bytes for view in self.views.values())
+
+    @property
+    def tile_count(self):
+        return sum(len(view.tiles) for view in self.views.values())
+
+    def visible_pages(self):
+        """Páginas que tocan la vista ampliada con el margen."""
+        top = self.canvas.canvasy(0) - self.page_margin
+        bottom = self.canvas.canvasy(self.canvas.winfo_height()) + self.page_margin
+        return [page_no for page_no, (_x0, y0, _x1, y1) in enumerate(self.page_boxes)
+                if y1 >= top and y0 <= bottom]
+
+    def update_visible(self, colorspace_for=None):
+        """Renderiza las páginas que entran en la vista y libera las que salen.
+
+        `colorspace_for(page)` decide el espacio de color de cada página.
+        Devuelve el número de rasters nuevos (páginas o teselas).
+        """
+        if self.doc is None:
+            return 0
+        visible = self.visible_pages()
+        for page_no in list(self.views):
+            if page_no not in visible:
+                self.views.pop(page_no).clear()
+
+        added = 0
+        for page_no in visible:
+            view = self.views.get(page_no)
+            if view is None:
+                page = self.doc[page_no]
+                colorspace = colorspace_for(page) if colorspace_for else fitz.csRGB
+                view = TiledPageView(self.canvas, self.pixel_budget, stack_above="placeholder",
+                                     renderer=self.renderer)
+                x0, y0, _x1, _y1 = self.page_boxes[page_no]
+                view.show(page, self.zoom, colorspace, origin=(x0, y0))
+                self.views[page_no] = view
+                added += 1
+            else:
+                added += view.update_visible()
+        return added
+
+    def refresh_page(self, page_no, colorspace_for=None):
+        """Vuelve a renderizar una página ya visible (p. ej. tras editarla)."""
+        view = self.views.pop(page_no, None)
+        if view is not None:
+            view.clear()
+        return self.update_visible(colorspace_for)
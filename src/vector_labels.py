@@ -0,0 +1,210 @@
+# Detección de cotas a partir de la geometría vectorial
+# En los planos vectoriales cada cota se dibuja con la misma geometría: una
+# línea de cota con una flecha (triángulo pequeño) en cada extremo y, normalmente,
+# dos líneas de extensión perpendiculares. Buscando esa geometría en
+# page.get_drawings() se sabe dónde está cada etiqueta sin renderizar la página
+# ni pasar el detector de texto: el OCR (o la capa de texto) solo se aplica ahí.
+#
+# Las páginas sin geometría de cotas (escaneos) se pasan al detector de
+# imagen de respaldo, si lo hay.
+
+# Jerónimo Manuel Jiménez Mateos
+
+# ========================================================
+# =======================Librerías========================
+# ========================================================
+import math
+
+from startup import lazy_import
+
+np = lazy_import("numpy")
+fitz = lazy_import("fitz")  # PyMuPDF
+
+ARROW_MAX_SIZE = 15.0     # lado máximo de una flecha (puntos PDF)
+ARROW_MIN_SIZE = 1.0
+COLLINEAR_TOLERANCE = 1.5 # desviación máxima entre las dos flechas de una cota (puntos)
+ALIGN_COS = 0.98          # |coseno| mínimo entre la dirección de la flecha y la línea de cota
+ENDPOINT_TOLERANCE = 2.0  # distancia máxima de una línea a la punta de la flecha
+LABEL_REACH = 4.0         # alcance de la etiqueta a cada lado de la línea, en longitudes de flecha
+                          # (las flechas escalan con el texto del plano)
+LABEL_MIN_HALF_LENGTH = 30.0
+
+
+# ========================================================
+# =====================Geometría==========================
+# ========================================================
+def _segments(drawings):
+    """Segmentos (p, q) de todos los trazados, en el orden en que se dibujan."""
+    paths = []
+    for path in drawings:
+        segs = []
+        for item in path["items"]:
+            if item[0] == "l":
+                segs.append((fitz.Point(item[1]), fitz.Point(item[2])))
+            elif item[0] == "re":
+                r = fitz.Rect(item[1])
+                segs.extend([(r.tl, r.tr), (r.tr, r.br), (r.br, r.bl), (r.bl, r.tl)])
+            elif item[0] == "qu":
+                q = item[1]
+                segs.extend([(q.ul, q.ur), (q.ur, q.lr), (q.lr, q.ll), (q.ll, q.ul)])
+        paths.append(segs)
+    return paths
+
+
+def _unit(v):
+    length = math.hypot(v.x, v.y)
+    return fitz.Point(v.x / length, v.y / length) if length else None
+
+
+def find_arrowheads(paths):
+    """Flechas de cota: tres segmentos seguidos que cierran un triángulo pequeño.
+
+    `paths` son los segmentos de cada trazado (ver _segments). Devuelve
+    [(punta, dirección unitaria, longitud)], con la dirección de la base a la punta.
+    """
+    arrows = []
+    for segs in paths:
+        i = 0
+        while i + 2 < len(segs):
+            (a, b), (b2, c), (c2, a2) = segs[i:i + 3]
+            closed = (abs(b - b2) < 0.01 and abs(c - c2) < 0.01 and abs(a2 - a) < 0.01)
+            sides = [abs(b - a), abs(c - b), abs(a - c)]
+            if not closed or not (ARROW_MIN_SIZE <= max(sides) <= ARROW_MAX_SIZE):
+                i += 1
+                continue
+            # La punta es el vértice opuesto al lado más corto (la base)
+            vertices = [(c, a, b), (a, b, c), (b, c, a)]  # (punta, extremos de la base) por lado
+            tip, base0, base1 = vertices[sides.index(min(sides))]
+            axis = tip - (base0 + base1) * 0.5
+            direction = _unit(axis)
+            if direction is not None and min(sides) < 0.9 * max(sides):  # descartar triángulos equiláteros
+                arrows.append((tip, direction, abs(axis)))
+            i += 3
+    return arrows
+
+
+def _has_segment(segments, p, q, tolerance=ENDPOINT_TOLERANCE):
+    """True si algún segmento une (aproximadamente) p con q. `segments` es un array (N, 4)."""
+    p, q = np.array([p.x, p.y]), np.array([q.x, q.y])
+    start, end = segments[:, :2], segments[:, 2:]
+    forward = (np.hypot(*(start - p).T) < tolerance) & (np.hypot(*(end - q).T) < tolerance)
+    backward = (np.hypot(*(start - q).T) < tolerance) & (np.hypot(*(end - p).T) < tolerance)
+    return bool(np.any(forward | backward))
+
+
+def _has_extension_line(segments, tip, axis, tolerance=ENDPOINT_TOLERANCE):
+    """True si una línea perpendicular a la cota pasa por la punta de la flecha."""
+    start = segments[:, :2]
+    vec = segments[:, 2:] - start
+    length = np.hypot(*vec.T)
+    valid = length > 0
+    d = vec[valid] / length[valid, None]
+    rel = np.array([tip.x, tip.y]) - start[valid]
+    perpendicular = np.abs(d @ np.array([axis.x, axis.y])) <= 1 - ALIGN_COS
+    # Distancia de la punta a la recta del segmento y que la punta caiga dentro de él
+    along = np.einsum("ij,ij->i", rel, d)
+    across = np.abs(rel[:, 0] * d[:, 1] - rel[:, 1] * d[:, 0])
+    inside = (along >= -tolerance) & (along <= length[valid] + tolerance)
+    return bool(np.any(perpendicular & (across < tolerance) & inside))
+
+
+def find_dimension_lines(drawings):
+    """Pares de flechas que forman una cota: [(punta0, punta1, longitud de flecha)].
+
+    Dos flechas forman cota si son colineales, apuntan en sentidos opuestos y
+    además hay una línea de cota entre ellas o líneas de extensión en ambas puntas.
+    Se admiten las flechas hacia fuera (cotas normales) y hacia dentro (cotas cortas).
+    """
+    paths = _segments(drawings)
+    arrows = find_arrowheads(paths)
+    if not arrows:
+        return []
+    segments = np.array([(p.x, p.y, q.x, q.y) for segs in paths for p, q in segs], dtype=np.float64)
+    tips = np.array([(t.x, t.y) for t, _, _ in arrows])
+    dirs = np.array([(d.x, d.y) for _, d, _ in arrows])
+    used = np.zeros(len(arrows), dtype=bool)
+    dimensions = []
+    for i, (tip0, dir0, size0) in enumerate(arrows):
+        if used[i]:
+            continue
+        # Candidatas: sentido opuesto, sobre la misma recta; se queda la más cercana
+        rel = tips - tips[i]
+        dist = np.hypot(*rel.T)
+        across = np.abs(rel[:, 0] * dirs[i, 1] - rel[:, 1] * dirs[i, 0])
+        candidate = (~used & (dirs @ dirs[i] <= -ALIGN_COS) & (across <= COLLINEAR_TOLERANCE) & (dist > 1e-6))
+        candidate[i] = False
+        if not candidate.any():
+            continue
+        best = int(np.flatnonzero(candidate)[np.argmin(dist[candidate])])
+        tip1, _dir1, size1 = arrows[best]
+        if not (_has_segment(segments, tip0, tip1)
+                or (_has_extension_line(segments, tip0, dir0) and _has_extension_line(segments, tip1, dir0))):
+            continue
+        used[[i, best]] = True
+        dimensions.append((tip0, tip1, max(size0, size1)))
+    return dimensions
+
+
+def label_region(tip0, tip1, reach):
+    """Zona donde puede estar la etiqueta: alrededor del centro de la línea de cota, a ambos lados."""
+    mid = (tip0 + tip1) * 0.5
+    axis = _unit(tip1 - tip0)
+    normal = fitz.Point(-axis.y, axis.x)
+    half = max(abs(tip1 - tip0) / 2, LABEL_MIN_HALF_LENGTH)
+    corners = [mid + axis * (sa * half) + normal * (sn * reach) for sa in (-1, 1) for sn in (-1, 1)]
+    return fitz.Rect(min(p.x for p in corners), min(p.y for p in corners),
+                     max(p.x for p in corners), max(p.y for p in corners))
+
+
+# ========================================================
+# =======================Detector=========================
+# ========================================================
+class VectorLabelDetector:
+    """Detector de etiquetas de cota por geometría: `detector(page) -> [Rect]` o None.
+
+    Devuelve None si la página no tiene geometría de cotas; en ese caso
+    convert_page usa el detector de imagen `fallback` (se crea al primer uso
+    con `fallback_factory`, de modo que en PDFs vectoriales no se carga nunca).
+    Para cada cota, si la capa de texto tiene palabras en la zona de la
+    etiqueta se devuelve la caja de la línea de texto más cercana a la cota;
+    si no (texto convertido en curvas), la zona entera para el OCR.
+    """
+
+    needs_image = False
+
+    def __init__(self, fallback_factory=None):
+        self.fallback_factory = fallback_factory
+        self._fallback = None
+
+    @property
+    def fallback(self):
+        if self._fallback is None and self.fallback_factory is not None:
+            self._fallback = self.fallback_factory()
+        return self._fallback
+
+    def __call__(self, page):
+        dimensions = find_dimension_lines(page.get_drawings())
+        if not dimensions:
+            return None
+        words = [(fitz.Rect(w[:4]), w[5], w[6]) for w in page.get_text("words")]
+        rects = []
+        for tip0, tip1, arrow_length in dimensions:
+            region = label_region(tip0, tip1, reach=LABEL_REACH * arrow_length)
+            label = self._label_in(region, words, (tip0 + tip1) * 0.5)
+            rect = label or region
+            if not any(rect == r for r in rects):
+                rects.append(rect)
+        return rects
+
+    @staticmethod
+    def _label_in(region, words, mid):
+        """Caja de la línea de texto de la zona más cercana al centro de la cota, o None."""
+        lines = {}
+        for rect, block, line in words:
+            cx, cy = (rect.x0 + rect.x1) / 2, (rect.y0 + rect.y1) / 2
+            if region.x0 <= cx <= region.x1 and region.y0 <= cy <= region.y1:
+                key = (block, line)
+                lines[key] = lines[key] | rect if key in lines else rect
+        if not lines:
+            return None
+        return min(lines.values(), key=lambda r: abs((r.tl + r.br) * 0.5 - mid))